@@ -1,220 +1,250 @@
-"""
-    代码主要功能:
-    基于A*算法实现路径搜索,支持道路折点的处理。
-"""
-import pandas as pd
-import heapq
-import math
-import json
-
-class Map_Astar:
-    def __init__(self):
-        self.nodes = {}
-        self.edges = {}
-        self.coords = {}
-        self.edge_paths = {}  
-        
-    def add_node(self, node_id, name, lon, lat):
-        self.nodes[node_id] = name
-        self.coords[node_id] = (lon, lat)
-        if node_id not in self.edges:
-            self.edges[node_id] = {}
-    
-    def add_bian(self, from_id, to_id, dist, path_points=None):
-        if from_id not in self.edges:
-            self.edges[from_id] = {}
-        if to_id not in self.edges:
-            self.edges[to_id] = {}
-        self.edges[from_id][to_id] = dist
-        self.edges[to_id][from_id] = dist
-        #存储路径折点
-        if path_points and len(path_points) > 0:
-            self.edge_paths[(from_id, to_id)] = path_points
-            self.edge_paths[(to_id, from_id)] = path_points[::-1]
-        else:
-            #如果没有折点,就用直线连接
-            self.edge_paths[(from_id, to_id)] = [
-                list(self.coords[from_id]),
-                list(self.coords[to_id])
-            ]
-            self.edge_paths[(to_id, from_id)] = [
-                list(self.coords[to_id]),
-                list(self.coords[from_id])
-            ]
-
-    #获取两个节点之间的详细路径点
-    def get_edge_path(self, from_id, to_id):
-        return self.edge_paths.get((from_id, to_id), None)
-    
-    #使用Haversine公式计算地球表面两点距离
-    def get_str8dist(self, n1, n2):
-        lon1, lat1 = self.coords[n1]
-        lon2, lat2 = self.coords[n2]
-        #转换为弧度
-        lon1, lat1, lon2, lat2 = map(math.radians, [lon1, lat1, lon2, lat2])
-        #Haversine公式
-        dlon = lon2 - lon1
-        dlat = lat2 - lat1
-        a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
-        c = 2 * math.asin(math.sqrt(a))
-        #地球半径(米)
-        R = 6371000
-        return R * c
-    
-    def assearch(self, start, end):
-        visited_c = 0
-        
-        # 增加边界检查
-        if start not in self.nodes or end not in self.nodes:
-            return None, float('inf'), None, 0
-        
-        if start not in self.edges or not self.edges[start]:
-            print(f"警告: 起点{start}没有任何连接的边")
-            return None, float('inf'), None, 0
-        
-        if end not in self.edges or not self.edges[end]:
-            print(f"警告: 终点{end}没有任何连接的边")
-            return None, float('inf'), None, 0
-        
-        g_score = {node: float('inf') for node in self.nodes}
-        g_score[start] = 0
-        f_score = {node: float('inf') for node in self.nodes}
-        f_score[start] = self.get_str8dist(start, end)
-        openlist = []
-        heapq.heappush(openlist, (f_score[start], start))
-        yuan = {}
-        closed_set = set()
-        
-        while openlist:
-            curr_f, curr = heapq.heappop(openlist)
-            if curr in closed_set:
-                continue
-
-            visited_c += 1
-            closed_set.add(curr)
-            
-            if curr == end:
-                path = [] 
-                totdist = g_score[end]
-                temp = end
-                while temp in yuan:
-                    path.append(temp)
-                    temp = yuan[temp]
-                path.append(start)
-                path.reverse()
-                detailed_path = self._build_detailed_path(path)
-                return path, totdist, detailed_path, visited_c
-            
-            if curr not in self.edges:
-                continue
-
-            for neighbor, weight in self.edges[curr].items():
-                if neighbor in closed_set:
-                    continue
-                ttt_g = g_score[curr] + weight
-                if ttt_g < g_score[neighbor]:
-                    yuan[neighbor] = curr 
-                    g_score[neighbor] = ttt_g
-                    f_score[neighbor] = ttt_g + self.get_str8dist(neighbor, end)
-                    heapq.heappush(openlist, (f_score[neighbor], neighbor))
-        
-        # 未找到路径，打印调试信息
-        print(f"A*算法未找到路径: {start}→{end}, 访问了{visited_c}个节点")
-        return None, float('inf'), None, visited_c
-    
-    def _build_detailed_path(self, node_path):        
-        detailed_coords = []
-        for i in range(len(node_path) - 1):
-            from_node = node_path[i]
-            to_node = node_path[i + 1]
-            #获取这条边的详细路径点
-            edge_path = self.get_edge_path(from_node, to_node)
-            if edge_path:
-                if i == 0:
-                    #第一条边,添加所有点
-                    detailed_coords.extend(edge_path)
-                else:
-                    #后续边,跳过第一个点(避免重复)
-                    detailed_coords.extend(edge_path[1:])
-        return detailed_coords
-    
-    def get_nodename(self, node_id):
-        return self.nodes.get(node_id, "Unknown")
-    
-    def get_coord(self, node_id):
-        return self.coords.get(node_id, None)
-
-#解析路径点字符串
-def parse_path_points(path_str):
-    if not path_str or pd.isna(path_str):
-        return None
-    try:
-        #JSON格式
-        if path_str.startswith('['):
-            return json.loads(path_str)
-        #分号分隔格式
-        if ';' in path_str:
-            points = []
-            for point_str in path_str.split(';'):
-                coords = [float(x.strip()) for x in point_str.split(',')]
-                points.append(coords)
-            return points
-        return None
-    except:
-        return None
-
-#加载图数据,支持道路折点
-def get_graph(nodes_csv, distance_csv):
-    g = Map_Astar()
-    df_nodes = pd.read_csv(nodes_csv, encoding='utf-8-sig')
-    for _, row in df_nodes.iterrows():
-        g.add_node(row['node_id'], row['name'], row['longitude'], row['latitude'])
-    df_dist = pd.read_csv(distance_csv, encoding='utf-8-sig')
-    for _, row in df_dist.iterrows():
-        #识别起点和终点列名
-        if 'node1' in row and 'node2' in row:
-            from_id, to_id = row['node1'], row['node2']
-        elif 'from' in row and 'to' in row:
-            from_id, to_id = row['from'], row['to']
-        elif 'start' in row and 'end' in row:
-            from_id, to_id = row['start'], row['end']
-        else:
-            from_id, to_id = row.iloc[0], row.iloc[1]
-        
-        distance = row.get('distance', row.get('length', row.get('weight', row.iloc[2])))
-        path_points = None
-        if 'waypoints' in row:
-            path_points = parse_path_points(row['waypoints'])
-        g.add_bian(from_id, to_id, distance, path_points)
-    return g
-
-#运行A*算法并返回结果
-def run_astar(start_id, end_id, graph):
-    path, dist, detailed_coords, visited_count = graph.assearch(start_id, end_id)
-    #转换坐标格式[lon,lat]->[lat,lon] 
-    path_coords = [[coord[1], coord[0]] for coord in detailed_coords] if detailed_coords else []
-    result = {
-        'path': path,
-        'distance': round(dist, 2) if dist != float('inf') else None,
-        'path_names': [graph.get_nodename(nid) for nid in path] if path else [],
-        'path_coords': path_coords,  #包含所有折点的详细路径
-        'node_count': len(path) if path else 0,
-        'waypoint_count': len(path_coords) if path_coords else 0,
-        'visited_nodes': visited_count 
-    }
-    return result
-
-if __name__ == "__main__":
-    import sys
-    if len(sys.argv) < 3:
-        nodes_file = 'map_nodes.csv'
-        edges_file = 'distance_final.csv'
-    else:
-        nodes_file = sys.argv[1]
-        edges_file = sys.argv[2]
-    graph = get_graph(nodes_file, edges_file)
-
-    if len(graph.nodes) >= 2:
-        start = list(graph.nodes.keys())[0]
-        end = list(graph.nodes.keys())[-1]
+"""
+    代码主要功能:
+    基于A*算法实现路径搜索,支持道路折点的处理。
+"""
+import heapq
+from geodesic import GeoIndex
+from graph_core import NodeNames
+# parse_path_points原先定义在本模块,现移到graph_core;保留导入以兼容 from Astar import parse_path_points
+from graph_core import parse_path_points  # noqa: F401
+from graph_loader import load_graph
+from search_workspace import acquire_workspace, release_workspace
+
+class Map_Astar:
+    def __init__(self, core):
+        #共享的只读CSR图
+        self.core = core
+        self.nodes = NodeNames(core)
+        #预先算好弧度坐标和cos(纬度),启发函数不再逐次转换
+        self.geo = GeoIndex(core.coords)
+        #ALT地标索引,set_landmarks之后才可用
+        self.landmarks = None
+
+    #挂载ALT地标索引
+    def set_landmarks(self, index):
+        self.landmarks = index
+        return self
+
+    #获取两个节点之间的详细路径点
+    def get_edge_path(self, from_id, to_id):
+        i, j = self.core.index_of(from_id), self.core.index_of(to_id)
+        if i is None or j is None:
+            return None
+        return self.core.edge_path(i, j)
+    
+    #使用Haversine公式计算地球表面两点距离
+    def get_str8dist(self, n1, n2):
+        return self._str8dist(self.core.index_of(n1), self.core.index_of(n2))
+
+    def _str8dist(self, i, j):
+        return self.geo.distance(i, j)
+    
+    #返回到终点t的启发函数h(v): haversine为直线距离,alt为地标下界与直线距离取大
+    def _heuristic(self, t, mode='haversine'):
+        str8 = self.geo.heuristic_to(t)
+        if mode == 'alt' and self.landmarks is not None:
+            alt = self.landmarks.heuristic_to(t)
+            return lambda v: max(alt(v), str8(v))
+        return str8
+    
+    def assearch(self, start, end, heuristic='haversine', counts=None, detailed=True):
+        #counts不为None时记录入堆/出堆次数;detailed为False时不拼接折点(调用方另行拼接)
+        visited_c = 0
+        pushes = pops = 0
+        core = self.core
+        
+        # 增加边界检查
+        s, t = core.index_of(start), core.index_of(end)
+        if s is None or t is None:
+            return None, float('inf'), None, 0
+        
+        if core.degree(s) == 0:
+            print(f"警告: 起点{start}没有任何连接的边")
+            return None, float('inf'), None, 0
+        
+        if core.degree(t) == 0:
+            print(f"警告: 终点{end}没有任何连接的边")
+            return None, float('inf'), None, 0
+        
+        #从空闲列表取一个工作区,只有本次访问到的节点才会被写入;查询结束时归还
+        ws = acquire_workspace(core.n)
+        gen = ws.begin()
+        g_score, yuan, stamp, closed = ws.dist, ws.prev, ws.stamp, ws.closed
+        g_score[s] = 0
+        yuan[s] = -1
+        stamp[s] = gen
+        h = self._heuristic(t, heuristic)
+        openlist = []
+        heapq.heappush(openlist, (h(s), s))
+        pushes += 1
+        
+        while openlist:
+            curr_f, curr = heapq.heappop(openlist)
+            pops += 1
+            if closed[curr] == gen:
+                continue
+
+            visited_c += 1
+            closed[curr] = gen
+            
+            if curr == t:
+                totdist = g_score[t]
+                idx_path = ws.path_to(t)
+                release_workspace(ws)
+                detailed_path = core.build_detailed_path(idx_path) if detailed else None
+                path = [core.node_id(i) for i in idx_path]
+                if counts is not None:
+                    counts.update(queue_pushes=pushes, queue_pops=pops)
+                return path, totdist, detailed_path, visited_c
+
+            curr_g = g_score[curr]
+            targets, weights = core.neighbors(curr)
+            for neighbor, weight in zip(targets, weights):
+                if closed[neighbor] == gen:
+                    continue
+                ttt_g = curr_g + weight
+                if stamp[neighbor] != gen or ttt_g < g_score[neighbor]:
+                    yuan[neighbor] = curr 
+                    g_score[neighbor] = ttt_g
+                    stamp[neighbor] = gen
+                    heapq.heappush(openlist, (ttt_g + h(neighbor), neighbor))
+                    pushes += 1
+        
+        release_workspace(ws)
+        if counts is not None:
+            counts.update(queue_pushes=pushes, queue_pops=pops)
+        # 未找到路径，打印调试信息
+        print(f"A*算法未找到路径: {start}→{end}, 访问了{visited_c}个节点")
+        return None, float('inf'), None, visited_c
+    
+    def bi_assearch(self, start, end, heuristic='haversine', counts=None, detailed=True):
+        """双向A*:正反两个方向同时搜索,使用平均势函数保证两侧一致"""
+        visited_c = 0
+        pushes, pops = 2, 0
+        core = self.core
+        
+        s, t = core.index_of(start), core.index_of(end)
+        if s is None or t is None:
+            return None, float('inf'), None, 0
+        if core.degree(s) == 0 or core.degree(t) == 0:
+            print(f"警告: 起点{start}或终点{end}没有任何连接的边")
+            return None, float('inf'), None, 0
+        if s == t:
+            return [start], 0, core.build_detailed_path([s]) if detailed else None, 1
+        
+        #平均势函数 p(v) = (h(v,t) - h(s,v)) / 2,正向用p,反向用-p
+        h_t = self._heuristic(t, heuristic)
+        h_s = self._heuristic(s, heuristic)
+        potential = {}
+        def p(v):
+            if v not in potential:
+                potential[v] = (h_t(v) - h_s(v)) / 2
+            return potential[v]
+        
+        g = ({s: 0}, {t: 0})
+        yuan = ({}, {})
+        closed = (set(), set())
+        sign = (1, -1)
+        openlists = ([(p(s), s)], [(-p(t), t)])
+        best = float('inf')
+        meet = None
+        
+        while openlists[0] and openlists[1]:
+            #停止条件:两侧堆顶键值之和不小于当前最优路径长度
+            if openlists[0][0][0] + openlists[1][0][0] >= best:
+                break
+            #每次扩展堆较小的一侧
+            side = 0 if len(openlists[0]) <= len(openlists[1]) else 1
+            curr_f, curr = heapq.heappop(openlists[side])
+            pops += 1
+            if curr in closed[side]:
+                continue
+            closed[side].add(curr)
+            visited_c += 1
+            
+            g_side, g_other = g[side], g[1 - side]
+            targets, weights = core.neighbors(curr)
+            for neighbor, weight in zip(targets, weights):
+                ttt_g = g_side[curr] + weight
+                if ttt_g < g_side.get(neighbor, float('inf')):
+                    g_side[neighbor] = ttt_g
+                    yuan[side][neighbor] = curr
+                    heapq.heappush(openlists[side], (ttt_g + sign[side] * p(neighbor), neighbor))
+                    pushes += 1
+                #记录两侧相遇时的最短路径
+                if neighbor in g_other and g_side[neighbor] + g_other[neighbor] < best:
+                    best = g_side[neighbor] + g_other[neighbor]
+                    meet = neighbor
+        
+        if counts is not None:
+            counts.update(queue_pushes=pushes, queue_pops=pops)
+        if meet is None:
+            print(f"双向A*未找到路径: {start}→{end}, 访问了{visited_c}个节点")
+            return None, float('inf'), None, visited_c
+        
+        idx_path = self._join_paths(s, t, meet, yuan)
+        path = [core.node_id(i) for i in idx_path]
+        return path, best, core.build_detailed_path(idx_path) if detailed else None, visited_c
+    
+    @staticmethod
+    def _join_paths(s, t, meet, yuan):
+        #正向从相遇点回溯到起点,反向从相遇点回溯到终点
+        front = [meet]
+        while front[-1] != s:
+            front.append(yuan[0][front[-1]])
+        front.reverse()
+        back = meet
+        while back != t:
+            back = yuan[1][back]
+            front.append(back)
+        return front
+    
+    def _build_detailed_path(self, node_path):
+        idx_path = [self.core.index_of(nid) for nid in node_path]
+        return self.core.build_detailed_path(idx_path)
+    
+    def get_nodename(self, node_id):
+        return self.nodes.get(node_id, "Unknown")
+    
+    def get_coord(self, node_id):
+        i = self.core.index_of(node_id)
+        return self.core.coord(i) if i is not None else None
+
+#加载图数据,支持道路折点
+def get_graph(nodes_csv, distance_csv):
+    return Map_Astar(load_graph(nodes_csv, distance_csv))
+
+#运行A*算法并返回结果
+def run_astar(start_id, end_id, graph, bidirectional=False, heuristic='haversine', detailed=True):
+    search = graph.bi_assearch if bidirectional else graph.assearch
+    counts = {}
+    path, dist, detailed_coords, visited_count = search(start_id, end_id, heuristic, counts, detailed)
+    #转换坐标格式[lon,lat]->[lat,lon] 
+    path_coords = [[coord[1], coord[0]] for coord in detailed_coords] if detailed_coords else []
+    result = {
+        'path': path,
+        'distance': round(dist, 2) if dist != float('inf') else None,
+        'path_names': [graph.get_nodename(nid) for nid in path] if path else [],
+        'path_coords': path_coords,  #包含所有折点的详细路径
+        'node_count': len(path) if path else 0,
+        'waypoint_count': len(path_coords) if path_coords else 0,
+        'visited_nodes': visited_count,
+        'queue_pushes': counts.get('queue_pushes', 0),
+        'queue_pops': counts.get('queue_pops', 0)
+    }
+    return result
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) < 3:
+        nodes_file = 'map_nodes.csv'
+        edges_file = 'distance_final.csv'
+    else:
+        nodes_file = sys.argv[1]
+        edges_file = sys.argv[2]
+    graph = get_graph(nodes_file, edges_file)
+
+    if len(graph.nodes) >= 2:
+        start = list(graph.nodes.keys())[0]
+        end = list(graph.nodes.keys())[-1]
         result = run_astar(start, end, graph)
\ No newline at end of file
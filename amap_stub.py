@@ -0,0 +1,109 @@
+"""
+    代码主要功能:
+    在本地模拟高德步行路径API(/v3/direction/walking)的HTTP服务,
+    用于在不消耗配额的情况下测试并发获取路径。
+    返回起点到终点的直线折线(中间插入一个点),可以设置每秒请求数上限、
+    随机失败比例和响应延迟,超过上限时和高德一样返回status为0的限流错误。
+
+    用法: python amap_stub.py [端口]
+"""
+import json
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+WALKING_PATH = '/v3/direction/walking'
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        # 不在控制台打印每个请求
+        pass
+
+    def _reply(self, code, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json;charset=UTF-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        if url.path != WALKING_PATH:
+            self._reply(404, {'status': '0', 'info': 'NOT_FOUND'})
+            return
+        if server.latency:
+            time.sleep(server.latency)
+        verdict = server.admit()
+        if verdict == 'limited':
+            self._reply(200, {'status': '0', 'info': 'CUQPS_HAS_EXCEEDED_THE_LIMIT',
+                              'infocode': '10020'})
+            return
+        if verdict == 'failed':
+            self._reply(503, {'status': '0', 'info': 'SERVICE_UNAVAILABLE'})
+            return
+
+        query = parse_qs(url.query)
+        try:
+            lon1, lat1 = map(float, query['origin'][0].split(','))
+            lon2, lat2 = map(float, query['destination'][0].split(','))
+        except (KeyError, ValueError):
+            self._reply(200, {'status': '0', 'info': 'INVALID_PARAMS', 'infocode': '20000'})
+            return
+        mid = ((lon1 + lon2) / 2, (lat1 + lat2) / 2)
+        polyline = f"{lon1:.6f},{lat1:.6f};{mid[0]:.6f},{mid[1]:.6f};{lon2:.6f},{lat2:.6f}"
+        self._reply(200, {'status': '1', 'info': 'OK', 'infocode': '10000',
+                          'route': {'paths': [{'steps': [{'polyline': polyline}]}]}})
+
+
+class AmapStub(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, qps=None, fail_rate=0.0, latency=0.0):
+        super().__init__(address, _StubHandler)
+        self.qps = qps                # 每秒请求数上限,None为不限
+        self.fail_rate = fail_rate    # 随机返回503的比例
+        self.latency = latency        # 每个响应的延迟(秒)
+        self._recent = deque()
+        self._lock = threading.Lock()
+        self.stats = {'ok': 0, 'limited': 0, 'failed': 0}
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}{WALKING_PATH}"
+
+    def admit(self):
+        """按最近1秒内的请求数判断是否限流,返回 'ok' / 'limited' / 'failed'"""
+        with self._lock:
+            now = time.monotonic()
+            while self._recent and now - self._recent[0] >= 1.0:
+                self._recent.popleft()
+            if self.qps is not None and len(self._recent) >= self.qps:
+                verdict = 'limited'
+            else:
+                self._recent.append(now)
+                verdict = 'failed' if random.random() < self.fail_rate else 'ok'
+            self.stats[verdict] += 1
+            return verdict
+
+
+def start_stub(port=0, qps=None, fail_rate=0.0, latency=0.0):
+    """在后台线程启动模拟服务(port=0时随机选端口),返回服务对象,用完调用shutdown()"""
+    server = AmapStub(('127.0.0.1', port), qps=qps, fail_rate=fail_rate, latency=latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    import sys
+
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    server = AmapStub(('127.0.0.1', port))
+    print(f"模拟高德步行路径API: {server.url}")
+    server.serve_forever()
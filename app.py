@@ -1,575 +1,1130 @@
-from flask import Flask, request, jsonify
-import pandas as pd
-import json
-import time
-import os
-import sys
-
-current_dir = os.path.dirname(os.path.abspath(__file__))
-if current_dir not in sys.path:
-    sys.path.append(current_dir)
-
-try:
-    from Astar import get_graph, run_astar
-    from dijkstra import init_dijkstra, dijkstra_find_path
-    ALGO_OK = True
-except ImportError:
-    ALGO_OK = False
-
-app = Flask(__name__)
-
-NODES = 'map_nodes.csv'
-EDGES = 'distance_final.csv'
-
-astar_g = None
-dijkstra_g = None
-nodes = []
-
-# 后端（周永婷）：加载节点和边数据，初始化算法图结构
-def init_data():
-    global astar_g, dijkstra_g, nodes
-    
-    try:
-        if os.path.exists(NODES):
-            df = pd.read_csv(NODES, encoding='utf-8-sig')
-            nodes = []
-            for _, row in df.iterrows():
-                nodes.append({
-                    'id': int(row['node_id']),
-                    'name': str(row['name']),
-                    'lon': float(row['longitude']),
-                    'lat': float(row['latitude']),
-                    'address': str(row.get('address', ''))
-                })
-        else:
-            return False
-        
-        if ALGO_OK and os.path.exists(EDGES):
-            try:
-                astar_g = get_graph(NODES, EDGES)
-            except:
-                astar_g = None
-        
-        if ALGO_OK and os.path.exists(EDGES):
-            try:
-                dijkstra_g = init_dijkstra(NODES, EDGES)
-            except:
-                dijkstra_g = None
-        
-        return True
-        
-    except:
-        return False
-
-# 后端（周永婷）：主页路由，返回HTML界面
-@app.route('/')
-def index():
-    try:
-        if not nodes:
-            init_data()
-        
-        opts = ""
-        for node in nodes:
-            opts += f'<option value="{node["id"]}">{node["id"]}: {node["name"]}</option>'
-        
-        # 前端（林绮岚）：HTML界面，只包括地图显示、节点标记
-        #后端（周永婷）：选择算法、路径显示、结果显示等功能
-        html = f'''
-        <!DOCTYPE html>
-        <html lang="zh-CN">
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <title>云南大学校园导航</title>
-            <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css">
-            <link rel="stylesheet" href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css" />
-            <script src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js"></script>
-            <style>
-                * {{ margin: 0; padding: 0; box-sizing: border-box; font-family: Arial, sans-serif; }}
-                body {{ 
-                    background: #f5f5f5; 
-                    height: 100vh;
-                    display: flex;
-                    flex-direction: column;
-                }}
-                .header {{
-                    background: linear-gradient(to right, #2c3e50, #3498db);
-                    color: white;
-                    padding: 15px 20px;
-                    box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-                }}
-                .header h1 {{
-                    font-size: 24px;
-                    display: flex;
-                    align-items: center;
-                    gap: 10px;
-                }}
-                .container {{
-                    display: flex;
-                    flex: 1;
-                    height: calc(100vh - 70px);
-                }}
-                .sidebar {{
-                    width: 350px;
-                    background: white;
-                    padding: 20px;
-                    overflow-y: auto;
-                    box-shadow: 2px 0 10px rgba(0,0,0,0.1);
-                }}
-                .map-container {{
-                    flex: 1;
-                    position: relative;
-                }}
-                #map {{
-                    width: 100%;
-                    height: 100%;
-                }}
-                .panel {{
-                    background: #f8f9fa;
-                    border-radius: 10px;
-                    padding: 20px;
-                    margin-bottom: 20px;
-                    border: 1px solid #ddd;
-                }}
-                .panel h3 {{
-                    color: #2c3e50;
-                    margin-bottom: 15px;
-                    padding-bottom: 10px;
-                    border-bottom: 2px solid #3498db;
-                }}
-                .form-group {{
-                    margin-bottom: 15px;
-                }}
-                label {{
-                    display: block;
-                    margin-bottom: 5px;
-                    color: #34495e;
-                    font-weight: bold;
-                }}
-                select {{
-                    width: 100%;
-                    padding: 10px;
-                    border: 2px solid #ddd;
-                    border-radius: 5px;
-                    font-size: 14px;
-                }}
-                select:focus {{
-                    outline: none;
-                    border-color: #3498db;
-                }}
-                .btn-group {{
-                    display: flex;
-                    gap: 10px;
-                    margin-top: 20px;
-                }}
-                button {{
-                    flex: 1;
-                    padding: 12px;
-                    border: none;
-                    border-radius: 5px;
-                    font-size: 14px;
-                    font-weight: bold;
-                    cursor: pointer;
-                    display: flex;
-                    align-items: center;
-                    justify-content: center;
-                    gap: 8px;
-                }}
-                .btn-calc {{
-                    background: #3498db;
-                    color: white;
-                }}
-                .btn-calc:hover {{
-                    background: #2980b9;
-                }}
-                .btn-clear {{
-                    background: #95a5a6;
-                    color: white;
-                }}
-                .btn-clear:hover {{
-                    background: #7f8c8d;
-                }}
-                .result-box {{
-                    background: white;
-                    border-radius: 10px;
-                    padding: 15px;
-                    margin-top: 20px;
-                    border-left: 4px solid #3498db;
-                }}
-                .algo-select {{
-                    display: flex;
-                    background: #ecf0f1;
-                    border-radius: 5px;
-                    margin-bottom: 15px;
-                }}
-                .algo-btn {{
-                    flex: 1;
-                    padding: 10px;
-                    text-align: center;
-                    cursor: pointer;
-                    border-radius: 5px;
-                    font-weight: bold;
-                }}
-                .algo-btn.active {{
-                    background: #3498db;
-                    color: white;
-                }}
-                .loading {{
-                    display: none;
-                    position: fixed;
-                    top: 50%;
-                    left: 50%;
-                    transform: translate(-50%, -50%);
-                    background: white;
-                    padding: 20px;
-                    border-radius: 10px;
-                    box-shadow: 0 0 20px rgba(0,0,0,0.2);
-                    text-align: center;
-                    z-index: 1000;
-                }}
-                .spinner {{
-                    border: 4px solid #f3f3f3;
-                    border-top: 4px solid #3498db;
-                    border-radius: 50%;
-                    width: 40px;
-                    height: 40px;
-                    animation: spin 1s linear infinite;
-                    margin: 0 auto 10px;
-                }}
-                @keyframes spin {{
-                    0% {{ transform: rotate(0deg); }}
-                    100% {{ transform: rotate(360deg); }}
-                }}
-                .map-legend {{
-                    position: absolute;
-                    top: 20px;
-                    right: 20px;
-                    background: white;
-                    padding: 12px;
-                    border-radius: 5px;
-                    box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-                    font-size: 13px;
-                    line-height: 1.8;
-                }}
-                .legend-title {{
-                    font-weight: bold;
-                    margin-bottom: 8px;
-                    color: #2c3e50;
-                }}
-                .status {{
-                    padding: 10px;
-                    margin-bottom: 15px;
-                    border-radius: 5px;
-                    font-size: 12px;
-                }}
-                .status.success {{
-                    background: #d4edda;
-                    color: #155724;
-                    border: 1px solid #c3e6cb;
-                }}
-            </style>
-        </head>
-        <body>
-            <div class="header">
-                <h1><i class="fas fa-map-marker-alt"></i> 云南大学校园导航系统</h1>
-            </div>
-            
-            <div class="container">
-                <div class="sidebar">
-                    <div class="status success">
-                        ✅ 系统已加载 {len(nodes)} 个校园地点
-                    </div>
-                    
-                    <div class="panel">
-                        <h3><i class="fas fa-route"></i> 路径规划</h3>
-                        
-                        <div class="form-group">
-                            <label><i class="fas fa-map-pin"></i> 起点</label>
-                            <select id="startNode">
-                                <option value="">选择起点</option>
-                                {opts}
-                            </select>
-                        </div>
-                        
-                        <div class="form-group">
-                            <label><i class="fas fa-flag"></i> 终点</label>
-                            <select id="endNode">
-                                <option value="">选择终点</option>
-                                {opts}
-                            </select>
-                        </div>
-                        
-                        <div class="form-group">
-                            <label><i class="fas fa-code-branch"></i> 选择算法</label>
-                            <div class="algo-select">
-                                <div class="algo-btn active" data-algo="astar">A*算法</div>
-                                <div class="algo-btn" data-algo="dijkstra">Dijkstra算法</div>
-                            </div>
-                        </div>
-                        
-                        <div class="btn-group">
-                            <button class="btn-calc" onclick="calcPath()">
-                                <i class="fas fa-calculator"></i> 计算路径
-                            </button>
-                            <button class="btn-clear" onclick="clearMap()">
-                                <i class="fas fa-trash"></i> 清除
-                            </button>
-                        </div>
-                    </div>
-                    
-                    <div id="resultBox" class="result-box" style="display: none;">
-                        <h3><i class="fas fa-info-circle"></i> 计算结果</h3>
-                        <div id="resultContent"></div>
-                    </div>
-                </div>
-                
-                <div class="map-container">
-                    <div id="map"></div>
-                    <div class="map-legend">
-                        <div class="legend-title">图例</div>
-                        <div><span style="color: #e74c3c;">●</span> 起点</div>
-                        <div><span style="color: #27ae60;">●</span> 终点</div>
-                        <div><span style="color: #3498db;">━━</span> 路径</div>
-                    </div>
-                </div>
-            </div>
-            
-            <div class="loading" id="loading">
-                <div class="spinner"></div>
-                <p>正在计算路径...</p>
-            </div>
-            
-            <script>
-                // 前端（林绮岚）：初始化地图和节点显示
-                var map = L.map('map').setView([24.83, 102.85], 16);
-                L.tileLayer('https://webrd01.is.autonavi.com/appmaptile?lang=zh_cn&size=1&scale=1&style=8&x={{x}}&y={{y}}&z={{z}}', {{
-                    attribution: '高德地图',
-                    maxZoom: 19
-                }}).addTo(map);
-                
-                var nodes = {json.dumps([{"id": n["id"], "name": n["name"], "lat": n["lat"], "lon": n["lon"]} for n in nodes])};
-                
-                var markers = L.layerGroup().addTo(map);
-                var pathLayer = L.layerGroup().addTo(map);
-                var algo = 'astar';
-                
-                function addMarkers() {{
-                    markers.clearLayers();
-                    nodes.forEach(function(node) {{
-                        var marker = L.circleMarker([node.lat, node.lon], {{
-                            radius: 6,
-                            fillColor: '#3498db',
-                            color: '#2c3e50',
-                            weight: 1,
-                            opacity: 0.8,
-                            fillOpacity: 0.6
-                        }}).bindPopup(`<strong>${{node.name}}</strong><br>ID: ${{node.id}}`);
-                        markers.addLayer(marker);
-                    }});
-                }}
-                
-                // 前端（林绮岚）：算法切换功能
-                document.querySelectorAll('.algo-btn').forEach(btn => {{
-                    btn.addEventListener('click', function() {{
-                        document.querySelectorAll('.algo-btn').forEach(b => b.classList.remove('active'));
-                        this.classList.add('active');
-                        algo = this.dataset.algo;
-                    }});
-                }});
-                
-                // 前端（林绮岚）：路径计算请求功能
-                function calcPath() {{
-                    var start = document.getElementById('startNode').value;
-                    var end = document.getElementById('endNode').value;
-                    
-                    if (!start || !end) {{
-                        alert('请选择起点和终点！');
-                        return;
-                    }}
-                    
-                    if (start == end) {{
-                        alert('起点和终点不能相同！');
-                        return;
-                    }}
-                    
-                    document.getElementById('loading').style.display = 'block';
-                    pathLayer.clearLayers();
-                    
-                    fetch('/calc', {{
-                        method: 'POST',
-                        headers: {{ 'Content-Type': 'application/json' }},
-                        body: JSON.stringify({{
-                            start: parseInt(start),
-                            end: parseInt(end),
-                            algo: algo
-                        }})
-                    }})
-                    .then(response => response.json())
-                    .then(data => {{
-                        document.getElementById('loading').style.display = 'none';
-                        if (data.ok) {{
-                            showResult(data);
-                            drawPath(data);
-                        }} else {{
-                            alert('计算失败:' + (data.error || '未知错误'));
-                        }}
-                    }})
-                    .catch(error => {{
-                        document.getElementById('loading').style.display = 'none';
-                        alert('请求失败:' + error.message);
-                    }});
-                }}
-                
-                // 前端（林绮岚）：结果显示功能
-                function showResult(data) {{
-                    var algoName = algo === 'astar' ? 'A*算法' : 'Dijkstra算法';
-                    var color = algo === 'astar' ? '#e74c3c' : '#3498db';
-                    var html = `
-                        <div style="margin-bottom: 15px; padding: 10px; background: ${{color}}; color: white; border-radius: 5px; text-align: center;">
-                            <strong>${{algoName}}</strong>
-                        </div>
-                        <p><strong>起点:</strong> ${{data.start_name}}</p>
-                        <p><strong>终点:</strong> ${{data.end_name}}</p>
-                        <p><strong>总距离:</strong> <span style="color: #27ae60; font-weight: bold;">${{data.dist}} 米</span></p>
-                        <p><strong>计算时间:</strong> ${{data.time}} 毫秒</p>
-                        <p><strong>访问节点数:</strong> ${{data.visited}} 个</p>
-                    `;
-                    
-                    document.getElementById('resultContent').innerHTML = html;
-                    document.getElementById('resultBox').style.display = 'block';
-                }}
-                
-                // 前端（林绮岚）：路径绘制功能
-                function drawPath(data) {{
-                    var coords = data.coords;
-                    var color = algo === 'astar' ? '#e74c3c' : '#3498db';
-                    
-                    var startNode = nodes.find(n => n.id == data.start_id);
-                    var endNode = nodes.find(n => n.id == data.end_id);
-                    
-                    if (coords && coords.length > 1 && startNode && endNode) {{
-                        var fullPath = [[startNode.lat, startNode.lon], ...coords, [endNode.lat, endNode.lon]];
-                        
-                        var line = L.polyline(fullPath, {{
-                            color: color,
-                            weight: 3,
-                            opacity: 0.7,
-                            lineCap: 'round',
-                            lineJoin: 'round'
-                        }}).bindPopup(`
-                            <div style="padding: 10px;">
-                                <strong>${{algo === 'astar' ? 'A*算法' : 'Dijkstra算法'}}</strong><br>
-                                距离: ${{data.dist}}米<br>
-                                访问节点: ${{data.visited}}个
-                            </div>
-                        `);
-                        pathLayer.addLayer(line);
-                        var bounds = line.getBounds();
-                        map.fitBounds(bounds, {{ padding: [50, 50] }});
-                    }}
-                    
-                    if (startNode) {{
-                        L.circleMarker([startNode.lat, startNode.lon], {{
-                            radius: 7,
-                            color: '#e74c3c',
-                            fillColor: '#e74c3c',
-                            fillOpacity: 0.9,
-                            weight: 2
-                        }}).addTo(pathLayer);
-                    }}
-                    
-                    if (endNode) {{
-                        L.circleMarker([endNode.lat, endNode.lon], {{
-                            radius: 7,
-                            color: '#27ae60',
-                            fillColor: '#27ae60',
-                            fillOpacity: 0.9,
-                            weight: 2
-                        }}).addTo(pathLayer);
-                    }}
-                }}
-                
-                // 前端（林绮岚）：清除地图功能
-                function clearMap() {{
-                    pathLayer.clearLayers();
-                    addMarkers();
-                    document.getElementById('resultBox').style.display = 'none';
-                }}
-                
-                window.onload = function() {{
-                    addMarkers();
-                }};
-            </script>
-        </body>
-        </html>
-        '''
-        
-        return html
-        
-    except Exception as e:
-        return f"<h1>错误</h1><p>页面渲染失败:{str(e)}</p>"
-
-# 后端（周永婷）：路径计算接口，调用A*或Dijkstra算法
-@app.route('/calc', methods=['POST'])
-def calc():
-    try:
-        data = request.json
-        start_id = int(data['start'])
-        end_id = int(data['end'])
-        algo_type = data['algo']
-        
-        start_node = next((n for n in nodes if n['id'] == start_id), None)
-        end_node = next((n for n in nodes if n['id'] == end_id), None)
-        
-        if not start_node or not end_node:
-            return jsonify({'ok': False, 'error': '节点不存在'})
-        
-        t0 = time.time()
-        result = None
-        visited = 0
-        
-        if algo_type == 'astar' and astar_g:
-            try:
-                res = run_astar(start_id, end_id, astar_g)
-                if res and res.get('path') is not None:
-                    result = res
-                    visited = res.get('visited_nodes', 0)
-            except:
-                pass
-        
-        elif algo_type == 'dijkstra' and dijkstra_g:
-            try:
-                res = dijkstra_find_path(dijkstra_g, start_id, end_id)
-                if res and res.get('path') is not None:
-                    result = res
-                    visited = res.get('visited_nodes', 0)
-            except:
-                pass
-        
-        exec_time = (time.time() - t0) * 1000
-        
-        if not result or result.get('path') is None:
-            return jsonify({'ok': False, 'error': f'未找到从节点{start_id}到节点{end_id}的路径'})
-        
-        if not result.get('path_coords'):
-            return jsonify({'ok': False, 'error': '路径坐标为空'})
-        
-        return jsonify({
-            'ok': True,
-            'algo': algo_type,
-            'start_id': start_id,
-            'end_id': end_id,
-            'start_name': start_node['name'],
-            'end_name': end_node['name'],
-            'dist': result.get('distance'),
-            'time': round(exec_time, 2),
-            'visited': visited,
-            'coords': result.get('path_coords', [])
-        })
-        
-    except:
-        return jsonify({'ok': False, 'error': '计算错误'})
-
-if __name__ == '__main__':
-    init_data()
+from flask import Flask, request, jsonify
+import functools
+import hmac
+import json
+import time
+import os
+import sys
+import threading
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.append(current_dir)
+
+try:
+    from Astar import Map_Astar
+    from dijkstra import DijkstraNavigator
+    from query_pool import (QUERY_MAX_PENDING, QUERY_TIMEOUT, PoolBusy, PoolClosed, QueryPool,
+                            QueryTimeout, run_search)
+    ALGO_OK = True
+except ImportError:
+    ALGO_OK = False
+    # 算法模块不可用时，接口中的except子句仍然需要这些异常类
+    class PoolBusy(Exception):
+        pass
+    class PoolClosed(Exception):
+        pass
+    class QueryTimeout(Exception):
+        pass
+
+from graph_loader import build_graph, node_records, node_table_of, read_edges, read_nodes
+from graph_snapshot import META_FILE, SNAPSHOT_DIR, load_snapshot, snapshot_is_fresh
+from graph_state import WATCH_INTERVAL, FileWatcher, GraphState
+from apsp import APSP_MAX_NODES, load_or_build_table
+from route_cache import ROUTE_CACHE_SIZE, RouteCache
+from contraction import load_or_build_ch
+from landmarks import load_or_build_landmarks
+from graph_update import affected_routes, apply_changes, new_node_edges, persist_change
+from node_index import SEARCH_LIMIT, SEARCH_MAX_LIMIT
+from page_cache import PageCache
+from single_flight import SingleFlight
+from polyline import POLYLINE_MAX_PRECISION, POLYLINE_MIN_PRECISION, POLYLINE_PRECISION
+from simplify import level_for_zoom, load_or_build_levels
+
+app = Flask(__name__)
+
+NODES = 'map_nodes.csv'
+EDGES = 'distance_final.csv'
+SNAPSHOT = SNAPSHOT_DIR
+# 节点数超过该值时不建全源最短路表，查表请求退回实时搜索
+APSP_LIMIT = APSP_MAX_NODES
+# /matrix 单次请求的最大元素数
+MATRIX_MAX_CELLS = 250000
+# 路径查询的工作进程数（环境变量QUERY_WORKERS），0表示在请求线程中直接搜索
+QUERY_POOL_WORKERS = int(os.environ.get('QUERY_WORKERS', 0))
+# 修改图数据的/admin接口：设置了环境变量ADMIN_TOKEN时须在X-Admin-Token头中给出，否则只允许本机访问
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+LOCAL_ADDRS = ('127.0.0.1', '::1')
+
+# 当前图状态：请求开始时取一次，重新加载时整体替换（版本号每次加1）
+state = GraphState()
+# 重新加载和增量修改串行执行
+_reload_lock = threading.Lock()
+reload_info = {'reloading': False, 'count': 0, 'last_ms': None, 'last_reason': None,
+               'last_error': None, 'last_at': None}
+watcher = None
+route_cache = RouteCache(ROUTE_CACHE_SIZE, dumps=lambda payload: app.json.dumps(payload))
+# 主页和节点列表每个图版本只渲染一次
+page_cache = PageCache()
+# 同时到达的相同查询只计算一次
+route_flights = SingleFlight()
+
+# 用已构建好的图创建新的A*和Dijkstra（不修改正在使用的对象），并准备各自的预处理结果；
+# preprocess为False时只建搜索对象，地标、查表、收缩层次、简化折点和进程池都不准备
+def _build_state(version, core, nodes, source, snapshot_dir=None, t0=None, preprocess=True):
+    t0 = time.time() if t0 is None else t0
+    if core is None:
+        return GraphState(version, None, None, None, nodes, source,
+                          round((time.time() - t0) * 1000, 2))
+    if not preprocess:
+        return GraphState(version, core, Map_Astar(core), DijkstraNavigator(core), nodes, source,
+                          round((time.time() - t0) * 1000, 2), complete=False)
+    astar = Map_Astar(core)
+    # ALT地标：地标到各节点的距离随快照保存，只有从快照加载时才读写
+    try:
+        astar.set_landmarks(load_or_build_landmarks(core, snapshot_dir))
+    except:
+        pass
+    dijkstra = DijkstraNavigator(core)
+    # 小图预先算好全源最短路表；表随快照保存，只有从快照加载时才读写
+    try:
+        table = load_or_build_table(core, snapshot_dir, APSP_LIMIT)
+    except:
+        table = None
+    dijkstra.attach_table(table)
+    try:
+        ch = load_or_build_ch(core, snapshot_dir)
+    except:
+        ch = None
+    dijkstra.attach_ch(ch)
+    # 各细节层级的简化折点，随快照保存
+    try:
+        levels = load_or_build_levels(core, snapshot_dir)
+    except:
+        levels = None
+    # 工作进程从导出到临时目录的快照mmap加载，与正在使用的快照和其他服务进程互不影响
+    pool = None
+    if QUERY_POOL_WORKERS > 0:
+        try:
+            pool = QueryPool.for_graph(core, None, astar, dijkstra,
+                                       workers=QUERY_POOL_WORKERS, timeout=QUERY_TIMEOUT,
+                                       max_pending=QUERY_MAX_PENDING).warm_up()
+        except:
+            pool = None
+    return GraphState(version, core, astar, dijkstra, nodes, source,
+                      round((time.time() - t0) * 1000, 2), pool, levels)
+
+# 从快照或CSV构建一个新的图状态，节点表不存在时返回None
+def load_state(version):
+    t0 = time.time()
+    # 快照比CSV新时直接mmap加载，省去解析CSV
+    core = None
+    from_snapshot = False
+    if ALGO_OK and snapshot_is_fresh(SNAPSHOT, NODES, EDGES):
+        try:
+            core = load_snapshot(SNAPSHOT)
+            from_snapshot = True
+        except:
+            core = None
+    
+    if core is not None:
+        nodes = node_records(node_table_of(core))
+    elif os.path.exists(NODES):
+        node_table = read_nodes(NODES)
+        nodes = node_records(node_table)
+        # 图只加载一次，A*和Dijkstra共享同一份只读CSR结构
+        if ALGO_OK and os.path.exists(EDGES):
+            try:
+                core = build_graph(node_table, read_edges(EDGES))
+            except:
+                core = None
+    else:
+        return None
+    
+    return _build_state(version, core, nodes, 'snapshot' if from_snapshot else 'csv',
+                        SNAPSHOT if from_snapshot else None, t0)
+
+# 替换当前图状态：引用赋值是原子的，旧版本的请求继续用旧对象完成
+def _swap_state(new_state, reason, t0):
+    global state
+    old_state, state = state, new_state
+    # 旧版本的进程池处理完已提交的查询后关闭
+    if old_state.pool is not None:
+        old_state.pool.close()
+    reload_info['count'] += 1
+    reload_info['last_ms'] = round((time.time() - t0) * 1000, 2)
+    reload_info['last_reason'] = reason
+    reload_info['last_error'] = None
+    reload_info['last_at'] = time.time()
+    # 重新加载后文件已是最新，不用再由监视线程触发
+    if watcher is not None:
+        watcher.mark_seen()
+
+# 重新加载图数据：在当前线程构建新状态，完成后原子替换，返回是否成功
+def reload_graph(reason='manual'):
+    with _reload_lock:
+        t0 = time.time()
+        reload_info['reloading'] = True
+        try:
+            new_state = load_state(state.version + 1)
+        except Exception as e:
+            reload_info['last_error'] = str(e)
+            return False
+        finally:
+            reload_info['reloading'] = False
+        if new_state is None:
+            reload_info['last_error'] = f'找不到节点文件{NODES}'
+            return False
+        _swap_state(new_state, reason, t0)
+        # 图已更换，旧的路径缓存全部作废
+        route_cache.invalidate(new_state.version)
+        return True
+
+# 增量修改后在后台补齐预处理结果；期间图没有再变化时替换为同一版本的完整状态，
+# 路径缓存不受影响（预处理只加快搜索，不改变最短距离）
+def _preprocess_async(light_state):
+    def run():
+        t0 = time.time()
+        try:
+            full = _build_state(light_state.version, light_state.core, light_state.nodes,
+                                light_state.source, None, t0)
+        except Exception as e:
+            reload_info['last_error'] = str(e)
+            return
+        with _reload_lock:
+            if state is light_state:
+                _swap_state(full, 'preprocess', t0)
+                return
+        if full.pool is not None:
+            full.pool.close()
+    threading.Thread(target=run, daemon=True).start()
+
+# 在后台线程重新加载，不阻塞当前请求
+def reload_graph_async(reason='manual'):
+    threading.Thread(target=reload_graph, args=(reason,), daemon=True).start()
+
+# 后端（周永婷）：加载节点和边数据，初始化算法图结构
+def init_data():
+    try:
+        return reload_graph('init')
+    except:
+        return False
+
+# 监视CSV和快照文件，变化后在后台重新加载
+def start_watcher(interval=WATCH_INTERVAL):
+    global watcher
+    if watcher is None and interval > 0:
+        watcher = FileWatcher([NODES, EDGES, os.path.join(SNAPSHOT, META_FILE)],
+                              lambda: reload_graph_async('watch'), interval).start()
+    return watcher
+
+# 返回缓存的页面：内容没变时返回304，否则按浏览器支持的压缩方式返回
+def _send_page(page):
+    if page.not_modified(request.headers.get('If-None-Match'),
+                         request.headers.get('If-Modified-Since')):
+        return app.response_class(status=304, headers=page.headers())
+    encoding, data = page.choose(request.headers.get('Accept-Encoding'))
+    return app.response_class(data, content_type=page.mimetype, headers=page.headers(encoding))
+
+# 后端（周永婷）：主页路由，返回HTML界面
+@app.route('/')
+def index():
+    try:
+        if not state.nodes:
+            init_data()
+        st = state
+        return _send_page(page_cache.get('index', st.version, st.loaded_at,
+                                         lambda: render_index(st.nodes)))
+    except Exception as e:
+        return f"<h1>错误</h1><p>页面渲染失败:{str(e)}</p>"
+
+# 节点列表（地图标记用），与主页分开缓存
+@app.route('/nodes.json')
+def nodes_json():
+    st = state
+    return _send_page(page_cache.get(
+        'nodes', st.version, st.loaded_at,
+        lambda: json.dumps([{"id": n["id"], "name": n["name"], "lat": n["lat"], "lon": n["lon"]}
+                            for n in st.nodes], ensure_ascii=False),
+        'application/json'))
+
+# 渲染主页HTML
+def render_index(nodes):
+    opts = ""
+    for node in nodes:
+        opts += f'<option value="{node["id"]}">{node["id"]}: {node["name"]}</option>'
+    
+    # 前端（林绮岚）：HTML界面，只包括地图显示、节点标记
+    #后端（周永婷）：选择算法、路径显示、结果显示等功能
+    html = f'''
+        <!DOCTYPE html>
+        <html lang="zh-CN">
+        <head>
+            <meta charset="UTF-8">
+            <meta name="viewport" content="width=device-width, initial-scale=1.0">
+            <title>云南大学校园导航</title>
+            <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css">
+            <link rel="stylesheet" href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css" />
+            <script src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js"></script>
+            <style>
+                * {{ margin: 0; padding: 0; box-sizing: border-box; font-family: Arial, sans-serif; }}
+                body {{ 
+                    background: #f5f5f5; 
+                    height: 100vh;
+                    display: flex;
+                    flex-direction: column;
+                }}
+                .header {{
+                    background: linear-gradient(to right, #2c3e50, #3498db);
+                    color: white;
+                    padding: 15px 20px;
+                    box-shadow: 0 2px 10px rgba(0,0,0,0.1);
+                }}
+                .header h1 {{
+                    font-size: 24px;
+                    display: flex;
+                    align-items: center;
+                    gap: 10px;
+                }}
+                .container {{
+                    display: flex;
+                    flex: 1;
+                    height: calc(100vh - 70px);
+                }}
+                .sidebar {{
+                    width: 350px;
+                    background: white;
+                    padding: 20px;
+                    overflow-y: auto;
+                    box-shadow: 2px 0 10px rgba(0,0,0,0.1);
+                }}
+                .map-container {{
+                    flex: 1;
+                    position: relative;
+                }}
+                #map {{
+                    width: 100%;
+                    height: 100%;
+                }}
+                .panel {{
+                    background: #f8f9fa;
+                    border-radius: 10px;
+                    padding: 20px;
+                    margin-bottom: 20px;
+                    border: 1px solid #ddd;
+                }}
+                .panel h3 {{
+                    color: #2c3e50;
+                    margin-bottom: 15px;
+                    padding-bottom: 10px;
+                    border-bottom: 2px solid #3498db;
+                }}
+                .form-group {{
+                    margin-bottom: 15px;
+                }}
+                label {{
+                    display: block;
+                    margin-bottom: 5px;
+                    color: #34495e;
+                    font-weight: bold;
+                }}
+                select {{
+                    width: 100%;
+                    padding: 10px;
+                    border: 2px solid #ddd;
+                    border-radius: 5px;
+                    font-size: 14px;
+                }}
+                select:focus {{
+                    outline: none;
+                    border-color: #3498db;
+                }}
+                .btn-group {{
+                    display: flex;
+                    gap: 10px;
+                    margin-top: 20px;
+                }}
+                button {{
+                    flex: 1;
+                    padding: 12px;
+                    border: none;
+                    border-radius: 5px;
+                    font-size: 14px;
+                    font-weight: bold;
+                    cursor: pointer;
+                    display: flex;
+                    align-items: center;
+                    justify-content: center;
+                    gap: 8px;
+                }}
+                .btn-calc {{
+                    background: #3498db;
+                    color: white;
+                }}
+                .btn-calc:hover {{
+                    background: #2980b9;
+                }}
+                .btn-clear {{
+                    background: #95a5a6;
+                    color: white;
+                }}
+                .btn-clear:hover {{
+                    background: #7f8c8d;
+                }}
+                .form-group input {{
+                    width: 100%;
+                    padding: 10px;
+                    border: 2px solid #ddd;
+                    border-radius: 5px;
+                    font-size: 14px;
+                }}
+                .search-results div {{
+                    padding: 6px 10px;
+                    cursor: pointer;
+                    border-bottom: 1px solid #ecf0f1;
+                    font-size: 13px;
+                }}
+                .search-results div:hover {{
+                    background: #ecf0f1;
+                }}
+                .result-box {{
+                    background: white;
+                    border-radius: 10px;
+                    padding: 15px;
+                    margin-top: 20px;
+                    border-left: 4px solid #3498db;
+                }}
+                .algo-select {{
+                    display: flex;
+                    flex-wrap: wrap;
+                    background: #ecf0f1;
+                    border-radius: 5px;
+                    margin-bottom: 15px;
+                }}
+                .algo-btn {{
+                    flex: 1 0 30%;
+                    padding: 10px;
+                    text-align: center;
+                    cursor: pointer;
+                    border-radius: 5px;
+                    font-weight: bold;
+                }}
+                .algo-btn.active {{
+                    background: #3498db;
+                    color: white;
+                }}
+                .loading {{
+                    display: none;
+                    position: fixed;
+                    top: 50%;
+                    left: 50%;
+                    transform: translate(-50%, -50%);
+                    background: white;
+                    padding: 20px;
+                    border-radius: 10px;
+                    box-shadow: 0 0 20px rgba(0,0,0,0.2);
+                    text-align: center;
+                    z-index: 1000;
+                }}
+                .spinner {{
+                    border: 4px solid #f3f3f3;
+                    border-top: 4px solid #3498db;
+                    border-radius: 50%;
+                    width: 40px;
+                    height: 40px;
+                    animation: spin 1s linear infinite;
+                    margin: 0 auto 10px;
+                }}
+                @keyframes spin {{
+                    0% {{ transform: rotate(0deg); }}
+                    100% {{ transform: rotate(360deg); }}
+                }}
+                .map-legend {{
+                    position: absolute;
+                    top: 20px;
+                    right: 20px;
+                    background: white;
+                    padding: 12px;
+                    border-radius: 5px;
+                    box-shadow: 0 2px 10px rgba(0,0,0,0.1);
+                    font-size: 13px;
+                    line-height: 1.8;
+                }}
+                .legend-title {{
+                    font-weight: bold;
+                    margin-bottom: 8px;
+                    color: #2c3e50;
+                }}
+                .status {{
+                    padding: 10px;
+                    margin-bottom: 15px;
+                    border-radius: 5px;
+                    font-size: 12px;
+                }}
+                .status.success {{
+                    background: #d4edda;
+                    color: #155724;
+                    border: 1px solid #c3e6cb;
+                }}
+            </style>
+        </head>
+        <body>
+            <div class="header">
+                <h1><i class="fas fa-map-marker-alt"></i> 云南大学校园导航系统</h1>
+            </div>
+            
+            <div class="container">
+                <div class="sidebar">
+                    <div class="status success">
+                        ✅ 系统已加载 {len(nodes)} 个校园地点
+                    </div>
+                    
+                    <div class="panel">
+                        <h3><i class="fas fa-route"></i> 路径规划</h3>
+                        
+                        <div class="form-group">
+                            <label><i class="fas fa-search"></i> 搜索地点</label>
+                            <input id="nodeSearch" type="text" placeholder="输入名称或编号" oninput="searchNodes(this.value)">
+                            <div id="searchResults" class="search-results"></div>
+                        </div>
+                        
+                        <div class="form-group">
+                            <label><i class="fas fa-map-pin"></i> 起点</label>
+                            <select id="startNode">
+                                <option value="">选择起点</option>
+                                {opts}
+                            </select>
+                        </div>
+                        
+                        <div class="form-group">
+                            <label><i class="fas fa-flag"></i> 终点</label>
+                            <select id="endNode">
+                                <option value="">选择终点</option>
+                                {opts}
+                            </select>
+                        </div>
+                        
+                        <div class="form-group">
+                            <label><i class="fas fa-code-branch"></i> 选择算法</label>
+                            <div class="algo-select">
+                                <div class="algo-btn active" data-algo="astar">A*算法</div>
+                                <div class="algo-btn" data-algo="dijkstra">Dijkstra算法</div>
+                                <div class="algo-btn" data-algo="table">查表</div>
+                                <div class="algo-btn" data-algo="bi_astar">双向A*</div>
+                                <div class="algo-btn" data-algo="bi_dijkstra">双向Dijkstra</div>
+                                <div class="algo-btn" data-algo="ch">收缩层次</div>
+                                <div class="algo-btn" data-algo="alt">ALT地标A*</div>
+                            </div>
+                        </div>
+                        
+                        <div class="btn-group">
+                            <button class="btn-calc" onclick="calcPath()">
+                                <i class="fas fa-calculator"></i> 计算路径
+                            </button>
+                            <button class="btn-clear" onclick="clearMap()">
+                                <i class="fas fa-trash"></i> 清除
+                            </button>
+                        </div>
+                    </div>
+                    
+                    <div id="resultBox" class="result-box" style="display: none;">
+                        <h3><i class="fas fa-info-circle"></i> 计算结果</h3>
+                        <div id="resultContent"></div>
+                    </div>
+                </div>
+                
+                <div class="map-container">
+                    <div id="map"></div>
+                    <div class="map-legend">
+                        <div class="legend-title">图例</div>
+                        <div><span style="color: #e74c3c;">●</span> 起点</div>
+                        <div><span style="color: #27ae60;">●</span> 终点</div>
+                        <div><span style="color: #3498db;">━━</span> 路径</div>
+                    </div>
+                </div>
+            </div>
+            
+            <div class="loading" id="loading">
+                <div class="spinner"></div>
+                <p>正在计算路径...</p>
+            </div>
+            
+            <script>
+                // 前端（林绮岚）：初始化地图和节点显示
+                var map = L.map('map').setView([24.83, 102.85], 16);
+                L.tileLayer('https://webrd01.is.autonavi.com/appmaptile?lang=zh_cn&size=1&scale=1&style=8&x={{x}}&y={{y}}&z={{z}}', {{
+                    attribution: '高德地图',
+                    maxZoom: 19
+                }}).addTo(map);
+                
+                // 节点数据单独从/nodes.json加载，浏览器可以缓存
+                var nodes = [];
+                
+                var markers = L.layerGroup().addTo(map);
+                var pathLayer = L.layerGroup().addTo(map);
+                var algo = 'astar';
+                var ALGO_NAMES = {{
+                    astar: 'A*算法', dijkstra: 'Dijkstra算法', table: '最短路查表',
+                    bi_astar: '双向A*算法', bi_dijkstra: '双向Dijkstra算法', ch: '收缩层次(CH)',
+                    alt: 'ALT地标A*算法'
+                }};
+                var ALGO_COLORS = {{
+                    astar: '#e74c3c', dijkstra: '#3498db', table: '#8e44ad',
+                    bi_astar: '#d35400', bi_dijkstra: '#16a085', ch: '#2c3e50',
+                    alt: '#c0392b'
+                }};
+                
+                function addMarkers() {{
+                    markers.clearLayers();
+                    nodes.forEach(function(node) {{
+                        var marker = L.circleMarker([node.lat, node.lon], {{
+                            radius: 6,
+                            fillColor: '#3498db',
+                            color: '#2c3e50',
+                            weight: 1,
+                            opacity: 0.8,
+                            fillOpacity: 0.6
+                        }}).bindPopup(`<strong>${{node.name}}</strong><br>ID: ${{node.id}}`);
+                        markers.addLayer(marker);
+                    }});
+                }}
+                
+                // 前端（林绮岚）：算法切换功能
+                document.querySelectorAll('.algo-btn').forEach(btn => {{
+                    btn.addEventListener('click', function() {{
+                        document.querySelectorAll('.algo-btn').forEach(b => b.classList.remove('active'));
+                        this.classList.add('active');
+                        algo = this.dataset.algo;
+                    }});
+                }});
+                
+                // 前端（林绮岚）：路径计算请求功能
+                function calcPath() {{
+                    var start = document.getElementById('startNode').value;
+                    var end = document.getElementById('endNode').value;
+                    
+                    if (!start || !end) {{
+                        alert('请选择起点和终点！');
+                        return;
+                    }}
+                    
+                    if (start == end) {{
+                        alert('起点和终点不能相同！');
+                        return;
+                    }}
+                    
+                    document.getElementById('loading').style.display = 'block';
+                    pathLayer.clearLayers();
+                    
+                    fetch('/calc', {{
+                        method: 'POST',
+                        headers: {{ 'Content-Type': 'application/json' }},
+                        body: JSON.stringify({{
+                            start: parseInt(start),
+                            end: parseInt(end),
+                            algo: algo,
+                            zoom: map.getZoom(),
+                            format: 'polyline',
+                            precision: POLYLINE_PRECISION
+                        }})
+                    }})
+                    .then(response => response.json())
+                    .then(data => {{
+                        document.getElementById('loading').style.display = 'none';
+                        if (data.ok) {{
+                            showResult(data);
+                            drawPath(data);
+                        }} else {{
+                            alert('计算失败:' + (data.error || '未知错误'));
+                        }}
+                    }})
+                    .catch(error => {{
+                        document.getElementById('loading').style.display = 'none';
+                        alert('请求失败:' + error.message);
+                    }});
+                }}
+                
+                // 前端（林绮岚）：结果显示功能
+                function showResult(data) {{
+                    var algoName = ALGO_NAMES[algo] || algo;
+                    var color = ALGO_COLORS[algo] || '#3498db';
+                    var html = `
+                        <div style="margin-bottom: 15px; padding: 10px; background: ${{color}}; color: white; border-radius: 5px; text-align: center;">
+                            <strong>${{algoName}}</strong>
+                        </div>
+                        <p><strong>起点:</strong> ${{data.start_name}}</p>
+                        <p><strong>终点:</strong> ${{data.end_name}}</p>
+                        <p><strong>总距离:</strong> <span style="color: #27ae60; font-weight: bold;">${{data.dist}} 米</span></p>
+                        <p><strong>计算时间:</strong> ${{data.time}} 毫秒</p>
+                        <p><strong>访问节点数:</strong> ${{data.visited}} 个</p>
+                    `;
+                    
+                    document.getElementById('resultContent').innerHTML = html;
+                    document.getElementById('resultBox').style.display = 'block';
+                }}
+                
+                // 解码/calc返回的编码折线（与polyline.py的decode相同）
+                var POLYLINE_PRECISION = {POLYLINE_PRECISION};
+                function decodePolyline(text, precision) {{
+                    var factor = Math.pow(10, precision);
+                    var coords = [];
+                    var lat = 0, lon = 0, index = 0;
+                    while (index < text.length) {{
+                        var values = [0, 0];
+                        for (var k = 0; k < 2; k++) {{
+                            var result = 0, shift = 0, b;
+                            do {{
+                                b = text.charCodeAt(index++) - 63;
+                                result += (b & 0x1f) * Math.pow(2, shift);
+                                shift += 5;
+                            }} while (b >= 0x20);
+                            values[k] = result % 2 ? -(result + 1) / 2 : result / 2;
+                        }}
+                        lat += values[0];
+                        lon += values[1];
+                        coords.push([lat / factor, lon / factor]);
+                    }}
+                    return coords;
+                }}
+                
+                // 前端（林绮岚）：路径绘制功能
+                function drawPath(data) {{
+                    var coords = data.polyline !== undefined ? decodePolyline(data.polyline, data.precision) : data.coords;
+                    var color = ALGO_COLORS[algo] || '#3498db';
+                    
+                    // 起终点坐标由/calc一并返回，不用在节点列表里查找
+                    var startNode = data.start_coord && {{lat: data.start_coord[0], lon: data.start_coord[1]}};
+                    var endNode = data.end_coord && {{lat: data.end_coord[0], lon: data.end_coord[1]}};
+                    
+                    if (coords && coords.length > 1 && startNode && endNode) {{
+                        var fullPath = [[startNode.lat, startNode.lon], ...coords, [endNode.lat, endNode.lon]];
+                        
+                        var line = L.polyline(fullPath, {{
+                            color: color,
+                            weight: 3,
+                            opacity: 0.7,
+                            lineCap: 'round',
+                            lineJoin: 'round'
+                        }}).bindPopup(`
+                            <div style="padding: 10px;">
+                                <strong>${{ALGO_NAMES[algo] || algo}}</strong><br>
+                                距离: ${{data.dist}}米<br>
+                                访问节点: ${{data.visited}}个
+                            </div>
+                        `);
+                        pathLayer.addLayer(line);
+                        var bounds = line.getBounds();
+                        map.fitBounds(bounds, {{ padding: [50, 50] }});
+                    }}
+                    
+                    if (startNode) {{
+                        L.circleMarker([startNode.lat, startNode.lon], {{
+                            radius: 7,
+                            color: '#e74c3c',
+                            fillColor: '#e74c3c',
+                            fillOpacity: 0.9,
+                            weight: 2
+                        }}).addTo(pathLayer);
+                    }}
+                    
+                    if (endNode) {{
+                        L.circleMarker([endNode.lat, endNode.lon], {{
+                            radius: 7,
+                            color: '#27ae60',
+                            fillColor: '#27ae60',
+                            fillOpacity: 0.9,
+                            weight: 2
+                        }}).addTo(pathLayer);
+                    }}
+                }}
+                
+                // 按名称搜索地点：起点未选时设为起点，否则设为终点
+                var searchTimer = null;
+                function searchNodes(q) {{
+                    clearTimeout(searchTimer);
+                    var box = document.getElementById('searchResults');
+                    if (!q.trim()) {{
+                        box.innerHTML = '';
+                        return;
+                    }}
+                    searchTimer = setTimeout(function() {{
+                        fetch('/nodes/search?q=' + encodeURIComponent(q))
+                        .then(response => response.json())
+                        .then(data => {{
+                            box.innerHTML = '';
+                            (data.nodes || []).forEach(function(node) {{
+                                var item = document.createElement('div');
+                                item.textContent = node.id + ': ' + node.name;
+                                item.onclick = function() {{ pickNode(node); }};
+                                box.appendChild(item);
+                            }});
+                        }});
+                    }}, 150);
+                }}
+                
+                function pickNode(node) {{
+                    var start = document.getElementById('startNode');
+                    var target = start.value ? document.getElementById('endNode') : start;
+                    target.value = node.id;
+                    map.setView([node.lat, node.lon], 17);
+                    document.getElementById('nodeSearch').value = '';
+                    document.getElementById('searchResults').innerHTML = '';
+                }}
+                
+                // 前端（林绮岚）：清除地图功能
+                function clearMap() {{
+                    pathLayer.clearLayers();
+                    addMarkers();
+                    document.getElementById('resultBox').style.display = 'none';
+                }}
+                
+                window.onload = function() {{
+                    fetch('/nodes.json')
+                    .then(response => response.json())
+                    .then(data => {{
+                        nodes = data;
+                        addMarkers();
+                    }});
+                }};
+            </script>
+        </body>
+        </html>
+        '''
+    
+    return html
+
+# 按算法计算路径，返回响应数据（失败时ok为False）
+def compute_route(start_id, end_id, algo_type, start_node, end_node, st=None, level=None):
+    st = state if st is None else st
+    astar_g, dijkstra_g = st.astar, st.dijkstra
+    t0 = time.time()
+    # 指定细节层级时引擎只返回节点路径，不拼接原始折点，由预先简化好的折点拼接
+    use_levels = level is not None and st.levels is not None
+    # 配置了查询进程池时在工作进程中搜索，否则在请求线程中直接搜索
+    pooled = st.pool is not None
+    if pooled:
+        try:
+            result = st.pool.search(algo_type, start_id, end_id, detailed=not use_levels)
+        except PoolClosed:
+            # 请求开始后图被重新加载、旧版本的进程池已关闭，改在请求线程中搜索
+            pooled = False
+    if not pooled:
+        result = run_search(astar_g, dijkstra_g, algo_type, start_id, end_id, not use_levels)
+    visited = result.get('visited_nodes', 0) if result else 0
+    
+    coords = result.get('path_coords', []) if result else []
+    if result and use_levels and result.get('path'):
+        idx_path = [st.core.index_of(v) for v in result['path']]
+        coords = [[lat, lon] for lon, lat in st.levels.build_path(st.core, idx_path, level)]
+    
+    exec_time = (time.time() - t0) * 1000
+    
+    if not result or result.get('path') is None:
+        return {'ok': False, 'error': f'未找到从节点{start_id}到节点{end_id}的路径'}
+    
+    if not coords:
+        return {'ok': False, 'error': '路径坐标为空'}
+    
+    return {
+        'ok': True,
+        'algo': algo_type,
+        'start_id': start_id,
+        'end_id': end_id,
+        'start_name': start_node['name'],
+        'end_name': end_node['name'],
+        'start_coord': [start_node['lat'], start_node['lon']],
+        'end_coord': [end_node['lat'], end_node['lon']],
+        'dist': result.get('distance'),
+        'time': round(exec_time, 2),
+        'visited': visited,
+        'path': result.get('path'),
+        'detail': level,
+        'coords': coords
+    }
+
+# 细节层级：detail为层级编号（0只去重，越大越简略，"full"为原始折点），
+# 或按zoom（地图缩放级别）选择误差不超过1像素的层级；都没有时返回原始折点
+def _detail_level(data, st, start_node):
+    if st.levels is None:
+        return None
+    detail = data.get('detail')
+    if detail is not None and detail != 'full':
+        return min(max(int(detail), 0), st.levels.count - 1)
+    if detail is None and data.get('zoom') is not None:
+        return level_for_zoom(float(data['zoom']), start_node['lat'], st.levels.tolerances)
+    return None
+
+def _json_body(body, cache_state, version):
+    return app.response_class(body, mimetype='application/json',
+                              headers={'X-Route-Cache': cache_state, 'X-Graph-Version': str(version)})
+
+# 后端（周永婷）：路径计算接口，调用A*或Dijkstra算法
+@app.route('/calc', methods=['POST'])
+def calc():
+    try:
+        data = request.json
+        algo_type = data['algo']
+        # 整个请求使用同一版本的图，即使期间发生了重新加载
+        st = state
+        
+        # 起点终点可以是id或名称
+        start_node = st.index.resolve(data['start'])
+        end_node = st.index.resolve(data['end'])
+        
+        if not start_node or not end_node:
+            return jsonify({'ok': False, 'error': '节点不存在'})
+        start_id = start_node['id']
+        end_id = end_node['id']
+        # format为polyline时coords换成编码折线，precision为保留的小数位数
+        precision = None
+        if data.get('format') == 'polyline':
+            precision = min(max(int(data.get('precision', POLYLINE_PRECISION)),
+                                POLYLINE_MIN_PRECISION), POLYLINE_MAX_PRECISION)
+        
+        level = _detail_level(data, st, start_node)
+        # 不同细节层级的路径分开缓存
+        cache_algo = algo_type if level is None else f'{algo_type}@{level}'
+        
+        # 相同（或反向）的查询直接返回缓存的响应体
+        body = route_cache.get(start_id, end_id, cache_algo, st.version, precision)
+        if body is not None:
+            return _json_body(body, 'hit', st.version)
+        
+        # 缓存未命中：同时到达的相同查询只有第一个计算，其余等待并复用它的响应体
+        def compute():
+            payload = compute_route(start_id, end_id, algo_type, start_node, end_node, st, level)
+            if not payload['ok']:
+                return app.json.dumps(payload), False
+            return route_cache.put(start_id, end_id, cache_algo, payload, st.version, precision), True
+        
+        (body, ok), shared = route_flights.do((st.version, start_id, end_id, cache_algo, precision),
+                                              compute)
+        if not ok:
+            return app.response_class(body, mimetype='application/json')
+        return _json_body(body, 'coalesced' if shared else 'miss', st.version)
+        
+    except PoolBusy:
+        return jsonify({'ok': False, 'error': '服务器繁忙，请稍后再试'}), 503
+    except QueryTimeout:
+        return jsonify({'ok': False, 'error': '计算超时'}), 504
+    except:
+        return jsonify({'ok': False, 'error': '计算错误'})
+
+# 按名称（前缀/模糊）或id搜索节点：/nodes/search?q=图书馆&limit=10
+@app.route('/nodes/search')
+def nodes_search():
+    q = request.args.get('q', '')
+    try:
+        limit = min(max(int(request.args.get('limit', SEARCH_LIMIT)), 1), SEARCH_MAX_LIMIT)
+    except ValueError:
+        limit = SEARCH_LIMIT
+    found = state.index.search(q, limit)
+    return jsonify({'ok': True, 'q': q, 'count': len(found),
+                    'nodes': [{'id': n['id'], 'name': n['name'], 'lat': n['lat'], 'lon': n['lon']}
+                              for n in found]})
+
+# 批量距离矩阵：{"sources": [...], "targets": [...], "workers": 可选}
+# workers大于1且配置了查询进程池时，分块交给池中的工作进程，不为单个请求另开进程
+@app.route('/matrix', methods=['POST'])
+def matrix():
+    try:
+        data = request.json
+        sources = [int(x) for x in data['sources']]
+        targets = [int(x) for x in data['targets']]
+        workers = int(data.get('workers', 1))
+    except:
+        return jsonify({'ok': False, 'error': '参数错误'})
+    
+    st = state
+    dijkstra_g = st.dijkstra
+    if not dijkstra_g:
+        return jsonify({'ok': False, 'error': '图未加载'})
+    if len(sources) * len(targets) > MATRIX_MAX_CELLS:
+        return jsonify({'ok': False, 'error': f'矩阵过大，最多{MATRIX_MAX_CELLS}个元素'})
+    
+    t0 = time.time()
+    try:
+        pool = st.pool if workers > 1 else None
+        try:
+            dist = dijkstra_g.distance_matrix(sources, targets, pool=pool, workers=workers)
+        except PoolClosed:
+            dist = dijkstra_g.distance_matrix(sources, targets)
+    except KeyError as e:
+        return jsonify({'ok': False, 'error': e.args[0]})
+    except PoolBusy:
+        return jsonify({'ok': False, 'error': '服务器繁忙，请稍后再试'}), 503
+    except QueryTimeout:
+        return jsonify({'ok': False, 'error': '计算超时'}), 504
+    except:
+        return jsonify({'ok': False, 'error': '计算错误'})
+    
+    # 不连通的位置返回null
+    rows = [[round(d, 2) if d != float('inf') else None for d in row] for row in dist.tolist()]
+    return jsonify({
+        'ok': True,
+        'sources': sources,
+        'targets': targets,
+        'distances': rows,
+        'time': round((time.time() - t0) * 1000, 2)
+    })
+
+# 增量修改当前图并写回CSV，只作废受影响的缓存路径
+def update_graph(add_nodes=(), remove_nodes=(), add_edges=(), remove_edges=()):
+    with _reload_lock:
+        if state.core is None:
+            return {'ok': False, 'error': '图未加载'}
+        t0 = time.time()
+        try:
+            core, change = apply_changes(state.core, add_nodes, remove_nodes,
+                                         add_edges, remove_edges)
+        except (KeyError, ValueError) as e:
+            return {'ok': False, 'error': e.args[0]}
+        # 写回失败（文件只读、被占用、磁盘已满等）时不替换图，当前版本继续使用
+        try:
+            persist_change(NODES, EDGES, add_nodes, remove_nodes, add_edges, remove_edges)
+        except OSError as e:
+            return {'ok': False, 'error': f'写回CSV失败: {e}'}
+        # 先换上只有搜索对象的新状态，预处理结果在后台重建（CSV已经比快照新，不写回快照）
+        new_state = _build_state(state.version + 1, core, node_records(node_table_of(core)),
+                                 'update', None, t0, preprocess=False)
+        _swap_state(new_state, 'update', t0)
+        _preprocess_async(new_state)
+        dropped = route_cache.invalidate_routes(
+            lambda routes: affected_routes(core, change, routes), new_state.version)
+        return {
+            'ok': True,
+            'version': new_state.version,
+            'nodes': core.n,
+            'edges': core.m,
+            'invalidated': dropped,
+            'time': round((time.time() - t0) * 1000, 2)
+        }
+
+# 修改图数据的接口只允许持有ADMIN_TOKEN的请求（未设置时只允许本机）
+def admin_required(view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if ADMIN_TOKEN:
+            allowed = hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN)
+        else:
+            allowed = request.remote_addr in LOCAL_ADDRS
+        if not allowed:
+            return jsonify({'ok': False, 'error': '没有权限'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+def _walking_api():
+    # 设置了AMAP_KEY环境变量时，新增节点的边请求步行路径（带本地缓存）
+    key = os.environ.get('AMAP_KEY')
+    if not key:
+        return None
+    from map_dis import GDDT
+    from walk_cache import WalkRouteCache
+    return GDDT(key, cache=WalkRouteCache())
+
+def _edge_rows(items):
+    # [[node1, node2, 距离, 折点?], ...] -> [(node1, node2, 距离, 折点)]
+    return [(int(e[0]), int(e[1]), float(e[2]), e[3] if len(e) > 3 else None) for e in items]
+
+# 新增POI：{"name", "lon", "lat", "address"?, "id"?, "k"?, "edges"?: [[node_id, 距离, 折点?], ...]}
+# 不给edges时按直线距离连接所有节点（给定k时只连最近的k个）
+@app.route('/admin/nodes', methods=['POST'])
+@admin_required
+def admin_add_node():
+    try:
+        data = request.json
+        name = str(data['name'])
+        lon = float(data['lon'])
+        lat = float(data['lat'])
+        address = str(data.get('address', ''))
+        k = int(data['k']) if data.get('k') else None
+    except:
+        return jsonify({'ok': False, 'error': '参数错误'})
+    core = state.core
+    if core is None:
+        return jsonify({'ok': False, 'error': '图未加载'})
+    
+    if data.get('id') is not None:
+        node_id = int(data['id'])
+    else:
+        # 新节点编号接在最大的node_id之后，已有编号不变
+        node_id = int(core.ids.max()) + 1 if core.n else 0
+    if 'edges' in data:
+        try:
+            edges = [(node_id, int(e[0]), float(e[1]), e[2] if len(e) > 2 else None)
+                     for e in data['edges']]
+        except:
+            return jsonify({'ok': False, 'error': '参数错误'})
+    else:
+        # 只计算新节点与已有节点之间的点对
+        edges = [(node_id, other, dist, wp)
+                 for other, dist, wp in new_node_edges(core, lon, lat, k, _walking_api())]
+    result = update_graph(add_nodes=[(node_id, name, lon, lat, address)], add_edges=edges)
+    if result['ok']:
+        result['id'] = node_id
+    return jsonify(result)
+
+@app.route('/admin/nodes/<int:node_id>', methods=['DELETE'])
+@admin_required
+def admin_remove_node(node_id):
+    return jsonify(update_graph(remove_nodes=[node_id]))
+
+# 新增或替换边：{"edges": [[node1, node2, 距离, 折点?], ...]}；删除边：{"edges": [[node1, node2], ...]}
+@app.route('/admin/edges', methods=['POST', 'DELETE'])
+@admin_required
+def admin_edges():
+    try:
+        items = request.json['edges']
+        if request.method == 'POST':
+            changes = {'add_edges': _edge_rows(items)}
+        else:
+            changes = {'remove_edges': [(int(e[0]), int(e[1])) for e in items]}
+    except:
+        return jsonify({'ok': False, 'error': '参数错误'})
+    return jsonify(update_graph(**changes))
+
+# 手动重新加载图：{"wait": true}时等加载完成再返回，否则在后台加载
+@app.route('/admin/reload', methods=['POST'])
+@admin_required
+def admin_reload():
+    data = request.get_json(silent=True) or {}
+    if data.get('wait'):
+        ok = reload_graph('admin')
+        return jsonify({'ok': ok, 'version': state.version, 'time': reload_info['last_ms'],
+                        'error': reload_info['last_error']})
+    reload_graph_async('admin')
+    return jsonify({'ok': True, 'started': True}), 202
+
+# 当前图版本与最近一次重新加载的情况
+@app.route('/admin/status')
+def admin_status():
+    st = state
+    return jsonify({
+        'version': st.version,
+        'source': st.source,
+        'nodes': st.core.n if st.core is not None else len(st.nodes),
+        'edges': st.core.m if st.core is not None else 0,
+        'loaded_at': st.loaded_at,
+        'build_ms': st.build_ms,
+        'preprocessed': st.complete,
+        'reloading': reload_info['reloading'],
+        'reload_count': reload_info['count'],
+        'last_reload_ms': reload_info['last_ms'],
+        'last_reason': reload_info['last_reason'],
+        'last_error': reload_info['last_error'],
+        'watching': watcher is not None and watcher.running,
+        'query_pool': None if st.pool is None else dict(st.pool.stats, workers=st.pool.workers,
+                                                        pending=st.pool.pending)
+    })
+
+# 路径缓存命中情况
+@app.route('/cache/stats')
+def cache_stats():
+    stats = route_cache.stats()
+    stats['flights'] = route_flights.stats()
+    return jsonify(stats)
+
+if __name__ == '__main__':
+    init_data()
+    start_watcher()
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,110 @@
+"""
+    代码主要功能:
+    小图的全源最短路表。加载时用numpy向量化的Floyd-Warshall算出
+    距离矩阵和下一跳矩阵,查询时只需查表并沿下一跳还原路径。
+    节点数超过阈值时不建表,由调用方退回实时搜索。
+    表可以和图快照保存在同一目录,重启时直接mmap读取,不用重新计算。
+"""
+import json
+import os
+
+import numpy as np
+
+from graph_snapshot import read_meta, save_array, save_json
+
+# 超过该节点数就不建表(Floyd-Warshall为O(n^3),表为O(n^2)内存)
+APSP_MAX_NODES = 1000
+TABLE_META = 'apsp.json'
+
+
+class AllPairsTable:
+    def __init__(self, dist, next_hop):
+        self.dist = dist            # float64 (n, n) 最短距离
+        self.next_hop = next_hop    # int32 (n, n) 从i去j的下一跳下标,-1表示不连通
+
+    @property
+    def n(self):
+        return self.dist.shape[0]
+
+    @classmethod
+    def build(cls, core):
+        """Floyd-Warshall,每轮对整个矩阵做一次向量化松弛"""
+        n = core.n
+        dist = np.full((n, n), np.inf)
+        next_hop = np.full((n, n), -1, dtype=np.int32)
+        src = np.repeat(np.arange(n, dtype=np.int32), np.diff(core.offsets))
+        dst = np.asarray(core.targets, dtype=np.int32)
+        w = np.asarray(core.weights, dtype=np.float64)
+        # 同一对节点有多条边时取最短的一条
+        np.minimum.at(dist, (src, dst), w)
+        has_edge = np.isfinite(dist)
+        next_hop[has_edge] = np.nonzero(has_edge)[1]
+        diag = np.arange(n)
+        dist[diag, diag] = 0.0
+        next_hop[diag, diag] = diag
+
+        for k in range(n):
+            cand = dist[:, k, None] + dist[None, k, :]
+            better = cand < dist
+            if not better.any():
+                continue
+            np.copyto(dist, cand, where=better)
+            # 经过k更短时,i的下一跳改为i去k的下一跳
+            np.copyto(next_hop, np.broadcast_to(next_hop[:, k, None], (n, n)), where=better)
+        return cls(dist, next_hop)
+
+    def distance(self, s, t):
+        return float(self.dist[s, t])
+
+    def idx_path(self, s, t):
+        """沿下一跳矩阵还原下标路径,不连通返回None"""
+        if self.next_hop[s, t] < 0:
+            return None
+        path = [s]
+        u = s
+        while u != t:
+            u = int(self.next_hop[u, t])
+            path.append(u)
+        return path
+
+    def save(self, snapshot_dir):
+        """保存到图快照目录,记录对应快照的生成时间用于校验"""
+        save_array(os.path.join(snapshot_dir, 'apsp_dist.npy'), self.dist)
+        save_array(os.path.join(snapshot_dir, 'apsp_next.npy'), self.next_hop)
+        meta = read_meta(snapshot_dir) or {}
+        save_json(os.path.join(snapshot_dir, TABLE_META),
+                  {'n': self.n, 'snapshot_created': meta.get('created')})
+
+    @classmethod
+    def load(cls, snapshot_dir, mmap=True):
+        """从快照目录读取表,表不存在或与快照不匹配时返回None"""
+        path = os.path.join(snapshot_dir, TABLE_META)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            table_meta = json.load(f)
+        meta = read_meta(snapshot_dir) or {}
+        if table_meta.get('snapshot_created') != meta.get('created') \
+                or table_meta.get('n') != meta.get('n'):
+            return None
+        mode = 'r' if mmap else None
+        dist = np.load(os.path.join(snapshot_dir, 'apsp_dist.npy'), mmap_mode=mode)
+        next_hop = np.load(os.path.join(snapshot_dir, 'apsp_next.npy'), mmap_mode=mode)
+        return cls(dist, next_hop)
+
+
+def load_or_build_table(core, snapshot_dir=None, max_nodes=APSP_MAX_NODES):
+    """优先读快照里的表,没有则现算(并写回快照);节点数超过阈值返回None"""
+    if core is None or core.n > max_nodes:
+        return None
+    if snapshot_dir and os.path.isdir(snapshot_dir):
+        table = AllPairsTable.load(snapshot_dir)
+        if table is not None and table.n == core.n:
+            return table
+    table = AllPairsTable.build(core)
+    if snapshot_dir and os.path.isdir(snapshot_dir):
+        try:
+            table.save(snapshot_dir)
+        except OSError:
+            pass
+    return table
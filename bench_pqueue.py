@@ -0,0 +1,63 @@
+"""
+    代码主要功能:
+    比较Dijkstra使用不同优先队列(heap/binary/radix/dial)时的性能。
+    在自带的校园图上跑全部点对,在更大的合成路网上跑随机查询,
+    输出每次查询的平均耗时、入队/出队次数,并检查各队列求出的距离一致。
+
+    用法: python bench_pqueue.py [每张合成图的查询数]
+"""
+import sys
+import time
+
+import numpy as np
+
+from dijkstra import DijkstraNavigator
+from graph_loader import load_graph
+from pqueue import QUEUE_TYPES
+from synthetic import complete_graph, geometric_graph, grid_graph
+
+
+def run_queries(core, pairs, queue):
+    """用指定队列跑一组查询,返回(总耗时秒, 入队次数, 出队次数, 距离列表)"""
+    nav = DijkstraNavigator(core, queue=queue)
+    pushes = pops = 0
+    distances = []
+    t0 = time.perf_counter()
+    for s, t in pairs:
+        res = nav.find_path(core.node_id(s), core.node_id(t))
+        pushes += res.get('queue_pushes', 0)
+        pops += res.get('queue_pops', 0)
+        distances.append(res['distance'] if res['success'] else None)
+    return time.perf_counter() - t0, pushes, pops, distances
+
+
+def bench_graph(title, core, pairs):
+    print(f"\n{title}: {core.n}个节点, {core.m}条边, {len(pairs)}次查询")
+    print(f"{'队列':<8}{'毫秒/次':>10}{'入队/次':>12}{'出队/次':>12}")
+    reference = None
+    for queue in QUEUE_TYPES:
+        elapsed, pushes, pops, distances = run_queries(core, pairs, queue)
+        if reference is None:
+            reference = distances
+        elif distances != reference:
+            print(f"  警告: {queue} 的结果与 {QUEUE_TYPES[0]} 不一致")
+        k = max(len(pairs), 1)
+        print(f"{queue:<8}{elapsed / k * 1000:>10.3f}{pushes / k:>12.1f}{pops / k:>12.1f}")
+
+
+def random_pairs(n, count, seed=0):
+    rng = np.random.default_rng(seed)
+    return [tuple(map(int, rng.integers(0, n, 2))) for _ in range(count)]
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    campus = load_graph('map_nodes.csv', 'distance_final.csv')
+    all_pairs = [(s, t) for s in range(campus.n) for t in range(campus.n) if s != t]
+    bench_graph('校园图(全部点对)', campus, all_pairs)
+
+    for title, core in (('网格路网 100x100', grid_graph(100)),
+                        ('随机几何图 k=6', geometric_graph(20000)),
+                        ('完全图', complete_graph(300))):
+        bench_graph(title, core, random_pairs(core.n, count))
@@ -0,0 +1,225 @@
+"""
+    代码主要功能:
+    A*与Dijkstra路径查询的基准测试。
+    - 自带的校园图跑全部有序点对,较大的合成路网(网格、随机几何图)跑固定种子的随机查询
+    - 每种算法统计延迟分位数(p50/p90/p99/最大)、平均访问节点数、平均入堆/出堆次数,
+      再用tracemalloc单独跑一遍记录查询期间的内存峰值;同时检查各算法求出的距离一致
+    - 结果保存为JSON;给定基准文件时逐项比较,访问节点数或堆操作增加、结果出错时
+      报告回退并以状态1退出。延迟和内存峰值受机器负载影响,只有加--check-timing才比较,
+      并且要求两次运行的机器和参数相同
+
+    用法: python bench_routing.py [--count 100] [--algos astar,dijkstra] [--quick] [--repeat 3]
+                                  [--out bench_results.json] [--baseline bench_baseline.json]
+                                  [--save-baseline] [--check-timing]
+"""
+import argparse
+import json
+import os
+import platform
+import time
+import tracemalloc
+
+import numpy as np
+
+from Astar import Map_Astar, run_astar
+from bench_pqueue import random_pairs
+from dijkstra import DijkstraNavigator
+from graph_loader import load_graph
+from synthetic import geometric_graph, grid_graph
+
+BENCH_RESULTS_FILE = 'bench_results.json'
+BENCH_BASELINE_FILE = 'bench_baseline.json'
+BENCH_ALGOS = ('astar', 'dijkstra')
+# 与基准比较时允许的变化:访问节点数和堆操作次数与机器无关,默认不允许增加;
+# 延迟和内存峰值(--check-timing时才比较)允许变慢/变大的比例,延迟另有绝对下限(毫秒),
+# 亚毫秒级的查询差几十微秒不算回退
+COUNT_TOLERANCE = 0.0
+LATENCY_TOLERANCE = 0.25
+LATENCY_FLOOR_MS = 0.1
+MEMORY_TOLERANCE = 0.25
+# 这些运行参数不同时延迟和内存没有可比性
+TIMING_META_KEYS = ('machine', 'cpu_count', 'python', 'quick', 'repeat')
+# 距离一致性检查的误差(米)
+DIST_EPS = 0.01
+# 每个查询重复计时的次数,取最小值以减小机器负载带来的抖动
+BENCH_REPEAT = 3
+
+
+def engines(core):
+    """算法名 -> 查询函数(起点id, 终点id) -> 结果字典"""
+    astar = Map_Astar(core)
+    nav = DijkstraNavigator(core)
+    return {
+        'astar': lambda s, t: run_astar(s, t, astar),
+        'bi_astar': lambda s, t: run_astar(s, t, astar, bidirectional=True),
+        'dijkstra': nav.find_path,
+        'bi_dijkstra': nav.find_path_bidirectional,
+    }
+
+
+def workloads(count, quick=False):
+    """(名称, 图, 下标点对列表);随机查询的种子固定,每次运行的查询相同"""
+    campus = load_graph('map_nodes.csv', 'distance_final.csv')
+    yield 'campus_all_pairs', campus, [(s, t) for s in range(campus.n)
+                                       for t in range(campus.n) if s != t]
+    side, n = (30, 2000) if quick else (100, 20000)
+    grid = grid_graph(side)
+    yield f'grid_{side}x{side}', grid, random_pairs(grid.n, count, seed=1)
+    geo = geometric_graph(n)
+    yield f'geometric_{n}', geo, random_pairs(geo.n, count, seed=2)
+
+
+def bench_algo(core, pairs, query, repeat=BENCH_REPEAT):
+    """跑一组查询,返回(统计字典, 距离列表)"""
+    ids = [(core.node_id(s), core.node_id(t)) for s, t in pairs]
+    # 预热:分配线程工作区、填充折点缓存
+    query(*ids[0])
+
+    latencies = []
+    visited = pushes = pops = failures = 0
+    distances = []
+    for s, t in ids:
+        best = float('inf')
+        for _ in range(max(repeat, 1)):
+            t0 = time.perf_counter()
+            res = query(s, t)
+            best = min(best, time.perf_counter() - t0)
+        latencies.append(best * 1000)
+        visited += res.get('visited_nodes', 0)
+        pushes += res.get('queue_pushes', 0)
+        pops += res.get('queue_pops', 0)
+        ok = res.get('path') is not None and res.get('distance') is not None
+        failures += not ok
+        distances.append(res['distance'] if ok else None)
+
+    # 单独跑一遍测内存峰值,tracemalloc会拖慢查询,不计入延迟
+    tracemalloc.start()
+    for s, t in ids:
+        query(s, t)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    lat = np.asarray(latencies)
+    k = max(len(ids), 1)
+    return {
+        'queries': len(ids),
+        'failures': failures,
+        'mean_ms': round(float(lat.mean()), 4),
+        'p50_ms': round(float(np.percentile(lat, 50)), 4),
+        'p90_ms': round(float(np.percentile(lat, 90)), 4),
+        'p99_ms': round(float(np.percentile(lat, 99)), 4),
+        'max_ms': round(float(lat.max()), 4),
+        'visited_mean': round(visited / k, 2),
+        'pushes_mean': round(pushes / k, 2),
+        'pops_mean': round(pops / k, 2),
+        'peak_kb': round(peak / 1024, 1),
+    }, distances
+
+
+def run(count, algos=BENCH_ALGOS, quick=False, repeat=BENCH_REPEAT, log=print):
+    results = []
+    for name, core, pairs in workloads(count, quick):
+        log(f"\n{name}: {core.n}个节点, {core.m}条边, {len(pairs)}次查询")
+        log(f"{'算法':<12}{'p50':>9}{'p90':>9}{'p99':>9}{'最大':>9}"
+            f"{'访问节点':>10}{'入堆':>10}{'出堆':>10}{'内存峰值KB':>12}")
+        funcs = engines(core)
+        reference = None
+        for algo in algos:
+            stats, distances = bench_algo(core, pairs, funcs[algo], repeat)
+            if reference is None:
+                reference = (algo, distances)
+            else:
+                bad = sum(1 for a, b in zip(reference[1], distances)
+                          if (a is None) != (b is None) or (a is not None and abs(a - b) > DIST_EPS))
+                if bad:
+                    log(f"  警告: {algo} 有{bad}次查询的距离与 {reference[0]} 不一致")
+                stats['mismatches'] = bad
+            log(f"{algo:<12}{stats['p50_ms']:>9.3f}{stats['p90_ms']:>9.3f}{stats['p99_ms']:>9.3f}"
+                f"{stats['max_ms']:>9.3f}{stats['visited_mean']:>10.1f}{stats['pushes_mean']:>10.1f}"
+                f"{stats['pops_mean']:>10.1f}{stats['peak_kb']:>12.1f}")
+            results.append(dict(workload=name, nodes=core.n, edges=core.m, algo=algo, **stats))
+    return {
+        'meta': {
+            'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'count': count,
+            'quick': quick,
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+
+
+def meta_mismatch(current, baseline):
+    """两次运行中影响延迟和内存的参数有哪些不同"""
+    cur, base = current.get('meta', {}), baseline.get('meta', {})
+    return [key for key in TIMING_META_KEYS if cur.get(key) != base.get(key)]
+
+
+def compare(current, baseline, timing=False, count_tol=COUNT_TOLERANCE,
+            latency_tol=LATENCY_TOLERANCE, latency_floor=LATENCY_FLOOR_MS, memory_tol=MEMORY_TOLERANCE):
+    """与基准逐项比较,返回回退说明列表;只比较两边都有且查询数相同的项。
+    默认只比较访问节点数、堆操作次数和结果是否正确;timing为True且运行参数相同时
+    再比较p50/平均延迟(超过比例且超过绝对下限才算)和内存峰值。p99和最大延迟只输出不比较"""
+    base = {(r['workload'], r['algo']): r for r in baseline['results']}
+    checks = [('visited_mean', count_tol, 0.0), ('pushes_mean', count_tol, 0.0),
+              ('pops_mean', count_tol, 0.0)]
+    if timing and not meta_mismatch(current, baseline):
+        checks += [('p50_ms', latency_tol, latency_floor), ('mean_ms', latency_tol, latency_floor),
+                   ('peak_kb', memory_tol, 0.0)]
+    regressions = []
+    for r in current['results']:
+        b = base.get((r['workload'], r['algo']))
+        if b is None or b['queries'] != r['queries']:
+            continue
+        for key, tol, floor in checks:
+            if key in b and r[key] > b[key] * (1 + tol) + 1e-9 and r[key] - b[key] > floor:
+                regressions.append(f"{r['workload']}/{r['algo']} {key}: {b[key]} -> {r[key]} "
+                                   f"(+{(r[key] / b[key] - 1) * 100 if b[key] else float('inf'):.1f}%)")
+        if r.get('mismatches') or r['failures'] > b['failures']:
+            regressions.append(f"{r['workload']}/{r['algo']} 结果错误: 失败{r['failures']}次, "
+                               f"距离不一致{r.get('mismatches', 0)}次")
+    return regressions
+
+
+if __name__ == '__main__':
+    import sys
+
+    parser = argparse.ArgumentParser(description='A*与Dijkstra路径查询基准测试')
+    parser.add_argument('--count', type=int, default=100, help='每张合成图的随机查询数')
+    parser.add_argument('--algos', default=','.join(BENCH_ALGOS),
+                        help='逗号分隔: astar,dijkstra,bi_astar,bi_dijkstra')
+    parser.add_argument('--quick', action='store_true', help='使用较小的合成图')
+    parser.add_argument('--repeat', type=int, default=BENCH_REPEAT, help='每个查询重复计时的次数')
+    parser.add_argument('--out', default=BENCH_RESULTS_FILE, help='结果JSON文件')
+    parser.add_argument('--baseline', default=BENCH_BASELINE_FILE, help='用于比较的基准JSON文件')
+    parser.add_argument('--save-baseline', action='store_true', help='把本次结果保存为基准')
+    parser.add_argument('--check-timing', action='store_true',
+                        help='同时比较延迟和内存峰值(要求机器和运行参数与基准相同)')
+    args = parser.parse_args()
+
+    current = run(args.count, args.algos.split(','), args.quick, args.repeat)
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(current, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已保存到 {args.out}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(current, f, ensure_ascii=False, indent=2)
+        print(f"已保存为基准 {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if args.check_timing and meta_mismatch(current, baseline):
+            print(f"运行参数与基准不同({', '.join(meta_mismatch(current, baseline))}),"
+                  f"不比较延迟和内存")
+        regressions = compare(current, baseline, timing=args.check_timing)
+        if regressions:
+            print(f"\n与基准 {args.baseline} 相比有{len(regressions)}项回退:")
+            for line in regressions:
+                print('  ' + line)
+            sys.exit(1)
+        print(f"与基准 {args.baseline} 相比没有回退")
@@ -0,0 +1,296 @@
+"""
+    代码主要功能:
+    收缩层次(Contraction Hierarchies)预处理与查询。
+    - 预处理: 按"边差"等指标的惰性更新顺序逐个收缩节点,
+      若两个邻居之间没有不经过被收缩节点的更短路径(见证搜索),就加一条捷径边
+    - 查询: 只沿"向上"的边做双向Dijkstra,最后把捷径递归展开回原始边序列,
+      因此仍然可以用原图的折点拼出详细路径
+    - 预处理结果可以保存到图快照目录,启动时直接读取
+
+    预处理: python contraction.py [map_nodes.csv distance_final.csv graph_snapshot]
+"""
+import heapq
+import json
+import os
+import time
+
+import numpy as np
+
+from graph_snapshot import read_meta, save_array, save_json
+
+CH_META = 'ch.json'
+# 见证搜索最多结算的节点数,越大捷径越少但预处理越慢
+WITNESS_SETTLE_LIMIT = 50
+# 启动时允许现场预处理的最大边数和最大节点度数,更大或更稠密的图请先离线运行本文件。
+# 预处理耗时主要由度数决定:map_dis生成的完全图29个节点约0.7秒,60个节点约16秒
+CH_BUILD_MAX_EDGES = 2000
+CH_BUILD_MAX_DEGREE = 32
+
+
+class ContractionHierarchy:
+    def __init__(self, rank, up_offsets, up_targets, up_weights, up_middle):
+        self.rank = rank                # int32 (n,) 节点的收缩次序
+        self.up_offsets = up_offsets    # int64 (n + 1,) 向上图的CSR
+        self.up_targets = up_targets    # int32 向上邻居(rank更高)
+        self.up_weights = up_weights    # float64
+        self.up_middle = up_middle      # int32 捷径的中间节点,原始边为-1
+
+    @property
+    def n(self):
+        return len(self.rank)
+
+    @property
+    def shortcut_count(self):
+        return int(np.count_nonzero(np.asarray(self.up_middle) >= 0))
+
+    @classmethod
+    def build(cls, core, witness_limit=WITNESS_SETTLE_LIMIT):
+        """收缩所有节点,生成向上图"""
+        n = core.n
+        # 工作用的邻接表: adj[v][u] = (权重, 中间节点)
+        adj = [dict() for _ in range(n)]
+        for v in range(n):
+            targets, weights = core.neighbors(v)
+            for u, w in zip(targets, weights):
+                old = adj[v].get(u)
+                if old is None or w < old[0]:
+                    adj[v][u] = (w, -1)
+
+        contracted = [False] * n
+        level = [0] * n
+        rank = [0] * n
+
+        def witness(source, skip, limit, max_dist):
+            """不经过skip节点,从source出发的受限Dijkstra"""
+            dist = {source: 0.0}
+            pq = [(0.0, source)]
+            settled = 0
+            while pq and settled < witness_limit:
+                d, x = heapq.heappop(pq)
+                if d > dist.get(x, float('inf')):
+                    continue
+                settled += 1
+                if d > max_dist:
+                    break
+                for y, (w, _) in adj[x].items():
+                    if y == skip or contracted[y]:
+                        continue
+                    nd = d + w
+                    if nd < dist.get(y, float('inf')) and nd <= limit:
+                        dist[y] = nd
+                        heapq.heappush(pq, (nd, y))
+            return dist
+
+        def shortcuts_of(v):
+            """收缩v需要添加的捷径列表[(u, x, 权重)]"""
+            nbrs = [(u, w) for u, (w, _) in adj[v].items() if not contracted[u]]
+            result = []
+            for i, (u, wu) in enumerate(nbrs):
+                rest = nbrs[i + 1:]
+                if not rest:
+                    continue
+                max_out = max(wx for _, wx in rest)
+                dist = witness(u, v, wu + max_out, wu + max_out)
+                for x, wx in rest:
+                    via = wu + wx
+                    if dist.get(x, float('inf')) > via:
+                        result.append((u, x, via))
+            return result
+
+        def priority(v):
+            degree = sum(1 for u in adj[v] if not contracted[u])
+            return len(shortcuts_of(v)) - degree + level[v]
+
+        pq = [(priority(v), v) for v in range(n)]
+        heapq.heapify(pq)
+        order = 0
+        while pq:
+            _, v = heapq.heappop(pq)
+            if contracted[v]:
+                continue
+            # 惰性更新: 优先级变大就放回去重新排
+            p = priority(v)
+            if pq and p > pq[0][0]:
+                heapq.heappush(pq, (p, v))
+                continue
+
+            for u, x, w in shortcuts_of(v):
+                for a, b in ((u, x), (x, u)):
+                    old = adj[a].get(b)
+                    if old is None or w < old[0]:
+                        adj[a][b] = (w, v)
+            for u in adj[v]:
+                if not contracted[u]:
+                    level[u] = max(level[u], level[v] + 1)
+            contracted[v] = True
+            rank[v] = order
+            order += 1
+
+        # 只保留指向更高rank的边,得到向上图
+        rank = np.asarray(rank, dtype=np.int32)
+        counts = np.zeros(n, dtype=np.int64)
+        rows = []
+        for v in range(n):
+            up = sorted((u, w, mid) for u, (w, mid) in adj[v].items() if rank[u] > rank[v])
+            rows.append(up)
+            counts[v] = len(up)
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        flat = [e for row in rows for e in row]
+        return cls(rank,
+                   offsets,
+                   np.array([e[0] for e in flat], dtype=np.int32),
+                   np.array([e[1] for e in flat], dtype=np.float64),
+                   np.array([e[2] for e in flat], dtype=np.int32))
+
+    def _up_edges(self, v):
+        a, b = self.up_offsets[v], self.up_offsets[v + 1]
+        return zip(self.up_targets[a:b].tolist(), self.up_weights[a:b].tolist())
+
+    def _up_edge(self, v, u):
+        """查找v到u(rank更高)的向上边,返回(权重, 中间节点)"""
+        a, b = int(self.up_offsets[v]), int(self.up_offsets[v + 1])
+        k = a + int(np.searchsorted(self.up_targets[a:b], u))
+        return float(self.up_weights[k]), int(self.up_middle[k])
+
+    def _unpack(self, a, b, out):
+        """把捷径a-b递归展开为原始边,依次追加到out(不含a)"""
+        stack = [(a, b)]
+        while stack:
+            x, y = stack.pop()
+            lo, hi = (x, y) if self.rank[x] < self.rank[y] else (y, x)
+            _, mid = self._up_edge(lo, hi)
+            if mid < 0:
+                out.append(y)
+            else:
+                # 先展开x-mid,再展开mid-y
+                stack.append((mid, y))
+                stack.append((x, mid))
+
+    def query(self, s, t):
+        """返回(下标路径, 距离, 结算节点数),不连通时路径为None"""
+        if s == t:
+            return [s], 0.0, 1
+        dist = ({s: 0.0}, {t: 0.0})
+        parent = ({s: -1}, {t: -1})
+        pqs = ([(0.0, s)], [(0.0, t)])
+        done = (set(), set())
+        best = float('inf')
+        meet = -1
+        settled = 0
+        while pqs[0] or pqs[1]:
+            # 两侧堆顶都不小于当前最优值时结束
+            tops = [pq[0][0] if pq else float('inf') for pq in pqs]
+            if min(tops) >= best:
+                break
+            side = 0 if tops[0] <= tops[1] else 1
+            d, v = heapq.heappop(pqs[side])
+            if v in done[side] or d > dist[side][v]:
+                continue
+            done[side].add(v)
+            settled += 1
+            other = dist[1 - side].get(v)
+            if other is not None and d + other < best:
+                best = d + other
+                meet = v
+            for u, w in self._up_edges(v):
+                nd = d + w
+                if nd < dist[side].get(u, float('inf')):
+                    dist[side][u] = nd
+                    parent[side][u] = v
+                    heapq.heappush(pqs[side], (nd, u))
+
+        if meet < 0:
+            return None, float('inf'), settled
+
+        # 先得到向上图中的路径(含捷径),再逐段展开
+        up_path = [meet]
+        while parent[0][up_path[-1]] != -1:
+            up_path.append(parent[0][up_path[-1]])
+        up_path.reverse()
+        v = meet
+        while parent[1][v] != -1:
+            v = parent[1][v]
+            up_path.append(v)
+
+        path = [up_path[0]]
+        for a, b in zip(up_path, up_path[1:]):
+            self._unpack(a, b, path)
+        return path, best, settled
+
+    def save(self, snapshot_dir):
+        for name in ('rank', 'up_offsets', 'up_targets', 'up_weights', 'up_middle'):
+            save_array(os.path.join(snapshot_dir, 'ch_' + name + '.npy'), getattr(self, name))
+        meta = read_meta(snapshot_dir) or {}
+        save_json(os.path.join(snapshot_dir, CH_META),
+                  {'n': self.n, 'shortcuts': self.shortcut_count,
+                   'snapshot_created': meta.get('created')})
+
+    @classmethod
+    def load(cls, snapshot_dir, mmap=True):
+        """从快照目录读取预处理结果,不存在或与快照不匹配返回None"""
+        path = os.path.join(snapshot_dir, CH_META)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            ch_meta = json.load(f)
+        meta = read_meta(snapshot_dir) or {}
+        if ch_meta.get('snapshot_created') != meta.get('created') \
+                or ch_meta.get('n') != meta.get('n'):
+            return None
+        mode = 'r' if mmap else None
+        arrays = [np.load(os.path.join(snapshot_dir, 'ch_' + name + '.npy'), mmap_mode=mode)
+                  for name in ('rank', 'up_offsets', 'up_targets', 'up_weights', 'up_middle')]
+        return cls(*arrays)
+
+
+def can_build_online(core, max_edges=CH_BUILD_MAX_EDGES, max_degree=CH_BUILD_MAX_DEGREE):
+    """图是否小且稀疏到可以在加载时现场预处理"""
+    if core.m > max_edges:
+        return False
+    return core.n == 0 or int(np.diff(core.offsets).max()) <= max_degree
+
+
+def load_or_build_ch(core, snapshot_dir=None, max_edges=CH_BUILD_MAX_EDGES,
+                     max_degree=CH_BUILD_MAX_DEGREE):
+    """优先读快照里的预处理结果;没有时只对小而稀疏的图现场预处理(并写回快照)"""
+    if core is None:
+        return None
+    if snapshot_dir and os.path.isdir(snapshot_dir):
+        ch = ContractionHierarchy.load(snapshot_dir)
+        if ch is not None and ch.n == core.n:
+            return ch
+    if not can_build_online(core, max_edges, max_degree):
+        return None
+    ch = ContractionHierarchy.build(core)
+    if snapshot_dir and os.path.isdir(snapshot_dir):
+        try:
+            ch.save(snapshot_dir)
+        except OSError:
+            pass
+    return ch
+
+
+if __name__ == '__main__':
+    import sys
+    from graph_snapshot import SNAPSHOT_DIR, export_snapshot, load_snapshot, snapshot_is_fresh
+    from graph_loader import load_graph
+
+    if len(sys.argv) < 3:
+        nodes_file = 'map_nodes.csv'
+        edges_file = 'distance_final.csv'
+    else:
+        nodes_file = sys.argv[1]
+        edges_file = sys.argv[2]
+    out_dir = sys.argv[3] if len(sys.argv) > 3 else SNAPSHOT_DIR
+
+    # 预处理结果依附于快照,快照过期时先重新导出
+    if not snapshot_is_fresh(out_dir, nodes_file, edges_file):
+        export_snapshot(load_graph(nodes_file, edges_file), out_dir,
+                        sources=[nodes_file, edges_file])
+    graph = load_snapshot(out_dir)
+    t0 = time.time()
+    ch = ContractionHierarchy.build(graph)
+    ch.save(out_dir)
+    print(f"收缩完成: {graph.n}个节点, 新增{ch.shortcut_count}条捷径, "
+          f"耗时{(time.time() - t0) * 1000:.1f}毫秒")
@@ -1,263 +1,363 @@
-import pandas as pd
-import heapq
-import json
-
-class DijkstraNavigator:
-    def __init__(self):
-        self.nodes = {}
-        self.edges = {}
-        self.coords = {}
-        self.edge_paths = {}  # 存储边的详细路径（包含折点）
-        
-    def load_nodes(self, nodes_csv):
-        """加载节点数据"""
-        df = pd.read_csv(nodes_csv, encoding='utf-8-sig')
-        for _, row in df.iterrows():
-            node_id = int(row['node_id'])
-            self.nodes[node_id] = row['name']
-            self.coords[node_id] = (float(row['longitude']), float(row['latitude']))
-            self.edges[node_id] = {}
-        return self
-    
-    def load_edges(self, edges_csv):
-        """加载边数据，包括道路折点信息"""
-        df = pd.read_csv(edges_csv, encoding='utf-8-sig')
-        edge_count = 0
-        
-        for _, row in df.iterrows():
-            # 识别起点和终点列名
-            if 'node1' in df.columns and 'node2' in df.columns:
-                from_id = int(row['node1'])
-                to_id = int(row['node2'])
-            elif 'from' in df.columns and 'to' in df.columns:
-                from_id = int(row['from'])
-                to_id = int(row['to'])
-            elif 'start' in df.columns and 'end' in df.columns:
-                from_id = int(row['start'])
-                to_id = int(row['end'])
-            else:
-                from_id = int(row.iloc[0])
-                to_id = int(row.iloc[1])
-            
-            # 获取距离
-            if 'distance' in df.columns:
-                dist = float(row['distance'])
-            elif 'length' in df.columns:
-                dist = float(row['length'])
-            elif 'weight' in df.columns:
-                dist = float(row['weight'])
-            else:
-                dist = float(row.iloc[2])
-            
-            # 添加双向边
-            self.edges[from_id][to_id] = dist
-            self.edges[to_id][from_id] = dist
-            edge_count += 1
-            
-            # 加载道路折点信息
-            path_points = None
-            if 'waypoints' in df.columns:
-                path_points = self._parse_path_points(row['waypoints'])
-            
-            # 存储边的详细路径
-            if path_points and len(path_points) > 0:
-                self.edge_paths[(from_id, to_id)] = path_points
-                self.edge_paths[(to_id, from_id)] = path_points[::-1]  # 反向路径
-            else:
-                # 如果没有折点，用节点坐标作为直线连接
-                lon1, lat1 = self.coords[from_id]
-                lon2, lat2 = self.coords[to_id]
-                self.edge_paths[(from_id, to_id)] = [[lon1, lat1], [lon2, lat2]]
-                self.edge_paths[(to_id, from_id)] = [[lon2, lat2], [lon1, lat1]]
-        
-        return self
-    
-    def _parse_path_points(self, path_str):
-        """解析路径点字符串"""
-        if not path_str or pd.isna(path_str):
-            return None
-        try:
-            # JSON格式: [[lon1, lat1], [lon2, lat2], ...]
-            if isinstance(path_str, str) and path_str.startswith('['):
-                return json.loads(path_str)
-            # 分号分隔格式: "lon1,lat1;lon2,lat2;..."
-            if isinstance(path_str, str) and ';' in path_str:
-                points = []
-                for point_str in path_str.split(';'):
-                    coords = [float(x.strip()) for x in point_str.split(',')]
-                    points.append(coords)
-                return points
-            return None
-        except Exception as e:
-            return None
-    
-    def _build_detailed_path(self, node_path):
-        """构建包含所有折点的详细路径"""
-        detailed_coords = []
-        
-        for i in range(len(node_path) - 1):
-            from_node = node_path[i]
-            to_node = node_path[i + 1]
-            
-            # 获取这条边的详细路径点
-            edge_path = self.edge_paths.get((from_node, to_node))
-            
-            if edge_path:
-                if i == 0:
-                    # 第一条边，添加所有点
-                    detailed_coords.extend(edge_path)
-                else:
-                    # 后续边，跳过第一个点（避免重复）
-                    detailed_coords.extend(edge_path[1:])
-            else:
-                # 如果没有存储的路径，使用节点坐标
-                lon1, lat1 = self.coords[from_node]
-                lon2, lat2 = self.coords[to_node]
-                if i == 0:
-                    detailed_coords.append([lon1, lat1])
-                detailed_coords.append([lon2, lat2])
-        
-        return detailed_coords
-    
-    def find_path(self, start, end):
-        """使用Dijkstra算法查找最短路径"""
-        import time
-        start_time = time.time()
-        
-        # 节点存在性检查
-        if start not in self.nodes or end not in self.nodes:
-            return {
-                'success': False, 
-                'error': f'节点不存在: start={start}, end={end}', 
-                'path': None
-            }
-        
-        # 检查起点是否有邻居
-        if not self.edges.get(start):
-            return {
-                'success': False, 
-                'error': f'起点{start}({self.nodes[start]})没有任何连接的边', 
-                'path': None
-            }
-        
-        # 检查终点是否有邻居
-        if not self.edges.get(end):
-            return {
-                'success': False, 
-                'error': f'终点{end}({self.nodes[end]})没有任何连接的边', 
-                'path': None
-            }
-        
-        # 初始化Dijkstra算法
-        distances = {node: float('inf') for node in self.nodes}
-        distances[start] = 0
-        previous = {node: None for node in self.nodes}
-        pq = [(0, start)]  # 优先队列: (距离, 节点)
-        visited = set()
-        
-        # Dijkstra主循环
-        while pq:
-            current_dist, current = heapq.heappop(pq)
-            
-            # 如果节点已访问，跳过
-            if current in visited:
-                continue
-            visited.add(current)
-            
-            # 如果到达终点，提前结束
-            if current == end:
-                break
-            
-            # 松弛操作：检查所有邻居
-            for neighbor, weight in self.edges[current].items():
-                if neighbor in visited:
-                    continue
-                    
-                new_dist = current_dist + weight
-                if new_dist < distances[neighbor]:
-                    distances[neighbor] = new_dist
-                    previous[neighbor] = current
-                    heapq.heappush(pq, (new_dist, neighbor))
-        
-        # 计算执行时间
-        exec_time = (time.time() - start_time) * 1000
-        
-        # 检查是否找到路径
-        if distances[end] == float('inf'):
-            return {
-                'success': False, 
-                'error': f'从节点{start}({self.nodes[start]})到节点{end}({self.nodes[end]})不连通',
-                'path': None,
-                'visited_nodes': len(visited)
-            }
-        
-        # 重建路径（从终点回溯到起点）
-        path = []
-        current = end
-        while current is not None:
-            path.append(current)
-            current = previous[current]
-        path.reverse()
-        
-        # 构建详细路径（包含所有折点）
-        detailed_coords = self._build_detailed_path(path)
-        
-        # 转换坐标格式 [lon, lat] -> [lat, lon] 以适配Leaflet地图
-        coords_path = [[coord[1], coord[0]] for coord in detailed_coords]
-        
-        # 返回结果
-        return {
-            'success': True,
-            'algorithm': 'Dijkstra',
-            'path': path,
-            'path_names': [self.nodes[node_id] for node_id in path],
-            'distance': round(distances[end], 2),
-            'execution_time': round(exec_time, 2),
-            'path_coords': coords_path,  # 包含所有折点的完整路径
-            'node_count': len(path),  # 主要节点数
-            'waypoint_count': len(coords_path),  # 路径点总数（包括折点）
-            'visited_nodes': len(visited)  # 算法访问的节点数
-        }
-
-# 全局导航器实例
-nav = DijkstraNavigator()
-
-def init_dijkstra(nodes_csv, edges_csv):
-    """初始化Dijkstra导航器"""
-    try:
-        nav.load_nodes(nodes_csv).load_edges(edges_csv)
-        return nav
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        return None
-
-def dijkstra_find_path(navigator, start, end):
-    """提供给Flask调用的接口函数"""
-    return navigator.find_path(start, end)
-
-# 兼容旧版本的函数名
-def find_path(start, end):
-    """直接使用全局导航器查找路径"""
-    return nav.find_path(start, end)
-
-# 测试代码
-if __name__ == '__main__':
-    import sys
-    
-    if len(sys.argv) < 3:
-        nodes_file = 'map_nodes.csv'
-        edges_file = 'distance_final.csv'
-    else:
-        nodes_file = sys.argv[1]
-        edges_file = sys.argv[2]
-    
-    # 初始化
-    navigator = init_dijkstra(nodes_file, edges_file)
-    
-    if navigator and len(navigator.nodes) >= 2:
-        # 测试路径查找
-        node_ids = list(navigator.nodes.keys())
-        start = node_ids[0]
-        end = node_ids[-1]
-        result = navigator.find_path(start, end)
+import heapq
+import time
+import numpy as np
+from graph_core import NodeNames, parse_path_points
+from graph_loader import build_graph, read_edges, read_nodes
+from pqueue import QUEUE_TYPES, make_queue
+from search_workspace import acquire_workspace, release_workspace
+
+def shortest_distances(core, source, targets=None):
+    """从下标source出发的单源Dijkstra，返回各节点距离数组（不连通为inf）。
+    给定targets时，所有目标都结算后立即停止，其余节点的距离不保证是最短"""
+    distances = [float('inf')] * core.n
+    distances[source] = 0.0
+    remaining = set(targets) if targets is not None else None
+    pq = [(0.0, source)]
+    while pq:
+        current_dist, current = heapq.heappop(pq)
+        if current_dist > distances[current]:
+            continue
+        if remaining is not None:
+            remaining.discard(current)
+            if not remaining:
+                break
+        targets_, weights = core.neighbors(current)
+        for neighbor, weight in zip(targets_, weights):
+            new_dist = current_dist + weight
+            if new_dist < distances[neighbor]:
+                distances[neighbor] = new_dist
+                heapq.heappush(pq, (new_dist, neighbor))
+    return np.array(distances)
+
+class DijkstraNavigator:
+    def __init__(self, core=None, queue='heap'):
+        if queue not in QUEUE_TYPES:
+            raise ValueError(f'未知的优先队列类型: {queue}, 可选 {QUEUE_TYPES}')
+        self.queue = queue  # find_path使用的优先队列类型
+        self.core = None
+        self.nodes = {}
+        self.table = None
+        self.ch = None
+        self._pending_nodes = None
+        if core is not None:
+            self.use_graph(core)
+
+    def use_graph(self, core):
+        """绑定共享的只读CSR图"""
+        self.core = core
+        self.nodes = NodeNames(core)
+        return self
+        
+    def load_nodes(self, nodes_csv):
+        """加载节点数据"""
+        # 节点先暂存,等边加载完成后一起构建CSR
+        self._pending_nodes = read_nodes(nodes_csv)
+        return self
+    
+    def load_edges(self, edges_csv):
+        """加载边数据，包括道路折点信息"""
+        node_table = self._pending_nodes
+        self._pending_nodes = None
+        return self.use_graph(build_graph(node_table, read_edges(edges_csv)))
+    
+    def _parse_path_points(self, path_str):
+        """解析路径点字符串"""
+        return parse_path_points(path_str)
+    
+    def _build_detailed_path(self, node_path):
+        """构建包含所有折点的详细路径"""
+        idx_path = [self.core.index_of(node_id) for node_id in node_path]
+        return self.core.build_detailed_path(idx_path)
+    
+    def _check_endpoints(self, start, end):
+        """检查起终点，返回(起点下标, 终点下标, 错误结果)"""
+        core = self.core
+        
+        # 节点存在性检查
+        s = core.index_of(start) if core is not None else None
+        t = core.index_of(end) if core is not None else None
+        if s is None or t is None:
+            return None, None, {
+                'success': False, 
+                'error': f'节点不存在: start={start}, end={end}', 
+                'path': None
+            }
+        
+        # 检查起点是否有邻居
+        if core.degree(s) == 0:
+            return None, None, {
+                'success': False, 
+                'error': f'起点{start}({core.name(s)})没有任何连接的边', 
+                'path': None
+            }
+        
+        # 检查终点是否有邻居
+        if core.degree(t) == 0:
+            return None, None, {
+                'success': False, 
+                'error': f'终点{end}({core.name(t)})没有任何连接的边', 
+                'path': None
+            }
+        return s, t, None
+    
+    def _path_result(self, idx_path, distance, start_time, visited_count, algorithm, detailed=True):
+        """把下标路径整理成接口返回的结果字典；detailed为False时不拼接折点，path_coords为空"""
+        core = self.core
+        path = [core.node_id(i) for i in idx_path]
+        
+        # 构建详细路径（包含所有折点）
+        detailed_coords = core.build_detailed_path(idx_path) if detailed else []
+        
+        # 转换坐标格式 [lon, lat] -> [lat, lon] 以适配Leaflet地图
+        coords_path = [[coord[1], coord[0]] for coord in detailed_coords]
+        
+        # 计算执行时间
+        exec_time = (time.time() - start_time) * 1000
+        
+        return {
+            'success': True,
+            'algorithm': algorithm,
+            'path': path,
+            'path_names': [core.name(i) for i in idx_path],
+            'distance': round(distance, 2),
+            'execution_time': round(exec_time, 2),
+            'path_coords': coords_path,  # 包含所有折点的完整路径
+            'node_count': len(path),  # 主要节点数
+            'waypoint_count': len(coords_path),  # 路径点总数（包括折点）
+            'visited_nodes': visited_count  # 算法访问的节点数
+        }
+    
+    def _unreachable(self, s, t, visited_count):
+        core = self.core
+        return {
+            'success': False, 
+            'error': f'从节点{core.node_id(s)}({core.name(s)})到节点{core.node_id(t)}({core.name(t)})不连通',
+            'path': None,
+            'visited_nodes': visited_count
+        }
+    
+    def find_path(self, start, end, detailed=True):
+        """使用Dijkstra算法查找最短路径"""
+        start_time = time.time()
+        s, t, error = self._check_endpoints(start, end)
+        if error:
+            return error
+        core = self.core
+        
+        # 初始化Dijkstra算法：从空闲列表取一个工作区，不再为全图分配字典；查询结束时归还
+        ws = acquire_workspace(core.n)
+        gen = ws.begin()
+        distances, previous, stamp, closed = ws.dist, ws.prev, ws.stamp, ws.closed
+        distances[s] = 0
+        previous[s] = -1
+        stamp[s] = gen
+        pq = make_queue(self.queue, core)  # 优先队列: (距离, 节点下标)
+        pq.push(0.0, s)
+        visited_count = 0
+        
+        # Dijkstra主循环
+        while pq:
+            current_dist, current = pq.pop()
+            
+            # 如果节点已访问，跳过
+            if closed[current] == gen:
+                continue
+            closed[current] = gen
+            visited_count += 1
+            
+            # 如果到达终点，提前结束
+            if current == t:
+                break
+            
+            # 松弛操作：检查所有邻居
+            targets, weights = core.neighbors(current)
+            for neighbor, weight in zip(targets, weights):
+                if closed[neighbor] == gen:
+                    continue
+                    
+                new_dist = current_dist + weight
+                if stamp[neighbor] != gen or new_dist < distances[neighbor]:
+                    distances[neighbor] = new_dist
+                    previous[neighbor] = current
+                    stamp[neighbor] = gen
+                    pq.push(new_dist, neighbor)
+        
+        # 检查是否找到路径
+        found = closed[t] == gen
+        # 重建路径（从终点回溯到起点）
+        idx_path = ws.path_to(t) if found else None
+        total = distances[t]
+        release_workspace(ws)
+        if not found:
+            return self._unreachable(s, t, visited_count)
+        
+        result = self._path_result(idx_path, total, start_time, visited_count, 'Dijkstra', detailed)
+        result['queue_pushes'] = pq.pushes  # 优先队列入队/出队次数，供基准测试比较
+        result['queue_pops'] = pq.pops
+        return result
+    
+    def find_path_bidirectional(self, start, end, detailed=True):
+        """双向Dijkstra：从起点和终点同时搜索，两侧相遇后按堆顶之和判断停止"""
+        start_time = time.time()
+        s, t, error = self._check_endpoints(start, end)
+        if error:
+            return error
+        core = self.core
+        if s == t:
+            return self._path_result([s], 0, start_time, 1, 'BiDijkstra', detailed)
+        
+        # 下标0为正向（从起点），1为反向（从终点）
+        distances = ({s: 0}, {t: 0})
+        previous = ({}, {})
+        visited = (set(), set())
+        pqs = ([(0, s)], [(0, t)])
+        pushes, pops = 2, 0  # 两个方向合计的入堆/出堆次数
+        best = float('inf')
+        meet = None
+        
+        while pqs[0] and pqs[1]:
+            # 停止条件：两侧堆顶距离之和已不小于当前最短路径
+            if pqs[0][0][0] + pqs[1][0][0] >= best:
+                break
+            # 扩展堆较小的一侧
+            side = 0 if len(pqs[0]) <= len(pqs[1]) else 1
+            current_dist, current = heapq.heappop(pqs[side])
+            pops += 1
+            if current in visited[side]:
+                continue
+            visited[side].add(current)
+            
+            dist_side, dist_other = distances[side], distances[1 - side]
+            targets, weights = core.neighbors(current)
+            for neighbor, weight in zip(targets, weights):
+                if neighbor in visited[side]:
+                    continue
+                new_dist = current_dist + weight
+                if new_dist < dist_side.get(neighbor, float('inf')):
+                    dist_side[neighbor] = new_dist
+                    previous[side][neighbor] = current
+                    heapq.heappush(pqs[side], (new_dist, neighbor))
+                    pushes += 1
+                # 两侧都到达过的节点构成一条候选路径
+                if neighbor in dist_other and dist_side[neighbor] + dist_other[neighbor] < best:
+                    best = dist_side[neighbor] + dist_other[neighbor]
+                    meet = neighbor
+        
+        visited_count = len(visited[0] | visited[1])
+        if meet is None:
+            return self._unreachable(s, t, visited_count)
+        
+        # 正向回溯到起点，反向回溯到终点，在相遇点拼接
+        idx_path = [meet]
+        while idx_path[-1] != s:
+            idx_path.append(previous[0][idx_path[-1]])
+        idx_path.reverse()
+        current = meet
+        while current != t:
+            current = previous[1][current]
+            idx_path.append(current)
+        
+        result = self._path_result(idx_path, best, start_time, visited_count, 'BiDijkstra', detailed)
+        result['queue_pushes'] = pushes
+        result['queue_pops'] = pops
+        return result
+    
+    def distance_matrix(self, sources, targets, pool=None, workers=None):
+        """多对多距离矩阵：每个起点做一次Dijkstra，目标全部结算后停止。
+        给定pool（QueryPool）时按起点分块交给它常驻的工作进程并行计算，workers为最多分几块。
+        返回(len(sources), len(targets))数组，不连通为inf"""
+        core = self.core
+        missing = [nid for nid in list(sources) + list(targets) if core.index_of(nid) is None]
+        if missing:
+            raise KeyError(f'节点不存在: {missing[:5]}')
+        src_idx = [core.index_of(nid) for nid in sources]
+        dst_idx = [core.index_of(nid) for nid in targets]
+        if not src_idx or not dst_idx:
+            return np.zeros((len(src_idx), len(dst_idx)))
+        
+        if pool is None or len(src_idx) == 1:
+            rows = [shortest_distances(core, s, dst_idx)[dst_idx] for s in src_idx]
+            return np.vstack(rows)
+        return np.vstack(pool.matrix_rows(src_idx, dst_idx, workers))
+    
+    def attach_table(self, table):
+        """挂载全源最短路表，传None表示关闭查表模式"""
+        self.table = table
+        return self
+    
+    def find_path_table(self, start, end, detailed=True):
+        """查表回答最短路查询，没有可用的表时退回实时Dijkstra"""
+        if self.table is None:
+            return self.find_path(start, end, detailed)
+        start_time = time.time()
+        s, t, error = self._check_endpoints(start, end)
+        if error:
+            return error
+        idx_path = self.table.idx_path(s, t)
+        if idx_path is None:
+            return self._unreachable(s, t, 0)
+        # 查表不需要搜索，访问节点数为0
+        return self._path_result(idx_path, self.table.distance(s, t), start_time, 0, 'APSP', detailed)
+
+    def attach_ch(self, ch):
+        """挂载收缩层次预处理结果，传None表示关闭"""
+        self.ch = ch
+        return self
+    
+    def find_path_ch(self, start, end, detailed=True):
+        """用收缩层次回答查询，捷径展开为原始边后再拼接折点；没有预处理结果时退回实时Dijkstra"""
+        if self.ch is None:
+            return self.find_path(start, end, detailed)
+        start_time = time.time()
+        s, t, error = self._check_endpoints(start, end)
+        if error:
+            return error
+        idx_path, distance, settled = self.ch.query(s, t)
+        if idx_path is None:
+            return self._unreachable(s, t, settled)
+        return self._path_result(idx_path, distance, start_time, settled, 'CH', detailed)
+
+# 全局导航器实例
+nav = DijkstraNavigator()
+
+def init_dijkstra(nodes_csv, edges_csv, core=None):
+    """初始化Dijkstra导航器，传入core时直接复用已加载的图"""
+    try:
+        if core is not None:
+            return nav.use_graph(core)
+        nav.load_nodes(nodes_csv).load_edges(edges_csv)
+        return nav
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return None
+
+def dijkstra_find_path(navigator, start, end, detailed=True):
+    """提供给Flask调用的接口函数"""
+    return navigator.find_path(start, end, detailed)
+
+# 兼容旧版本的函数名
+def find_path(start, end):
+    """直接使用全局导航器查找路径"""
+    return nav.find_path(start, end)
+
+# 测试代码
+if __name__ == '__main__':
+    import sys
+    
+    if len(sys.argv) < 3:
+        nodes_file = 'map_nodes.csv'
+        edges_file = 'distance_final.csv'
+    else:
+        nodes_file = sys.argv[1]
+        edges_file = sys.argv[2]
+    
+    # 初始化
+    navigator = init_dijkstra(nodes_file, edges_file)
+    
+    if navigator and len(navigator.nodes) >= 2:
+        # 测试路径查找
+        node_ids = list(navigator.nodes.keys())
+        start = node_ids[0]
+        end = node_ids[-1]
+        result = navigator.find_path(start, end)
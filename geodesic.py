@@ -0,0 +1,68 @@
+"""
+    代码主要功能:
+    共享的球面距离(Haversine)计算。
+    - haversine / haversine_matrix: numpy批量计算,支持广播的逐对计算和全组合矩阵
+    - GeoIndex: 对一张图预先算好各节点的弧度坐标和cos(纬度),
+      A*的启发函数只需缓存终点的三角函数值,每次估价只剩一次sin/asin
+"""
+import math
+from array import array
+
+import numpy as np
+
+# 地球半径(米)
+EARTH_RADIUS = 6371000
+
+
+def haversine(lon1, lat1, lon2, lat2):
+    """逐对计算球面距离,参数可以是标量或可广播的数组"""
+    lon1, lat1, lon2, lat2 = map(np.radians, (lon1, lat1, lon2, lat2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 \
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def haversine_matrix(lons, lats):
+    """所有节点两两之间的距离矩阵 (n, n)"""
+    lons = np.asarray(lons, dtype=np.float64)
+    lats = np.asarray(lats, dtype=np.float64)
+    return haversine(lons[:, None], lats[:, None], lons[None, :], lats[None, :])
+
+
+class GeoIndex:
+    def __init__(self, coords):
+        coords = np.asarray(coords, dtype=np.float64)
+        lon_r = np.radians(coords[:, 0])
+        lat_r = np.radians(coords[:, 1])
+        cos_lat = np.cos(lat_r)
+        # numpy数组用于批量计算,array('d')用于逐个取值(比numpy标量索引快得多)
+        self.lon_r, self.lat_r, self.cos_lat = lon_r, lat_r, cos_lat
+        self._lon = array('d', lon_r.tobytes())
+        self._lat = array('d', lat_r.tobytes())
+        self._cos = array('d', cos_lat.tobytes())
+
+    def distance(self, i, j):
+        lon, lat, cos = self._lon, self._lat, self._cos
+        a = math.sin((lat[j] - lat[i]) / 2) ** 2 \
+            + cos[i] * cos[j] * math.sin((lon[j] - lon[i]) / 2) ** 2
+        return 2 * EARTH_RADIUS * math.asin(math.sqrt(min(a, 1.0)))
+
+    def heuristic_to(self, t):
+        """返回h(v) = v到t的球面距离,t的三角函数值只算一次"""
+        lon, lat, cos = self._lon, self._lat, self._cos
+        lon_t, lat_t, cos_t = lon[t], lat[t], cos[t]
+        sin, asin, sqrt = math.sin, math.asin, math.sqrt
+        scale = 2 * EARTH_RADIUS
+
+        def h(v):
+            a = sin((lat[v] - lat_t) / 2) ** 2 + cos[v] * cos_t * sin((lon[v] - lon_t) / 2) ** 2
+            return scale * asin(sqrt(min(a, 1.0)))
+        return h
+
+    def one_to_many(self, i, targets=None):
+        """i到targets(默认全部节点)的距离数组"""
+        idx = slice(None) if targets is None else np.asarray(targets)
+        dlat = self.lat_r[idx] - self.lat_r[i]
+        dlon = self.lon_r[idx] - self.lon_r[i]
+        a = np.sin(dlat / 2) ** 2 + self.cos_lat[i] * self.cos_lat[idx] * np.sin(dlon / 2) ** 2
+        return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
@@ -0,0 +1,262 @@
+"""
+    代码主要功能:
+    紧凑的数组化图结构(CSR),供A*与Dijkstra两个搜索类共享只读使用。
+    - 节点按连续下标0..n-1存储,原始node_id通过ids数组和index字典互相转换
+    - 邻接关系使用offsets/targets/weights三个数组,每个节点的邻居按下标排好序
+    - 坐标存放在(n, 2)的float64数组中,列顺序为[lon, lat]
+    - 折点按无向边只存一份原始字节(wp_buffer + wp_offsets),
+      只有路径真正经过某条边时才解码,解码结果放进有界的LRU缓存,反方向在取用时再翻转
+"""
+import json
+from collections.abc import Mapping
+
+import numpy as np
+
+from lru import LRUCache
+
+# 解码后的折点缓存条数
+WAYPOINT_CACHE_SIZE = 4096
+
+
+# 解析路径点字符串
+def parse_path_points(path_str):
+    if path_str is None or not isinstance(path_str, str) or not path_str:
+        return None
+    try:
+        # JSON格式: [[lon1, lat1], [lon2, lat2], ...]
+        if path_str.startswith('['):
+            return json.loads(path_str)
+        # 分号分隔格式: "lon1,lat1;lon2,lat2;..."
+        if ';' in path_str:
+            points = []
+            for point_str in path_str.split(';'):
+                coords = [float(x.strip()) for x in point_str.split(',')]
+                points.append(coords)
+            return points
+        return None
+    except Exception:
+        return None
+
+
+def pack_waypoints(items):
+    """把每条边的折点(原始字符串/点列表/None)打包为一段连续字节和偏移数组"""
+    chunks = []
+    for item in items:
+        if item is None or (not isinstance(item, str) and len(item) == 0):
+            chunks.append(b'')
+        elif isinstance(item, str):
+            chunks.append(item.encode('utf-8'))
+        else:
+            chunks.append(';'.join(f"{p[0]},{p[1]}" for p in item).encode('utf-8'))
+    offsets = np.zeros(len(chunks) + 1, dtype=np.int64)
+    np.cumsum([len(c) for c in chunks], out=offsets[1:])
+    buffer = np.frombuffer(b''.join(chunks), dtype=np.uint8)
+    return buffer, offsets
+
+
+class GraphCore:
+    def __init__(self, ids, names, coords, offsets, targets, weights,
+                 slot_edge, edge_u, edge_v, wp_buffer, wp_offsets, addresses=None,
+                 waypoint_cache_size=WAYPOINT_CACHE_SIZE):
+        self.ids = ids                        # int64 (n,) 下标 -> 原始node_id
+        self.names = names                    # list[str]
+        self.addresses = addresses if addresses is not None else [''] * len(names)
+        self.coords = coords                  # float64 (n, 2) [lon, lat]
+        self.offsets = offsets                # int64 (n + 1,)
+        self.targets = targets                # int32 (2m,) 邻居下标
+        self.weights = weights                # float64 (2m,) 边权
+        self.slot_edge = slot_edge            # int32 (2m,) 邻接槽位 -> 无向边编号
+        self.edge_u = edge_u                  # int32 (m,) 无向边的存储方向起点
+        self.edge_v = edge_v                  # int32 (m,)
+        self.wp_buffer = wp_buffer            # uint8 所有边折点字符串拼接成的字节
+        self.wp_offsets = wp_offsets          # int64 (m + 1,) 第e条边的折点位于[off[e], off[e+1])
+        self._wp_cache = LRUCache(waypoint_cache_size)
+        self.index = {nid: i for i, nid in enumerate(ids.tolist())}
+
+    def __getstate__(self):
+        # 解码缓存带锁,不能跨进程传递,到对端后重新创建
+        state = self.__dict__.copy()
+        state['_wp_cache'] = self._wp_cache.maxsize
+        return state
+
+    def __setstate__(self, state):
+        state['_wp_cache'] = LRUCache(state['_wp_cache'])
+        self.__dict__.update(state)
+
+    @property
+    def n(self):
+        return len(self.ids)
+
+    @property
+    def m(self):
+        return len(self.edge_u)
+
+    @classmethod
+    def from_arrays(cls, node_ids, names, coords, src_ids, dst_ids, weights,
+                    waypoints=None, addresses=None):
+        """由节点数组和无向边数组构建CSR图"""
+        ids = np.asarray(node_ids, dtype=np.int64)
+        n = len(ids)
+        coords = np.ascontiguousarray(coords, dtype=np.float64).reshape(n, 2)
+        src_ids = np.asarray(src_ids, dtype=np.int64)
+        dst_ids = np.asarray(dst_ids, dtype=np.int64)
+        w = np.asarray(weights, dtype=np.float64)
+        if waypoints is None:
+            waypoints = [None] * len(src_ids)
+
+        # 原始id -> 连续下标(向量化查找)
+        identity = n > 0 and ids[0] == 0 and ids[-1] == n - 1 and bool(np.all(np.diff(ids) == 1))
+        order = np.argsort(ids, kind='stable')
+        sorted_ids = ids[order]
+        if n and not identity and np.any(sorted_ids[1:] == sorted_ids[:-1]):
+            raise ValueError('节点表中存在重复的node_id')
+
+        def to_index(arr):
+            if identity:
+                # map_dis生成的node_id就是0..n-1,直接当作下标
+                if len(arr) and (arr.min() < 0 or arr.max() >= n):
+                    bad = arr[(arr < 0) | (arr >= n)]
+                    raise KeyError(f'边表引用了不存在的节点: {bad[:5].tolist()}')
+                return arr
+            pos = np.searchsorted(sorted_ids, arr)
+            pos = np.minimum(pos, max(n - 1, 0))
+            if n == 0 or not np.array_equal(sorted_ids[pos], arr):
+                missing = arr[(n == 0) | (sorted_ids[pos] != arr)] if n else arr
+                raise KeyError(f'边表引用了不存在的节点: {missing[:5].tolist()}')
+            return order[pos]
+
+        u = to_index(src_ids)
+        v = to_index(dst_ids)
+
+        # 去掉自环;同一对节点出现多次时保留最后一条,与原来字典覆盖的行为一致
+        keep = u != v
+        lo = np.minimum(u, v)
+        hi = np.maximum(u, v)
+        pair_key = np.where(keep, lo * max(n, 1) + hi, -1)
+        by_pair = np.argsort(pair_key, kind='stable')
+        sorted_key = pair_key[by_pair]
+        last = np.ones(len(sorted_key), dtype=bool)
+        last[:-1] = sorted_key[:-1] != sorted_key[1:]
+        last &= sorted_key >= 0
+        sel = np.sort(by_pair[last])
+
+        edge_u = u[sel].astype(np.int32)
+        edge_v = v[sel].astype(np.int32)
+        edge_w = w[sel]
+        wp_buffer, wp_offsets = pack_waypoints([waypoints[k] for k in sel.tolist()])
+        m = len(sel)
+
+        # 每条无向边展开为两个方向,按(起点, 终点)排序得到CSR
+        s = np.concatenate([edge_u, edge_v])
+        t = np.concatenate([edge_v, edge_u])
+        ww = np.concatenate([edge_w, edge_w])
+        e = np.concatenate([np.arange(m), np.arange(m)]).astype(np.int32)
+        perm = np.argsort(s.astype(np.int64) * max(n, 1) + t)
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(s, minlength=n), out=offsets[1:])
+
+        return cls(ids, list(names), coords, offsets,
+                   t[perm].astype(np.int32), ww[perm], e[perm],
+                   edge_u, edge_v, wp_buffer, wp_offsets,
+                   list(addresses) if addresses is not None else None)
+
+    def index_of(self, node_id):
+        """原始node_id -> 下标,不存在返回None"""
+        return self.index.get(node_id)
+
+    def has_node(self, node_id):
+        return node_id in self.index
+
+    def node_id(self, i):
+        return int(self.ids[i])
+
+    def degree(self, i):
+        return int(self.offsets[i + 1] - self.offsets[i])
+
+    def neighbors(self, i):
+        """返回(邻居下标列表, 边权列表)"""
+        a, b = self.offsets[i], self.offsets[i + 1]
+        return self.targets[a:b].tolist(), self.weights[a:b].tolist()
+
+    def edge_slot(self, i, j):
+        """在i的邻接表里二分查找j,返回槽位,不存在返回-1"""
+        a, b = int(self.offsets[i]), int(self.offsets[i + 1])
+        k = a + int(np.searchsorted(self.targets[a:b], j))
+        if k < b and self.targets[k] == j:
+            return k
+        return -1
+
+    def edge_weight(self, i, j):
+        k = self.edge_slot(i, j)
+        return float(self.weights[k]) if k >= 0 else float('inf')
+
+    def edge_waypoints(self, e):
+        """按需解码第e条无向边的折点(存储方向),没有折点返回None"""
+        a, b = int(self.wp_offsets[e]), int(self.wp_offsets[e + 1])
+        if a == b:
+            return None
+        points = self._wp_cache.get(e)
+        if points is None:
+            points = parse_path_points(bytes(self.wp_buffer[a:b]).decode('utf-8'))
+            # 无法解析的折点同样按直线处理,缓存空列表避免重复解析
+            points = points or []
+            self._wp_cache.put(e, points)
+        return points or None
+
+    def edge_path(self, i, j):
+        """获取从i走到j这条边的折点,方向与行走方向一致"""
+        k = self.edge_slot(i, j)
+        if k < 0:
+            return None
+        e = int(self.slot_edge[k])
+        points = self.edge_waypoints(e)
+        if not points:
+            # 没有折点,就用直线连接
+            return [self.coords[i].tolist(), self.coords[j].tolist()]
+        if self.edge_u[e] == i:
+            return points
+        return points[::-1]
+
+    def build_detailed_path(self, idx_path):
+        """由下标路径拼接出包含所有折点的详细路径"""
+        detailed_coords = []
+        for k in range(len(idx_path) - 1):
+            edge_path = self.edge_path(idx_path[k], idx_path[k + 1])
+            if edge_path:
+                if k == 0:
+                    # 第一条边,添加所有点
+                    detailed_coords.extend(edge_path)
+                else:
+                    # 后续边,跳过第一个点(避免重复)
+                    detailed_coords.extend(edge_path[1:])
+        return detailed_coords
+
+    def name(self, i):
+        return self.names[i]
+
+    def coord(self, i):
+        lon, lat = self.coords[i]
+        return (float(lon), float(lat))
+
+
+class NodeNames(Mapping):
+    """node_id -> 名称的只读视图,兼容原来的 graph.nodes 字典用法"""
+
+    def __init__(self, core):
+        self._core = core
+
+    def __getitem__(self, node_id):
+        i = self._core.index.get(node_id)
+        if i is None:
+            raise KeyError(node_id)
+        return self._core.names[i]
+
+    def __contains__(self, node_id):
+        return node_id in self._core.index
+
+    def __iter__(self):
+        return iter(self._core.index)
+
+    def __len__(self):
+        return self._core.n
+
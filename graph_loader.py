@@ -0,0 +1,116 @@
+"""
+    代码主要功能:
+    批量读取节点表和边表。列名只在读取时识别一次,
+    之后按整列转换为numpy数组,不再逐行iterrows。
+"""
+import numpy as np
+import pandas as pd
+
+from graph_core import GraphCore
+
+# 起点/终点列名的候选组合,按优先级排列
+EDGE_ENDPOINT_COLUMNS = [('node1', 'node2'), ('from', 'to'), ('start', 'end')]
+# 距离列名候选
+EDGE_WEIGHT_COLUMNS = ['distance', 'length', 'weight']
+WAYPOINT_COLUMN = 'waypoints'
+
+
+def resolve_edge_columns(columns):
+    """识别边表的列名,返回(起点列, 终点列, 距离列, 折点列或None)"""
+    columns = list(columns)
+    if len(columns) < 3:
+        raise ValueError(f'边表至少需要3列,实际只有: {columns}')
+    for a, b in EDGE_ENDPOINT_COLUMNS:
+        if a in columns and b in columns:
+            from_col, to_col = a, b
+            break
+    else:
+        # 找不到已知列名时,按位置取前两列
+        from_col, to_col = columns[0], columns[1]
+
+    dist_col = next((c for c in EDGE_WEIGHT_COLUMNS if c in columns), columns[2])
+    wp_col = WAYPOINT_COLUMN if WAYPOINT_COLUMN in columns else None
+    return from_col, to_col, dist_col, wp_col
+
+
+def read_nodes(nodes_csv):
+    """读取节点表,返回按列组织的字典"""
+    df = pd.read_csv(nodes_csv, encoding='utf-8-sig')
+    if 'address' in df.columns:
+        addresses = df['address'].fillna('').astype(str).tolist()
+    else:
+        addresses = [''] * len(df)
+    return {
+        'ids': df['node_id'].to_numpy(dtype=np.int64),
+        'names': df['name'].astype(str).tolist(),
+        'coords': np.column_stack([
+            df['longitude'].to_numpy(dtype=np.float64),
+            df['latitude'].to_numpy(dtype=np.float64),
+        ]),
+        'addresses': addresses,
+    }
+
+
+def read_edges(edges_csv):
+    """读取边表,返回按列组织的字典,折点保持原始字符串"""
+    df = pd.read_csv(edges_csv, encoding='utf-8-sig')
+    from_col, to_col, dist_col, wp_col = resolve_edge_columns(df.columns)
+    if wp_col is not None:
+        raw = df[wp_col].tolist()
+        waypoints = [w if isinstance(w, str) else None for w in raw]
+    else:
+        waypoints = None
+    return {
+        'src': df[from_col].to_numpy(dtype=np.int64),
+        'dst': df[to_col].to_numpy(dtype=np.int64),
+        'weights': df[dist_col].to_numpy(dtype=np.float64),
+        'waypoints': waypoints,
+    }
+
+
+def build_graph(node_table, edge_table):
+    """由读取好的节点表和边表构建CSR图"""
+    # 折点保持原始字符串打包存放,真正用到时才解析
+    return GraphCore.from_arrays(
+        node_table['ids'], node_table['names'], node_table['coords'],
+        edge_table['src'], edge_table['dst'], edge_table['weights'],
+        waypoints=edge_table['waypoints'], addresses=node_table['addresses'])
+
+
+# 加载节点表和边表,构建共享的CSR图
+def load_graph(nodes_csv, edges_csv):
+    return build_graph(read_nodes(nodes_csv), read_edges(edges_csv))
+
+
+def node_table_of(core):
+    """从已构建的图中取出节点表(快照加载时没有原始DataFrame)"""
+    return {'ids': core.ids, 'names': core.names,
+            'coords': core.coords, 'addresses': core.addresses}
+
+
+def edge_table_of(core):
+    """从已构建的图中取出边表(每条无向边一行,折点为原始字符串)"""
+    m = core.m
+    weights = np.empty(m, dtype=np.float64)
+    weights[core.slot_edge] = core.weights
+    buffer = core.wp_buffer.tobytes()
+    offsets = core.wp_offsets.tolist()
+    waypoints = [buffer[offsets[e]:offsets[e + 1]].decode('utf-8') or None for e in range(m)]
+    return {
+        'src': core.ids[core.edge_u],
+        'dst': core.ids[core.edge_v],
+        'weights': weights,
+        'waypoints': waypoints,
+    }
+
+
+def node_records(node_table):
+    """节点表 -> app使用的节点字典列表"""
+    ids = node_table['ids'].tolist()
+    lons = node_table['coords'][:, 0].tolist()
+    lats = node_table['coords'][:, 1].tolist()
+    return [
+        {'id': nid, 'name': name, 'lon': lon, 'lat': lat, 'address': addr}
+        for nid, name, lon, lat, addr in zip(
+            ids, node_table['names'], lons, lats, node_table['addresses'])
+    ]
@@ -0,0 +1,168 @@
+"""
+    代码主要功能:
+    把CSR图导出为带版本号的二进制快照(一组.npy文件 + meta.json),
+    加载时用mmap映射,多个gunicorn worker可以共享同一份只读页面,
+    启动时不必再重新解析map_nodes.csv和distance_final.csv。
+
+    导出: python graph_snapshot.py [map_nodes.csv distance_final.csv graph_snapshot]
+"""
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+from graph_core import GraphCore
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_DIR = 'graph_snapshot'
+META_FILE = 'meta.json'
+
+# 快照中保存的数组名
+ARRAYS = ['ids', 'coords', 'offsets', 'targets', 'weights', 'slot_edge',
+          'edge_u', 'edge_v', 'wp_buffer', 'wp_offsets']
+
+
+def _pack_strings(strings):
+    """字符串列表 -> (utf-8字节, 偏移数组)"""
+    chunks = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(chunks) + 1, dtype=np.int64)
+    np.cumsum([len(c) for c in chunks], out=offsets[1:])
+    return np.frombuffer(b''.join(chunks), dtype=np.uint8), offsets
+
+
+def _unpack_strings(buffer, offsets):
+    data = bytes(buffer)
+    off = offsets.tolist()
+    return [data[off[k]:off[k + 1]].decode('utf-8') for k in range(len(off) - 1)]
+
+
+def _load_array(path, mmap):
+    if mmap:
+        try:
+            return np.load(path, mmap_mode='r')
+        except ValueError:
+            # 个别平台上空数组无法mmap,退回普通读取
+            pass
+    return np.load(path)
+
+
+def _temp_name(path):
+    return f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+
+
+def save_array(path, array):
+    """把数组写到同目录的临时文件再原子替换:其他进程已经mmap的旧文件不会被截断"""
+    tmp = _temp_name(path)
+    try:
+        with open(tmp, 'wb') as f:
+            np.save(f, np.asarray(array))
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def save_json(path, obj):
+    """与save_array相同,先写临时文件再替换;预处理结果的json在数组之后写,作为完成标记"""
+    tmp = _temp_name(path)
+    try:
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(obj, f)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def read_meta(snapshot_dir):
+    path = os.path.join(snapshot_dir, META_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def export_snapshot(core, snapshot_dir=SNAPSHOT_DIR, sources=None):
+    """把图导出为快照目录,先写临时目录再整体替换,避免worker读到写了一半的文件"""
+    tmp_dir = snapshot_dir.rstrip('/\\') + '.tmp'
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.makedirs(tmp_dir)
+
+    for name in ARRAYS:
+        np.save(os.path.join(tmp_dir, name + '.npy'), np.ascontiguousarray(getattr(core, name)))
+    for name, strings in (('names', core.names), ('addresses', core.addresses)):
+        buffer, offsets = _pack_strings(strings)
+        np.save(os.path.join(tmp_dir, name + '_buffer.npy'), buffer)
+        np.save(os.path.join(tmp_dir, name + '_offsets.npy'), offsets)
+
+    meta = {
+        'version': SNAPSHOT_VERSION,
+        'n': core.n,
+        'm': core.m,
+        'created': time.time(),
+        'sources': [os.path.basename(p) for p in (sources or [])],
+    }
+    with open(os.path.join(tmp_dir, META_FILE), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    if os.path.exists(snapshot_dir):
+        shutil.rmtree(snapshot_dir)
+    os.replace(tmp_dir, snapshot_dir)
+    return meta
+
+
+def load_snapshot(snapshot_dir=SNAPSHOT_DIR, mmap=True):
+    """从快照目录加载图,默认以只读mmap方式映射数组"""
+    meta = read_meta(snapshot_dir)
+    if meta is None:
+        raise FileNotFoundError(f'快照不存在: {snapshot_dir}')
+    if meta.get('version') != SNAPSHOT_VERSION:
+        raise ValueError(f'快照版本不匹配: {meta.get("version")} != {SNAPSHOT_VERSION}')
+
+    arrays = {name: _load_array(os.path.join(snapshot_dir, name + '.npy'), mmap)
+              for name in ARRAYS}
+    names = _unpack_strings(np.load(os.path.join(snapshot_dir, 'names_buffer.npy')),
+                            np.load(os.path.join(snapshot_dir, 'names_offsets.npy')))
+    addresses = _unpack_strings(np.load(os.path.join(snapshot_dir, 'addresses_buffer.npy')),
+                                np.load(os.path.join(snapshot_dir, 'addresses_offsets.npy')))
+    return GraphCore(arrays['ids'], names, arrays['coords'], arrays['offsets'],
+                     arrays['targets'], arrays['weights'], arrays['slot_edge'],
+                     arrays['edge_u'], arrays['edge_v'],
+                     arrays['wp_buffer'], arrays['wp_offsets'], addresses=addresses)
+
+
+def snapshot_is_fresh(snapshot_dir, *source_files):
+    """快照存在、版本一致且比所有源CSV都新时返回True"""
+    meta = read_meta(snapshot_dir)
+    if meta is None or meta.get('version') != SNAPSHOT_VERSION:
+        return False
+    created = os.path.getmtime(os.path.join(snapshot_dir, META_FILE))
+    for path in source_files:
+        if os.path.exists(path) and os.path.getmtime(path) > created:
+            return False
+    return True
+
+
+if __name__ == '__main__':
+    import sys
+    from graph_loader import load_graph
+
+    if len(sys.argv) < 3:
+        nodes_file = 'map_nodes.csv'
+        edges_file = 'distance_final.csv'
+    else:
+        nodes_file = sys.argv[1]
+        edges_file = sys.argv[2]
+    out_dir = sys.argv[3] if len(sys.argv) > 3 else SNAPSHOT_DIR
+
+    t0 = time.time()
+    graph = load_graph(nodes_file, edges_file)
+    meta = export_snapshot(graph, out_dir, sources=[nodes_file, edges_file])
+    print(f"已导出快照 {out_dir}: {meta['n']}个节点, {meta['m']}条边, "
+          f"耗时{(time.time() - t0) * 1000:.1f}毫秒")
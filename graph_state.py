@@ -0,0 +1,93 @@
+"""
+    代码主要功能:
+    app的图状态与热加载。
+    - GraphState把同一版本的图、A*、Dijkstra、节点列表和节点索引放在一起,创建后不再修改。
+      请求开始时取一次当前状态并一直使用它,重新加载时在后台构建新状态,
+      构建完成后只替换一次引用,正在处理的请求仍然使用旧版本,不会看到新旧混合的数据
+    - FileWatcher轮询CSV和快照文件的修改时间,文件变化并稳定一个周期后触发回调
+"""
+import os
+import threading
+import time
+
+from node_index import NodeIndex
+
+# 文件监视的轮询间隔(秒)
+WATCH_INTERVAL = 2.0
+
+
+class GraphState:
+    def __init__(self, version=0, core=None, astar=None, dijkstra=None, nodes=(),
+                 source='', build_ms=0.0, pool=None, levels=None, complete=True):
+        self.version = version      # 图版本号,路径缓存按它区分
+        self.core = core            # 共享的CSR图,未加载时为None
+        self.astar = astar          # Map_Astar
+        self.dijkstra = dijkstra    # DijkstraNavigator
+        self.nodes = list(nodes)    # app使用的节点字典列表
+        self.index = NodeIndex(self.nodes)  # 按id/名称查找节点
+        self.source = source        # 数据来源: snapshot / csv / update
+        self.build_ms = build_ms    # 构建本状态用的毫秒数
+        self.pool = pool            # 该版本的查询进程池(QueryPool),不用进程池时为None
+        self.levels = levels        # 各细节层级的折点(WaypointLevels)
+        self.complete = complete    # 预处理结果是否齐全;增量修改后先为False,后台补齐后替换
+        self.loaded_at = time.time()
+
+
+class FileWatcher:
+    def __init__(self, paths, callback, interval=WATCH_INTERVAL):
+        self.paths = list(paths)
+        self.callback = callback
+        self.interval = interval
+        self._seen = self._signature()
+        self._pending = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _signature(self):
+        sig = []
+        for path in self.paths:
+            try:
+                st = os.stat(path)
+                sig.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                sig.append(None)
+        return tuple(sig)
+
+    def mark_seen(self):
+        """文件是程序自己改的(例如增量更新写回CSV),不需要再触发回调"""
+        self._seen = self._signature()
+        self._pending = None
+
+    def poll(self):
+        """检查一次;文件变化后连续两次检查结果相同才回调,避免读到写了一半的文件"""
+        sig = self._signature()
+        if sig == self._seen:
+            self._pending = None
+            return False
+        if sig != self._pending:
+            self._pending = sig
+            return False
+        self._seen = sig
+        self._pending = None
+        self.callback()
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception:
+                pass
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def running(self):
+        return self._thread is not None and not self._stop.is_set()
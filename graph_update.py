@@ -0,0 +1,241 @@
+"""
+    代码主要功能:
+    在运行中的图上增量地增删节点和边,不用重新运行map_dis.main()。
+    - 新增POI时只计算它和已有节点之间的点对(直线距离,可选请求步行路径),
+      其余边原样复制后重新拼出CSR数组
+    - 同步追加/删除map_nodes.csv和distance_final.csv中的行,已有的node_id不重新编号
+    - GraphChange记录这次修改,affected_routes据此找出需要作废的缓存路径:
+      删除时是经过被删节点/边的路径,新增边时是能借助新边变得更短的路径
+"""
+import numpy as np
+import pandas as pd
+
+from dijkstra import shortest_distances
+from geodesic import haversine
+from graph_loader import build_graph, edge_table_of, node_table_of, resolve_edge_columns
+
+# 缓存里的距离保留两位小数,比较时留出的余量(米)
+DIST_SLACK = 0.01
+
+
+class GraphChange:
+    def __init__(self):
+        self.added_nodes = []       # 新增的node_id
+        self.removed_nodes = set()  # 删除的node_id
+        self.added_pairs = []       # 新增或改了边权的边(node_id, node_id)
+        self.removed_pairs = set()  # 删除或改了边权的边,按(小id, 大id)存放
+
+    def __bool__(self):
+        return bool(self.added_nodes or self.removed_nodes
+                    or self.added_pairs or self.removed_pairs)
+
+
+def _pair(a, b):
+    return (a, b) if a <= b else (b, a)
+
+
+def new_node_edges(core, lon, lat, k_nearest=None, api=None):
+    """新节点与已有节点之间的边[(node_id, 距离, 折点字符串或None)]。
+    默认连接所有节点(与map_dis生成的完全图一致),给定k_nearest时只连最近的k个"""
+    if core.n == 0:
+        return []
+    dist = haversine(lon, lat, core.coords[:, 0], core.coords[:, 1])
+    order = np.argsort(dist, kind='stable')
+    if k_nearest:
+        order = order[:k_nearest]
+    edges = []
+    for i in order.tolist():
+        waypoints = None
+        if api is not None:
+            # 与map_dis相同:只保存路线内部的中间点
+            points = api.get_path(lon, lat, float(core.coords[i, 0]), float(core.coords[i, 1]))
+            if points and len(points) > 2:
+                waypoints = ';'.join(f"{p[0]},{p[1]}" for p in points[1:-1])
+        edges.append((core.node_id(i), round(float(dist[i]), 2), waypoints))
+    return edges
+
+
+def apply_changes(core, add_nodes=(), remove_nodes=(), add_edges=(), remove_edges=()):
+    """返回(新图, GraphChange),原图不变。
+    add_nodes: [(node_id, 名称, 经度, 纬度, 地址)]
+    add_edges: [(node_id, node_id, 距离, 折点字符串或None)],已存在的边会被替换
+    remove_edges: [(node_id, node_id)]"""
+    change = GraphChange()
+    node_table = node_table_of(core)
+    edge_table = edge_table_of(core)
+    ids = node_table['ids'].tolist()
+    names = list(node_table['names'])
+    coords = node_table['coords'].tolist()
+    addresses = list(node_table['addresses'])
+
+    removed = {int(x) for x in remove_nodes}
+    for x in removed:
+        if not core.has_node(x):
+            raise KeyError(f'节点{x}不存在')
+    existing = set(ids) - removed
+    for nid, name, lon, lat, address in add_nodes:
+        nid = int(nid)
+        if nid in existing:
+            raise ValueError(f'节点{nid}已存在')
+        existing.add(nid)
+        change.added_nodes.append(nid)
+    change.removed_nodes = removed
+
+    # 节点表:去掉被删节点,追加新节点
+    keep_node = [nid not in removed for nid in ids]
+    new_ids = [nid for nid, k in zip(ids, keep_node) if k]
+    new_names = [v for v, k in zip(names, keep_node) if k]
+    new_coords = [v for v, k in zip(coords, keep_node) if k]
+    new_addresses = [v for v, k in zip(addresses, keep_node) if k]
+    for nid, name, lon, lat, address in add_nodes:
+        new_ids.append(int(nid))
+        new_names.append(name)
+        new_coords.append([float(lon), float(lat)])
+        new_addresses.append(address or '')
+
+    # 边表:去掉涉及被删节点的边、要删除的边和要替换的边,再追加新边
+    src = edge_table['src'].tolist()
+    dst = edge_table['dst'].tolist()
+    weights = edge_table['weights'].tolist()
+    waypoints = edge_table['waypoints']
+    drop_pairs = {_pair(int(a), int(b)) for a, b in remove_edges}
+    for a, b, w, wp in add_edges:
+        a, b = int(a), int(b)
+        if a not in existing or b not in existing:
+            raise KeyError(f'边({a}, {b})引用了不存在的节点')
+        drop_pairs.add(_pair(a, b))
+        change.added_pairs.append((a, b))
+
+    keep_edge = []
+    for a, b in zip(src, dst):
+        pair = _pair(a, b)
+        if a in removed or b in removed:
+            keep_edge.append(False)
+        elif pair in drop_pairs:
+            keep_edge.append(False)
+            change.removed_pairs.add(pair)
+        else:
+            keep_edge.append(True)
+    new_src = [v for v, k in zip(src, keep_edge) if k]
+    new_dst = [v for v, k in zip(dst, keep_edge) if k]
+    new_w = [v for v, k in zip(weights, keep_edge) if k]
+    new_wp = [v for v, k in zip(waypoints, keep_edge) if k]
+    for a, b, w, wp in add_edges:
+        new_src.append(int(a))
+        new_dst.append(int(b))
+        new_w.append(float(w))
+        new_wp.append(wp or None)
+
+    new_core = build_graph(
+        {'ids': np.asarray(new_ids, dtype=np.int64), 'names': new_names,
+         'coords': np.asarray(new_coords, dtype=np.float64).reshape(-1, 2),
+         'addresses': new_addresses},
+        {'src': np.asarray(new_src, dtype=np.int64), 'dst': np.asarray(new_dst, dtype=np.int64),
+         'weights': np.asarray(new_w, dtype=np.float64), 'waypoints': new_wp})
+    return new_core, change
+
+
+def _cover(pairs):
+    """新增边端点的一个点覆盖(贪心),新的更短路径一定经过其中某个点"""
+    remaining = list(pairs)
+    cover = []
+    while remaining:
+        counts = {}
+        for a, b in remaining:
+            counts[a] = counts.get(a, 0) + 1
+            counts[b] = counts.get(b, 0) + 1
+        best = max(counts, key=counts.get)
+        cover.append(best)
+        remaining = [(a, b) for a, b in remaining if a != best and b != best]
+    return cover
+
+
+def affected_routes(new_core, change, routes):
+    """routes为[(键, 起点id, 终点id, 路径id列表, 距离)],返回需要作废的键集合"""
+    routes = list(routes)
+    affected = set()
+    for key, start, end, path, dist in routes:
+        if start in change.removed_nodes or end in change.removed_nodes:
+            affected.add(key)
+            continue
+        if path and (any(v in change.removed_nodes for v in path)
+                     or any(_pair(a, b) in change.removed_pairs for a, b in zip(path, path[1:]))):
+            affected.add(key)
+
+    if change.added_pairs:
+        # 从每个覆盖点跑一次Dijkstra:若某条路径因新边变短,
+        # 新的最短路经过某个覆盖点c,长度等于 d(c, 起点) + d(c, 终点)
+        rows = [shortest_distances(new_core, new_core.index_of(c))
+                for c in _cover(change.added_pairs)]
+        for key, start, end, path, dist in routes:
+            if key in affected:
+                continue
+            s, t = new_core.index_of(start), new_core.index_of(end)
+            via = min(float(row[s] + row[t]) for row in rows)
+            if via < dist + DIST_SLACK:
+                affected.add(key)
+    return affected
+
+
+def _line_terminator(path):
+    with open(path, 'rb') as f:
+        return '\r\n' if b'\r\n' in f.readline() else '\n'
+
+
+def append_rows(csv_path, rows):
+    """按已有表头的列顺序把行追加到CSV末尾,不改动已有行"""
+    columns = pd.read_csv(csv_path, encoding='utf-8-sig', nrows=0).columns
+    df = pd.DataFrame(rows).reindex(columns=columns)
+    terminator = _line_terminator(csv_path)
+    with open(csv_path, 'rb') as f:
+        f.seek(0, 2)
+        missing_newline = False
+        if f.tell() > 0:
+            f.seek(-1, 2)
+            missing_newline = f.read(1) != b'\n'
+    # 追加时不能再写BOM
+    with open(csv_path, 'a', encoding='utf-8', newline='') as f:
+        if missing_newline:
+            f.write(terminator)
+        df.to_csv(f, header=False, index=False, lineterminator=terminator)
+
+
+def remove_rows(nodes_csv, edges_csv, node_ids=(), pairs=()):
+    """从CSV中删除节点及其所有边,以及指定的边"""
+    node_ids = {int(x) for x in node_ids}
+    pairs = {_pair(int(a), int(b)) for a, b in pairs}
+    if node_ids:
+        nodes = pd.read_csv(nodes_csv, encoding='utf-8-sig')
+        nodes = nodes[~nodes['node_id'].isin(node_ids)]
+        nodes.to_csv(nodes_csv, index=False, encoding='utf-8-sig',
+                     lineterminator=_line_terminator(nodes_csv))
+    if node_ids or pairs:
+        edges = pd.read_csv(edges_csv, encoding='utf-8-sig')
+        from_col, to_col, _, _ = resolve_edge_columns(edges.columns)
+        a = edges[from_col].astype(int).tolist()
+        b = edges[to_col].astype(int).tolist()
+        keep = [x not in node_ids and y not in node_ids and _pair(x, y) not in pairs
+                for x, y in zip(a, b)]
+        edges[keep].to_csv(edges_csv, index=False, encoding='utf-8-sig',
+                           lineterminator=_line_terminator(edges_csv))
+
+
+def persist_change(nodes_csv, edges_csv, add_nodes=(), remove_nodes=(),
+                   add_edges=(), remove_edges=()):
+    """把apply_changes的同一组修改写回CSV;替换的边先删后追加"""
+    replaced = [(a, b) for a, b, _, _ in add_edges]
+    remove_rows(nodes_csv, edges_csv, remove_nodes, list(remove_edges) + replaced)
+    if add_nodes:
+        append_rows(nodes_csv, [{'node_id': nid, 'name': name, 'longitude': lon,
+                                 'latitude': lat, 'address': address}
+                                for nid, name, lon, lat, address in add_nodes])
+    if add_edges:
+        columns = pd.read_csv(edges_csv, encoding='utf-8-sig', nrows=0).columns
+        from_col, to_col, dist_col, wp_col = resolve_edge_columns(columns)
+        rows = []
+        for a, b, w, wp in add_edges:
+            row = {from_col: a, to_col: b, dist_col: w}
+            if wp_col is not None:
+                row[wp_col] = wp
+            rows.append(row)
+        append_rows(edges_csv, rows)
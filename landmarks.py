@@ -0,0 +1,113 @@
+"""
+    代码主要功能:
+    A*的ALT启发函数(A*, Landmarks, Triangle inequality)。
+    加载时选出k个地标并预先算好每个地标到所有节点的最短距离,
+    查询时用三角不等式 |d(L,t) - d(L,v)| 的最大值作为到终点距离的下界。
+    边权沿步行路线绕行时,这个下界比直线距离紧得多,A*访问的节点更少。
+    地标距离表随图快照保存,启动时和查询进程池的工作进程都以mmap方式读取。
+"""
+import json
+import os
+
+import numpy as np
+
+from dijkstra import shortest_distances
+from graph_snapshot import read_meta, save_array, save_json
+
+# 默认地标数量
+LANDMARK_COUNT = 8
+LANDMARKS_META = 'landmarks.json'
+
+
+class LandmarkIndex:
+    def __init__(self, landmarks, dist):
+        self.landmarks = landmarks  # 地标下标列表
+        self.dist = dist            # float64 (k, n) 地标到各节点的最短距离
+
+    @property
+    def k(self):
+        return len(self.landmarks)
+
+    @classmethod
+    def build(cls, core, k=LANDMARK_COUNT):
+        """最远点法选地标:每次选离已有地标最远的节点"""
+        n = core.n
+        k = min(k, n)
+        if k == 0:
+            return cls([], np.zeros((0, n)))
+        # 从离0号节点最远的节点开始,避免地标落在图中央
+        first = shortest_distances(core, 0)
+        first[~np.isfinite(first)] = -1
+        landmarks = [int(np.argmax(first))]
+        rows = [shortest_distances(core, landmarks[0])]
+        nearest = rows[0].copy()
+        while len(landmarks) < k:
+            # 不连通的节点优先成为地标,这样每个连通分量都有地标覆盖
+            score = np.where(np.isfinite(nearest), nearest, np.inf)
+            score[landmarks] = -1
+            nxt = int(np.argmax(score))
+            if score[nxt] <= 0:
+                break
+            landmarks.append(nxt)
+            rows.append(shortest_distances(core, nxt))
+            nearest = np.minimum(nearest, rows[-1])
+        return cls(landmarks, np.vstack(rows))
+
+    def save(self, snapshot_dir):
+        """保存到图快照目录,记录对应快照的生成时间用于校验"""
+        save_array(os.path.join(snapshot_dir, 'landmarks_dist.npy'), self.dist)
+        meta = read_meta(snapshot_dir) or {}
+        save_json(os.path.join(snapshot_dir, LANDMARKS_META),
+                  {'landmarks': [int(v) for v in self.landmarks], 'n': int(self.dist.shape[1]),
+                   'snapshot_created': meta.get('created')})
+
+    @classmethod
+    def load(cls, snapshot_dir, mmap=True):
+        """从快照目录读取,不存在或与快照不匹配时返回None"""
+        path = os.path.join(snapshot_dir, LANDMARKS_META)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            lm_meta = json.load(f)
+        meta = read_meta(snapshot_dir) or {}
+        if lm_meta.get('snapshot_created') != meta.get('created') \
+                or lm_meta.get('n') != meta.get('n'):
+            return None
+        dist = np.load(os.path.join(snapshot_dir, 'landmarks_dist.npy'),
+                       mmap_mode='r' if mmap else None)
+        return cls(lm_meta['landmarks'], dist)
+
+    def heuristic_to(self, t):
+        """返回估计v到t距离下界的函数(无向图,d(L,v)即d(v,L))"""
+        dist_t = self.dist[:, t]
+        # 与t不连通的地标不能提供下界
+        usable = np.isfinite(dist_t)
+        table = self.dist[usable]
+        dist_t = dist_t[usable]
+        if len(dist_t) == 0:
+            return lambda v: 0.0
+
+        def h(v):
+            col = table[:, v]
+            # v与某地标不连通时v到不了t,下界取0即可(仍然可采纳)
+            diff = np.abs(col - dist_t)
+            diff[~np.isfinite(diff)] = 0.0
+            return float(diff.max())
+        return h
+
+
+def load_or_build_landmarks(core, snapshot_dir=None, k=LANDMARK_COUNT):
+    """优先读快照里的地标距离表,没有或地标数不同时现算(并写回快照)"""
+    if core is None:
+        return None
+    if snapshot_dir and os.path.isdir(snapshot_dir):
+        index = LandmarkIndex.load(snapshot_dir)
+        if index is not None and index.k == min(k, core.n):
+            return index
+    index = LandmarkIndex.build(core, k)
+    if snapshot_dir and os.path.isdir(snapshot_dir):
+        try:
+            index.save(snapshot_dir)
+        except OSError:
+            pass
+    return index
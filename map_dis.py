@@ -1,161 +1,248 @@
-""" 代码的主要功能：
-     - 读取修改后的map_nodes（节点列表）来构造图的边列表distance_final.csv
-     - 使用高德地图API获取步行路径点，若API不可用则仅计算直线距离
-"""
-import requests
-import pandas as pd
-import numpy as np
-from math import radians, cos, sin, asin, sqrt
-import time
-
-class DistanceCp:
-    EARTH_RADIUS = 6371000
-    @staticmethod
-    def haversine(lon1, lat1, lon2, lat2):
-        #将经纬度转为弧度
-        lon1_r, lat1_r, lon2_r, lat2_r = map(radians, [lon1, lat1, lon2, lat2])
-        
-        #计算经度差与纬度差
-        dlon = lon2_r - lon1_r
-        dlat = lat2_r - lat1_r
-        
-        #haversine公式中的 a
-        a = sin(dlat/2)**2 + cos(lat1_r) * cos(lat2_r) * sin(dlon/2)**2
-        
-        #haversine公式中的 c
-        c = 2 * asin(sqrt(a))
-        return c * DistanceCp.EARTH_RADIUS
-
-#高德路径查询封装类
-class GDDT:
-    API_URL = "https://restapi.amap.com/v3/direction/walking"
-    
-    def __init__(self, key):
-        self.key = key
-        
-    def get_path(self, lon1, lat1, lon2, lat2):
-        #构造请求参数
-        params = {
-            'key': self.key, 'origin': f"{lon1},{lat1}", 'destination': f"{lon2},{lat2}"}
-        
-        try:
-            #发送GET请求,设置超时
-            response = requests.get(self.API_URL, params=params, timeout=5)
-            data = response.json()
-            
-            #检查响应是否成功并含有路线
-            if data['status'] == '1' and 'route' in data:
-                paths = data['route']['paths'][0]
-                steps = paths['steps']
-                
-                coords = []
-                #遍历每个步骤,提取经纬度点
-                for step in steps:
-                    polyline = step['polyline']
-                    points = polyline.split(';')
-                    
-                    for point in points:
-                        lon, lat = map(float, point.split(','))
-                        coords.append([lon, lat])
-                
-                #为避免短时间过多请求,短暂休眠
-                time.sleep(0.15)
-                return coords
-            else:
-                #无有效路径时返回None
-                return None
-                
-        except Exception:
-            return None
-
-#图构造类,基于节点生成边
-class GraphB:
-    def __init__(self, nodes_df, api_client=None):
-        #节点数据(DataFrame)
-        self.nodes = nodes_df
-        self.n = len(nodes_df)
-        self.api = api_client
-        self.edges = []
-        
-    def build(self):
-        #计算总共需要处理的无向边数量
-        total = self.n * (self.n - 1) // 2
-        count = 0
-        
-        #双重循环只枚举i < j的组合
-        for i in range(self.n):
-            node_i = self.nodes.iloc[i]
-            
-            for j in range(i + 1, self.n):
-                node_j = self.nodes.iloc[j]
-                count += 1
-                
-                #计算两点直线球面距离
-                dist = DistanceCp.haversine(
-                    node_i['longitude'], node_i['latitude'],
-                    node_j['longitude'], node_j['latitude']
-                )
-                
-                waypts = None
-                #API_KEY还有效的情况下，可获取步行路径
-                if self.api:
-                    waypts = self.api.get_path(
-                        node_i['longitude'], node_i['latitude'],
-                        node_j['longitude'], node_j['latitude']
-                    )
-                
-                waypts_str = None
-                #若路径点足够，则取内部中间点拼接为字符串
-                if waypts and len(waypts) > 2:
-                    middle = waypts[1:-1]
-                    waypts_str = ';'.join([f"{w[0]},{w[1]}" for w in middle])
-                
-                #构造边字典，包含节点与距离
-                edge = {
-                    'node1': node_i['node_id'],
-                    'node2': node_j['node_id'],
-                    'distance': round(dist, 2)
-                }
-                
-                if waypts_str:
-                    edge['waypoints'] = waypts_str
-                
-                self.edges.append(edge)
-        return pd.DataFrame(self.edges)
-
-class SaveF:
-    @staticmethod
-    def save_nodes(df, filename='map_nodes.csv'):
-        df.to_csv(filename, index=False, encoding='utf-8-sig')
-        
-    @staticmethod
-    def save_edges(df, filename='distance_final.csv'):
-        df.to_csv(filename, index=False, encoding='utf-8-sig')
-
-def main():
-    #我的API KEY
-    KEY = "d12ddcf8aa0f9fb2489a3115d299fa42"
-    
-    #读取修改后的节点
-    input_file = 'map_nodes.csv'
-    df = pd.read_csv(input_file, encoding='utf-8-sig')
-    
-    #过滤掉缺失经纬度的行
-    valid = df[df['longitude'].notna() & df['latitude'].notna()].copy()
-    valid = valid.reset_index(drop=True)
-    
-    valid['node_id'] = range(len(valid))
-    api = GDDT(KEY)
-
-    #根据节点与API初始化图构造器
-    builder = GraphB(valid, api)
-    
-    #构建边并返回DataFrame
-    edges_df = builder.build()
-    output = valid[['node_id', 'name', 'longitude', 'latitude', 'address']]
-    
-    SaveF.save_nodes(output, 'map_nodes.csv')
-    SaveF.save_edges(edges_df)
-
-if __name__ == "__main__":
+""" 代码的主要功能：
+     - 读取修改后的map_nodes（节点列表）来构造图的边列表distance_final.csv
+     - 使用高德地图API获取步行路径点，若API不可用则仅计算直线距离
+"""
+import requests
+import pandas as pd
+import numpy as np
+import threading
+import time
+from geodesic import EARTH_RADIUS, haversine, haversine_matrix
+from route_fetcher import FETCH_RATE, FETCH_WORKERS, RouteFetcher, TransientError
+from simplify import dedupe
+from sparsify import knn_mst_pairs, sparsify_edges
+from walk_cache import WALK_CACHE_FILE, WalkRouteCache
+
+class DistanceCp:
+    EARTH_RADIUS = EARTH_RADIUS
+    @staticmethod
+    def haversine(lon1, lat1, lon2, lat2):
+        #单对距离,与geodesic中的批量计算共用同一公式
+        return float(haversine(lon1, lat1, lon2, lat2))
+
+    @staticmethod
+    def matrix(lons, lats):
+        #一次性计算所有节点两两之间的距离矩阵
+        return haversine_matrix(lons, lats)
+
+#高德路径查询封装类
+class GDDT:
+    API_URL = "https://restapi.amap.com/v3/direction/walking"
+    #这些infocode表示请求过于频繁或服务暂时不可用,稍后重试即可
+    RETRY_INFOCODES = {'10004', '10014', '10015', '10019', '10020', '10021'}
+    
+    def __init__(self, key, api_url=None, cache=None):
+        self.key = key
+        #可以指向本地的模拟服务(amap_stub.py)
+        self.api_url = api_url or self.API_URL
+        #本地持久化缓存(WalkRouteCache),命中时不再请求API
+        self.cache = cache
+        self._local = threading.local()
+    
+    def _session(self):
+        #每个线程复用自己的连接
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+    
+    def lookup(self, lon1, lat1, lon2, lat2):
+        #只查本地缓存,返回(是否命中, 折点);RouteFetcher命中时不占用限速令牌
+        if self.cache is None:
+            return False, None
+        return self.cache.lookup(lon1, lat1, lon2, lat2)
+    
+    def fetch(self, lon1, lat1, lon2, lat2):
+        #请求API并写入缓存(调用方已经查过lookup);无有效路径返回None,可重试的失败抛出TransientError
+        coords = self._request(lon1, lat1, lon2, lat2)
+        #没有路线也缓存;可重试的失败已经抛出,不会写入缓存
+        if self.cache is not None:
+            self.cache.store(lon1, lat1, lon2, lat2, coords)
+        return coords
+    
+    def _fetch(self, lon1, lat1, lon2, lat2):
+        #先查本地缓存,返回(折点, 是否来自缓存)
+        found, coords = self.lookup(lon1, lat1, lon2, lat2)
+        if found:
+            return coords, True
+        return self.fetch(lon1, lat1, lon2, lat2), False
+    
+    def _request(self, lon1, lat1, lon2, lat2):
+        #请求一次API
+        params = {
+            'key': self.key, 'origin': f"{lon1},{lat1}", 'destination': f"{lon2},{lat2}"}
+        
+        try:
+            #发送GET请求,设置超时
+            response = self._session().get(self.api_url, params=params, timeout=5)
+        except requests.RequestException as e:
+            raise TransientError(str(e))
+        if response.status_code == 429 or response.status_code >= 500:
+            raise TransientError(f"HTTP {response.status_code}")
+        try:
+            data = response.json()
+        except ValueError:
+            raise TransientError('响应不是JSON')
+        
+        #检查响应是否成功并含有路线
+        if data.get('status') != '1':
+            if data.get('infocode') in self.RETRY_INFOCODES:
+                raise TransientError(data.get('info', ''))
+            return None
+        if 'route' not in data:
+            return None
+        
+        try:
+            paths = data['route']['paths'][0]
+            steps = paths['steps']
+            
+            coords = []
+            #遍历每个步骤,提取经纬度点
+            for step in steps:
+                polyline = step['polyline']
+                points = polyline.split(';')
+                
+                for point in points:
+                    lon, lat = map(float, point.split(','))
+                    coords.append([lon, lat])
+        except (KeyError, IndexError, TypeError, ValueError):
+            return None
+        return coords
+        
+    def get_path(self, lon1, lat1, lon2, lat2):
+        #逐个请求时使用,任何失败都返回None
+        try:
+            coords, cached = self._fetch(lon1, lat1, lon2, lat2)
+        except Exception:
+            return None
+        if coords is not None and not cached:
+            #为避免短时间过多请求,短暂休眠
+            time.sleep(0.15)
+        return coords
+
+#图构造类,基于节点生成边
+class GraphB:
+    def __init__(self, nodes_df, api_client=None, fetcher=None):
+        #节点数据(DataFrame)
+        self.nodes = nodes_df
+        self.n = len(nodes_df)
+        self.api = api_client
+        #并发获取器(RouteFetcher),设置后用它代替逐个请求
+        self.fetcher = fetcher
+        self.edges = []
+        
+    def build(self, k_nearest=None):
+        #所有节点两两之间的直线球面距离一次算好
+        lons = self.nodes['longitude'].to_numpy(dtype=np.float64)
+        lats = self.nodes['latitude'].to_numpy(dtype=np.float64)
+        dist_matrix = DistanceCp.matrix(lons, lats)
+        
+        if k_nearest:
+            #只连接每个节点最近的k个点，再加上保证连通的最小生成树边
+            pairs = knn_mst_pairs(dist_matrix, k_nearest)
+        else:
+            #枚举i < j的所有组合
+            pairs = [(i, j) for i in range(self.n) for j in range(i + 1, self.n)]
+        
+        #计算总共需要处理的无向边数量
+        total = len(pairs)
+        count = 0
+        
+        routes = None
+        if self.fetcher:
+            #一次性并发获取所有点对的步行路径
+            routes = self.fetcher.fetch_all(
+                [(float(lons[i]), float(lats[i]), float(lons[j]), float(lats[j])) for i, j in pairs],
+                progress=lambda done, n: print(f"\r获取步行路径 {done}/{n}", end='', flush=True))
+            print()
+        
+        for i, j in pairs:
+            node_i = self.nodes.iloc[i]
+            node_j = self.nodes.iloc[j]
+            dist = float(dist_matrix[i, j])
+            
+            waypts = None
+            if routes is not None:
+                waypts = routes[count]
+            #API_KEY还有效的情况下，可获取步行路径
+            elif self.api:
+                waypts = self.api.get_path(
+                    node_i['longitude'], node_i['latitude'],
+                    node_j['longitude'], node_j['latitude']
+                )
+            count += 1
+            
+            waypts_str = None
+            #若路径点足够，则取内部中间点拼接为字符串
+            if waypts and len(waypts) > 2:
+                # 高德返回的相邻路段首尾点相同，连续重复的点只保留一个
+                middle = dedupe(waypts[1:-1])
+                waypts_str = ';'.join([f"{w[0]},{w[1]}" for w in middle])
+            
+            #构造边字典，包含节点与距离
+            edge = {
+                'node1': node_i['node_id'],
+                'node2': node_j['node_id'],
+                'distance': round(dist, 2)
+            }
+            
+            if waypts_str:
+                edge['waypoints'] = waypts_str
+            
+            self.edges.append(edge)
+        return pd.DataFrame(self.edges)
+
+class SaveF:
+    @staticmethod
+    def save_nodes(df, filename='map_nodes.csv'):
+        df.to_csv(filename, index=False, encoding='utf-8-sig')
+        
+    @staticmethod
+    def save_edges(df, filename='distance_final.csv'):
+        df.to_csv(filename, index=False, encoding='utf-8-sig')
+
+def main():
+    #我的API KEY
+    KEY = "d12ddcf8aa0f9fb2489a3115d299fa42"
+    #稀疏化选项(None为不启用，生成完全图)：
+    #K_NEAREST为每个节点只请求最近k个点的步行路径，API调用次数随节点数线性增长；
+    #STRETCH为保存前删边允许的最短距离伸长倍数，1.0时任何两点的最短距离都不变
+    K_NEAREST = None
+    STRETCH = None
+    #并发获取步行路径的线程数和每秒请求数,按API Key的配额调整;WORKERS为0时逐个请求
+    WORKERS = FETCH_WORKERS
+    QPS = FETCH_RATE
+    #步行路径的本地缓存文件,坐标没变的点对不再重复请求;None为不使用缓存
+    CACHE_FILE = WALK_CACHE_FILE
+    
+    #读取修改后的节点
+    input_file = 'map_nodes.csv'
+    df = pd.read_csv(input_file, encoding='utf-8-sig')
+    
+    #过滤掉缺失经纬度的行
+    valid = df[df['longitude'].notna() & df['latitude'].notna()].copy()
+    valid = valid.reset_index(drop=True)
+    
+    valid['node_id'] = range(len(valid))
+    cache = WalkRouteCache(CACHE_FILE) if CACHE_FILE else None
+    api = GDDT(KEY, cache=cache)
+    fetcher = RouteFetcher(api, workers=WORKERS, rate=QPS) if WORKERS else None
+
+    #根据节点与API初始化图构造器
+    builder = GraphB(valid, api, fetcher)
+    
+    #构建边并返回DataFrame
+    edges_df = builder.build(k_nearest=K_NEAREST)
+    if STRETCH:
+        edges_df = sparsify_edges(edges_df, STRETCH)
+    output = valid[['node_id', 'name', 'longitude', 'latitude', 'address']]
+    
+    SaveF.save_nodes(output, 'map_nodes.csv')
+    SaveF.save_edges(edges_df)
+    if cache is not None:
+        stats = cache.stats()
+        print(f"步行路径缓存: 命中{stats['hits']}次, 请求API{stats['misses']}次, 共{stats['entries']}条")
+        cache.close()
+
+if __name__ == "__main__":
     main()
\ No newline at end of file
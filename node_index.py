@@ -0,0 +1,91 @@
+"""
+    代码主要功能:
+    节点索引,每个图版本构建一次,供app按id或名称查找节点。
+    - id -> 节点字典、名称 -> id,都是字典查找
+    - 名称前缀:按名称排序后二分查找
+    - 模糊搜索:依次取 完全相同 > 前缀 > 包含 > 相似(difflib) 的结果,
+      中间去掉空格并忽略大小写,纯数字的查询同时按id匹配
+"""
+import bisect
+import difflib
+
+# /nodes/search 默认和最多返回的条数
+SEARCH_LIMIT = 10
+SEARCH_MAX_LIMIT = 50
+# difflib相似度下限
+FUZZY_CUTOFF = 0.5
+
+
+def normalize(text):
+    return ''.join(str(text).split()).lower()
+
+
+class NodeIndex:
+    def __init__(self, records):
+        self.records = list(records)
+        self.by_id = {n['id']: n for n in self.records}
+        self.by_name = {}
+        for n in self.records:
+            # 重名时保留第一个
+            self.by_name.setdefault(normalize(n['name']), n['id'])
+        # (规范化名称, id) 按名称排序,用于前缀查找
+        self._sorted = sorted((normalize(n['name']), n['id']) for n in self.records)
+        self._keys = [k for k, _ in self._sorted]
+
+    def __len__(self):
+        return len(self.records)
+
+    def get(self, node_id):
+        """按id取节点字典,不存在时返回None"""
+        return self.by_id.get(node_id)
+
+    def id_of(self, name):
+        """按名称(忽略空格和大小写)取id,不存在时返回None"""
+        return self.by_name.get(normalize(name))
+
+    def resolve(self, value):
+        """请求中的节点可以是id或名称,返回节点字典或None"""
+        try:
+            return self.by_id.get(int(value))
+        except (TypeError, ValueError):
+            nid = self.id_of(value)
+            return None if nid is None else self.by_id[nid]
+
+    def prefix(self, text, limit=SEARCH_LIMIT):
+        """名称以text开头的节点id,按名称排序"""
+        key = normalize(text)
+        lo = bisect.bisect_left(self._keys, key)
+        out = []
+        for k, nid in self._sorted[lo:]:
+            if not k.startswith(key) or len(out) >= limit:
+                break
+            out.append(nid)
+        return out
+
+    def search(self, q, limit=SEARCH_LIMIT):
+        """返回最多limit个匹配的节点字典,越靠前越匹配"""
+        key = normalize(q)
+        if not key:
+            return []
+        found = []
+        seen = set()
+
+        def take(ids):
+            for nid in ids:
+                if len(found) >= limit:
+                    return
+                if nid not in seen:
+                    seen.add(nid)
+                    found.append(self.by_id[nid])
+
+        if key.isdigit():
+            take([int(key)] if int(key) in self.by_id else [])
+        if key in self.by_name:
+            take([self.by_name[key]])
+        take(self.prefix(key, limit))
+        if len(found) < limit:
+            take(nid for k, nid in self._sorted if key in k)
+        if len(found) < limit:
+            close = difflib.get_close_matches(key, self._keys, limit, FUZZY_CUTOFF)
+            take(self.by_name[k] for k in close)
+        return found
@@ -0,0 +1,98 @@
+"""
+    代码主要功能:
+    缓存按图版本渲染好的响应(主页HTML、/nodes.json)。
+    每个版本只渲染一次,同时预先压缩成gzip(安装了brotli时还有br),
+    响应带ETag和Last-Modified,浏览器再次请求时内容没变就返回304。
+"""
+import gzip
+import hashlib
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+
+try:
+    import brotli
+    BROTLI_OK = True
+except ImportError:
+    BROTLI_OK = False
+
+# 小于该字节数的内容不压缩
+COMPRESS_MIN_BYTES = 512
+
+
+class CachedPage:
+    def __init__(self, body, mimetype, version, modified):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        self.mimetype = mimetype
+        self.version = version
+        self.modified = int(modified)          # Last-Modified(秒)
+        self.etag = '"%s"' % hashlib.sha1(body).hexdigest()[:20]
+        self.last_modified = formatdate(self.modified, usegmt=True)
+        # 编码 -> 内容,按优先顺序排列
+        self.encoded = {}
+        if len(body) >= COMPRESS_MIN_BYTES:
+            if BROTLI_OK:
+                self.encoded['br'] = brotli.compress(body)
+            self.encoded['gzip'] = gzip.compress(body, 9, mtime=0)
+        self.encoded['identity'] = body
+
+    def choose(self, accept_encoding):
+        """按Accept-Encoding选择编码,返回(编码, 内容)"""
+        accepted = set()
+        for item in (accept_encoding or '').split(','):
+            name, _, params = item.partition(';')
+            params = params.replace(' ', '')
+            try:
+                q = float(params[2:]) if params.startswith('q=') else 1.0
+            except ValueError:
+                q = 0.0
+            if name.strip() and q > 0:
+                accepted.add(name.strip().lower())
+        for encoding, data in self.encoded.items():
+            if encoding == 'identity' or encoding in accepted or '*' in accepted:
+                return encoding, data
+        return 'identity', self.encoded['identity']
+
+    def not_modified(self, if_none_match, if_modified_since):
+        """条件请求命中时返回True(应返回304)"""
+        if if_none_match:
+            tags = [t.strip() for t in if_none_match.split(',')]
+            # 压缩后的响应可能被代理改成弱ETag,比较时忽略W/
+            return '*' in tags or self.etag in [t[2:] if t.startswith('W/') else t for t in tags]
+        if if_modified_since:
+            try:
+                return int(parsedate_to_datetime(if_modified_since).timestamp()) >= self.modified
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def headers(self, encoding=None):
+        headers = {'ETag': self.etag, 'Last-Modified': self.last_modified,
+                   'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding'}
+        if encoding and encoding != 'identity':
+            headers['Content-Encoding'] = encoding
+        return headers
+
+
+class PageCache:
+    def __init__(self):
+        self._pages = {}
+        self._lock = threading.Lock()
+        self.renders = 0
+
+    def get(self, name, version, modified, render, mimetype='text/html; charset=utf-8'):
+        """取name在该图版本的缓存页面,没有时调用render()渲染一次"""
+        page = self._pages.get(name)
+        if page is not None and page.version == version:
+            return page
+        with self._lock:
+            page = self._pages.get(name)
+            if page is None or page.version != version:
+                page = CachedPage(render(), mimetype, version, modified)
+                self._pages[name] = page
+                self.renders += 1
+            return page
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
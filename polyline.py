@@ -0,0 +1,67 @@
+"""
+    代码主要功能:
+    Google编码折线(encoded polyline)格式的编码和解码。
+    坐标按precision位小数取整后,依次对相邻点的差值做zigzag + 5位一组的变长编码,
+    每组加63转成可打印字符。/calc 请求 format=polyline 时用它代替坐标数组,
+    页面上的decodePolyline是对应的解码器。
+"""
+import math
+
+# 默认保留的小数位数(5位约1.1米)和允许的范围
+POLYLINE_PRECISION = 5
+POLYLINE_MIN_PRECISION = 1
+POLYLINE_MAX_PRECISION = 8
+
+
+def _encode_value(value, out):
+    value = ~(value << 1) if value < 0 else value << 1
+    while value >= 0x20:
+        out.append(chr((0x20 | (value & 0x1f)) + 63))
+        value >>= 5
+    out.append(chr(value + 63))
+
+
+def encode(coords, precision=POLYLINE_PRECISION):
+    """[[lat, lon], ...] -> 编码后的字符串"""
+    factor = 10 ** precision
+    out = []
+    prev_lat = prev_lon = 0
+    for lat, lon in coords:
+        # 与JavaScript的Math.round一致,四舍五入到整数
+        lat_i = math.floor(lat * factor + 0.5)
+        lon_i = math.floor(lon * factor + 0.5)
+        _encode_value(lat_i - prev_lat, out)
+        _encode_value(lon_i - prev_lon, out)
+        prev_lat, prev_lon = lat_i, lon_i
+    return ''.join(out)
+
+
+def decode(text, precision=POLYLINE_PRECISION):
+    """编码后的字符串 -> [[lat, lon], ...]"""
+    factor = 10 ** precision
+    coords = []
+    values = [0, 0]
+    index = 0
+    k = 0
+    while index < len(text):
+        result = shift = 0
+        while True:
+            b = ord(text[index]) - 63
+            index += 1
+            result |= (b & 0x1f) << shift
+            shift += 5
+            if b < 0x20:
+                break
+        values[k] += ~(result >> 1) if result & 1 else result >> 1
+        if k == 1:
+            coords.append([values[0] / factor, values[1] / factor])
+        k = 1 - k
+    return coords
+
+
+def polyline_payload(payload, precision=POLYLINE_PRECISION):
+    """把/calc响应中的坐标数组换成编码后的折线"""
+    out = dict(payload)
+    out['polyline'] = encode(out.pop('coords', None) or [], precision)
+    out['precision'] = precision
+    return out
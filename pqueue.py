@@ -0,0 +1,200 @@
+"""
+    代码主要功能:
+    Dijkstra可插拔的优先队列。所有队列都提供 push(key, item) / pop() / len(),
+    并统计入队、出队次数。
+    - heap:   heapq二叉堆,懒删除(同一节点可能有多条旧记录),原来的默认实现
+    - binary: 带位置索引的二叉堆,支持decrease-key,队列里每个节点最多一条记录
+    - radix:  基数堆,键按scale放大取整后按与上次出队键的最高不同位分桶
+    - dial:   Dial桶队列,按取整后的键放入循环桶数组,适合最大边权不大的图
+    radix/dial依赖Dijkstra出队键单调不减;取整相同的元素在当前桶内再用小顶堆排序,
+    因此出队顺序与精确的浮点键一致,不会影响最短路结果。
+"""
+import heapq
+
+# 浮点距离取整时的放大倍数(米 -> 厘米)
+KEY_SCALE = 100
+# Dial桶宽取1米,桶数约等于最大边权的米数
+DIAL_SCALE = 1
+QUEUE_TYPES = ('heap', 'binary', 'radix', 'dial')
+
+
+class LazyHeap:
+    def __init__(self):
+        self._heap = []
+        self.pushes = 0
+        self.pops = 0
+
+    def push(self, key, item):
+        self.pushes += 1
+        heapq.heappush(self._heap, (key, item))
+
+    def pop(self):
+        self.pops += 1
+        return heapq.heappop(self._heap)
+
+    def __len__(self):
+        return len(self._heap)
+
+
+class IndexedBinaryHeap:
+    def __init__(self):
+        self._keys = []
+        self._items = []
+        self._pos = {}
+        self.pushes = 0
+        self.pops = 0
+
+    def push(self, key, item):
+        """节点不在堆中则插入,已在堆中且新键更小则decrease-key"""
+        i = self._pos.get(item)
+        if i is None:
+            self.pushes += 1
+            self._keys.append(key)
+            self._items.append(item)
+            i = len(self._keys) - 1
+            self._pos[item] = i
+        elif key < self._keys[i]:
+            self.pushes += 1
+            self._keys[i] = key
+        else:
+            return
+        self._sift_up(i)
+
+    def pop(self):
+        self.pops += 1
+        keys, items, pos = self._keys, self._items, self._pos
+        key, item = keys[0], items[0]
+        last_key, last_item = keys.pop(), items.pop()
+        del pos[item]
+        if keys:
+            keys[0], items[0] = last_key, last_item
+            pos[last_item] = 0
+            self._sift_down(0)
+        return key, item
+
+    def _sift_up(self, i):
+        keys, items, pos = self._keys, self._items, self._pos
+        key, item = keys[i], items[i]
+        while i > 0:
+            parent = (i - 1) >> 1
+            if keys[parent] <= key:
+                break
+            keys[i], items[i] = keys[parent], items[parent]
+            pos[items[i]] = i
+            i = parent
+        keys[i], items[i] = key, item
+        pos[item] = i
+
+    def _sift_down(self, i):
+        keys, items, pos = self._keys, self._items, self._pos
+        n = len(keys)
+        key, item = keys[i], items[i]
+        while True:
+            child = 2 * i + 1
+            if child >= n:
+                break
+            if child + 1 < n and keys[child + 1] < keys[child]:
+                child += 1
+            if keys[child] >= key:
+                break
+            keys[i], items[i] = keys[child], items[child]
+            pos[items[i]] = i
+            i = child
+        keys[i], items[i] = key, item
+        pos[item] = i
+
+    def __len__(self):
+        return len(self._keys)
+
+
+class RadixHeap:
+    def __init__(self, scale=KEY_SCALE):
+        self.scale = scale
+        self._buckets = [[] for _ in range(65)]
+        self._last = 0
+        self._size = 0
+        self.pushes = 0
+        self.pops = 0
+
+    def _bucket(self, ikey):
+        return (ikey ^ self._last).bit_length()
+
+    def push(self, key, item):
+        self.pushes += 1
+        ikey = int(key * self.scale)
+        if ikey < self._last:
+            raise ValueError('基数堆要求入队键不小于上次出队的键')
+        b = self._bucket(ikey)
+        while b >= len(self._buckets):
+            self._buckets.append([])
+        if b == 0:
+            heapq.heappush(self._buckets[0], (key, item))
+        else:
+            self._buckets[b].append((key, item))
+        self._size += 1
+
+    def pop(self):
+        self.pops += 1
+        buckets = self._buckets
+        if not buckets[0]:
+            # 找到第一个非空桶,以其中最小的取整键为新基准重新分桶
+            b = 1
+            while not buckets[b]:
+                b += 1
+            entries = buckets[b]
+            buckets[b] = []
+            scale = self.scale
+            self._last = min(int(k * scale) for k, _ in entries)
+            for entry in entries:
+                buckets[self._bucket(int(entry[0] * scale))].append(entry)
+            heapq.heapify(buckets[0])
+        self._size -= 1
+        return heapq.heappop(buckets[0])
+
+    def __len__(self):
+        return self._size
+
+
+class BucketQueue:
+    def __init__(self, max_weight, scale=DIAL_SCALE):
+        self.scale = scale
+        # 任意时刻队列中的取整键都落在[当前键, 当前键 + 最大边权]内,循环使用这么多个桶
+        self._span = int(max_weight * scale) + 2
+        self._buckets = [[] for _ in range(self._span)]
+        self._cursor = 0
+        self._size = 0
+        self.pushes = 0
+        self.pops = 0
+
+    def push(self, key, item):
+        self.pushes += 1
+        ikey = int(key * self.scale)
+        if ikey < self._cursor or ikey >= self._cursor + self._span:
+            raise ValueError('桶队列要求入队键落在[当前键, 当前键+最大边权]内')
+        heapq.heappush(self._buckets[ikey % self._span], (key, item))
+        self._size += 1
+
+    def pop(self):
+        self.pops += 1
+        buckets, span = self._buckets, self._span
+        while not buckets[self._cursor % span]:
+            self._cursor += 1
+        self._size -= 1
+        return heapq.heappop(buckets[self._cursor % span])
+
+    def __len__(self):
+        return self._size
+
+
+def make_queue(kind, core=None):
+    """按名称创建优先队列,dial需要图的最大边权"""
+    if kind == 'heap':
+        return LazyHeap()
+    if kind == 'binary':
+        return IndexedBinaryHeap()
+    if kind == 'radix':
+        return RadixHeap()
+    if kind == 'dial':
+        max_weight = float(core.weights.max()) if core is not None and len(core.weights) else 0.0
+        return BucketQueue(max_weight)
+    raise ValueError(f'未知的优先队列类型: {kind}, 可选 {QUEUE_TYPES}')
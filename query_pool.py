@@ -0,0 +1,264 @@
+"""
+    代码主要功能:
+    把路径搜索交给多个工作进程执行,避免并发请求在GIL上排队。
+    - 图先导出为快照目录(连同ALT地标、全源最短路表、收缩层次),工作进程启动时
+      以只读mmap方式映射,多个进程共享同一份页面,不需要把图序列化传过去;
+      不指定目录时导出到每个进程池独占的临时目录,多个服务进程互不干扰
+    - 每次查询只传(算法, 起点, 终点),返回搜索结果;距离矩阵按起点分块,每块只传下标列表
+    - 排队的查询超过上限时直接拒绝(PoolBusy),单次查询超时抛出QueryTimeout
+
+    吞吐量测试: python query_pool.py [节点数] [查询数]
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+from Astar import Map_Astar, run_astar
+from apsp import AllPairsTable
+from contraction import ContractionHierarchy
+from dijkstra import DijkstraNavigator, dijkstra_find_path, shortest_distances
+from graph_snapshot import export_snapshot, load_snapshot
+from landmarks import LandmarkIndex
+
+# 默认工作进程数、单次查询超时(秒)和允许排队的查询数
+QUERY_WORKERS = os.cpu_count() or 1
+QUERY_TIMEOUT = 5.0
+QUERY_MAX_PENDING = 64
+# 进程池在重新加载线程里创建,此时请求线程可能持有各种锁;fork出的子进程会继承这些
+# 锁的状态而卡死。工作进程只需要mmap快照,不需要继承任何东西,用forkserver/spawn启动
+QUERY_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+
+class PoolBusy(Exception):
+    """排队的查询太多"""
+
+
+class QueryTimeout(Exception):
+    """查询超时"""
+
+
+class PoolClosed(Exception):
+    """进程池已关闭(图重新加载后旧版本的进程池),调用方应改为在本进程中搜索"""
+
+
+def run_search(astar, dijkstra, algo, start, end, detailed=True):
+    """按算法名执行一次查询,返回算法的结果字典;算法不可用、出错或无路径时返回None。
+    detailed为False时不拼接原始折点(path_coords为空),由调用方按细节层级拼接"""
+    try:
+        if algo in ('astar', 'bi_astar', 'alt') and astar:
+            res = run_astar(start, end, astar,
+                            bidirectional=(algo == 'bi_astar'),
+                            heuristic='alt' if algo == 'alt' else 'haversine',
+                            detailed=detailed)
+        elif algo == 'dijkstra' and dijkstra:
+            res = dijkstra_find_path(dijkstra, start, end, detailed)
+        elif algo == 'bi_dijkstra' and dijkstra:
+            res = dijkstra.find_path_bidirectional(start, end, detailed)
+        elif algo == 'ch' and dijkstra:
+            # 收缩层次：没有预处理结果时退回实时Dijkstra
+            res = dijkstra.find_path_ch(start, end, detailed)
+        elif algo == 'table' and dijkstra:
+            # 查表模式：小图查全源最短路表，大图自动退回实时Dijkstra
+            res = dijkstra.find_path_table(start, end, detailed)
+        else:
+            return None
+    except:
+        return None
+    if res and res.get('path') is not None:
+        return res
+    return None
+
+
+# 工作进程内的图和搜索对象
+_worker = {}
+
+
+def _init_worker(snapshot_dir):
+    core = load_snapshot(snapshot_dir, mmap=True)
+    astar = Map_Astar(core)
+    astar.set_landmarks(LandmarkIndex.load(snapshot_dir))
+    dijkstra = DijkstraNavigator(core)
+    dijkstra.attach_table(AllPairsTable.load(snapshot_dir))
+    dijkstra.attach_ch(ContractionHierarchy.load(snapshot_dir))
+    _worker['astar'] = astar
+    _worker['dijkstra'] = dijkstra
+
+
+def _worker_search(algo, start, end, detailed=True):
+    return run_search(_worker['astar'], _worker['dijkstra'], algo, start, end, detailed)
+
+
+def _worker_matrix_rows(sources, targets):
+    core = _worker['dijkstra'].core
+    return [shortest_distances(core, s, targets)[targets] for s in sources]
+
+
+def _ping():
+    return os.getpid()
+
+
+class QueryPool:
+    def __init__(self, snapshot_dir, workers=QUERY_WORKERS, timeout=QUERY_TIMEOUT,
+                 max_pending=QUERY_MAX_PENDING, owns_dir=None):
+        self.snapshot_dir = snapshot_dir
+        self.workers = workers
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self._owns_dir = owns_dir   # 关闭时删除的目录
+        self._pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                         initargs=(snapshot_dir,),
+                                         mp_context=multiprocessing.get_context(QUERY_START_METHOD))
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.closed = False
+        self.stats = {'submitted': 0, 'completed': 0, 'rejected': 0, 'timeouts': 0, 'errors': 0}
+
+    @classmethod
+    def for_graph(cls, core, snapshot_dir=None, astar=None, dijkstra=None, **kwargs):
+        """把图和已构建好的预处理结果导出到snapshot_dir(为None时新建临时目录),启动工作进程"""
+        owns_dir = snapshot_dir
+        if snapshot_dir is None:
+            owns_dir = tempfile.mkdtemp(prefix='graph_snapshot.pool-')
+            snapshot_dir = os.path.join(owns_dir, 'snapshot')
+        export_snapshot(core, snapshot_dir)
+        pres = [astar.landmarks if astar is not None else None]
+        if dijkstra is not None:
+            pres += [dijkstra.table, dijkstra.ch]
+        for pre in pres:
+            if pre is not None:
+                pre.save(snapshot_dir)
+        return cls(snapshot_dir, owns_dir=owns_dir, **kwargs)
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def warm_up(self):
+        """提前启动所有工作进程并完成图的映射"""
+        futures = [self._pool.submit(_ping) for _ in range(self.workers)]
+        for f in futures:
+            f.result()
+        return self
+
+    def _done(self, future):
+        with self._lock:
+            self._pending -= 1
+            if future.cancelled():
+                return
+            if future.exception() is not None:
+                self.stats['errors'] += 1
+            else:
+                self.stats['completed'] += 1
+
+    def submit(self, algo, start, end, detailed=True):
+        """提交一次查询,返回Future;排队已满时抛出PoolBusy"""
+        return self._submit(_worker_search, algo, start, end, detailed)
+
+    def _submit(self, fn, *args):
+        with self._lock:
+            if self.closed:
+                raise PoolClosed('进程池已关闭')
+            if self._pending >= self.max_pending:
+                self.stats['rejected'] += 1
+                raise PoolBusy(f'排队的查询已达上限{self.max_pending}')
+            self._pending += 1
+            self.stats['submitted'] += 1
+        try:
+            future = self._pool.submit(fn, *args)
+        except Exception as e:
+            with self._lock:
+                self._pending -= 1
+            # 检查之后、提交之前被关闭
+            if self.closed:
+                raise PoolClosed('进程池已关闭') from e
+            raise
+        future.add_done_callback(self._done)
+        return future
+
+    def search(self, algo, start, end, timeout=None, detailed=True):
+        """在工作进程中执行一次查询,返回值与run_search相同"""
+        timeout = self.timeout if timeout is None else timeout
+        future = self.submit(algo, start, end, detailed)
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            # 还没开始的查询直接取消;已经在运行的只能等它结束,结果丢弃
+            future.cancel()
+            with self._lock:
+                self.stats['timeouts'] += 1
+            raise QueryTimeout(f'查询超过{timeout}秒')
+
+    def matrix_rows(self, src_idx, dst_idx, chunks=None, timeout=None):
+        """按起点(下标)分块在工作进程中算距离矩阵,返回与src_idx对应的行列表。
+        整个矩阵最多等待timeout秒(默认为查询超时);提交失败或超时时取消其余未开始的块"""
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        chunks = min(chunks or self.workers, self.workers, len(src_idx))
+        size = (len(src_idx) + chunks - 1) // chunks
+        futures = []
+        try:
+            for i in range(0, len(src_idx), size):
+                futures.append(self._submit(_worker_matrix_rows, src_idx[i:i + size], dst_idx))
+            rows = []
+            for future in futures:
+                rows.extend(future.result(max(deadline - time.monotonic(), 0)))
+            return rows
+        except FutureTimeout:
+            with self._lock:
+                self.stats['timeouts'] += 1
+            raise QueryTimeout(f'距离矩阵计算超过{timeout}秒')
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def close(self, wait=False):
+        """不再接收新查询(之后的提交抛出PoolClosed);已提交的查询完成后关闭进程并删除导出的快照。
+        wait为False时在后台线程里等待"""
+        with self._lock:
+            self.closed = True
+        def finish():
+            self._pool.shutdown(wait=True)
+            if self._owns_dir:
+                shutil.rmtree(self._owns_dir, ignore_errors=True)
+        if wait:
+            finish()
+        else:
+            threading.Thread(target=finish, daemon=True).start()
+
+
+if __name__ == '__main__':
+    import sys
+    import tempfile
+    import numpy as np
+    from concurrent.futures import ThreadPoolExecutor
+    from synthetic import geometric_graph
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    core = geometric_graph(n)
+    rng = np.random.default_rng(0)
+    pairs = [(int(a), int(b)) for a, b in rng.integers(0, n, size=(count, 2)) if a != b]
+    astar = Map_Astar(core)
+    dijkstra = DijkstraNavigator(core)
+
+    # 基准: 8个请求线程在同一进程里直接搜索
+    t0 = time.time()
+    with ThreadPoolExecutor(8) as threads:
+        list(threads.map(lambda p: run_search(astar, dijkstra, 'dijkstra', *p), pairs))
+    base = time.time() - t0
+    print(f"{n}个节点, {len(pairs)}次Dijkstra查询, 进程内线程: {len(pairs) / base:.1f}次/秒")
+
+    for workers in sorted({1, 2, 4, QUERY_WORKERS}):
+        with tempfile.TemporaryDirectory() as tmp:
+            pool = QueryPool.for_graph(core, os.path.join(tmp, 'snapshot'), workers=workers,
+                                       timeout=60, max_pending=len(pairs)).warm_up()
+            t0 = time.time()
+            with ThreadPoolExecutor(8) as threads:
+                list(threads.map(lambda p: pool.search('dijkstra', *p), pairs))
+            elapsed = time.time() - t0
+            pool.close(wait=True)
+        print(f"  {workers}个工作进程: {len(pairs) / elapsed:.1f}次/秒 ({base / elapsed:.2f}倍)")
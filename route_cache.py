@@ -0,0 +1,100 @@
+"""
+    代码主要功能:
+    /calc 的路径结果缓存。按(图版本, 起点, 终点, 算法)缓存最终的响应数据,
+    使用LRU淘汰;无向图中 end->start 的结果就是 start->end 的反向路径,
+    两个方向共用一个缓存条目。图重新加载后版本号变化,旧条目全部失效;
+    增量修改图时只作废受影响的条目。
+"""
+import json
+import threading
+
+from lru import LRUCache
+from polyline import polyline_payload
+
+ROUTE_CACHE_SIZE = 512
+
+
+def reverse_payload(payload):
+    """由 start->end 的响应构造 end->start 的响应;与起终点有关的字段都要交换,
+    编码折线由反转后的coords生成,不需要单独处理"""
+    rev = dict(payload)
+    for a, b in (('start_id', 'end_id'), ('start_name', 'end_name'),
+                 ('start_coord', 'end_coord')):
+        if a in payload or b in payload:
+            rev[a], rev[b] = payload.get(b), payload.get(a)
+    rev['coords'] = payload['coords'][::-1]
+    if payload.get('path') is not None:
+        rev['path'] = payload['path'][::-1]
+    return rev
+
+
+class RouteCache:
+    def __init__(self, maxsize=ROUTE_CACHE_SIZE, dumps=json.dumps):
+        self._lru = LRUCache(maxsize)
+        self._dumps = dumps
+        self._lock = threading.Lock()
+        self.version = 0
+        self.symmetric_hits = 0
+
+    def _key(self, start, end, algo, version=None):
+        lo, hi = (start, end) if start <= end else (end, start)
+        return (self.version if version is None else version, lo, hi, algo)
+
+    def _body(self, payload, precision):
+        if precision is not None:
+            payload = polyline_payload(payload, precision)
+        return self._dumps(payload)
+
+    def get(self, start, end, algo, version=None, precision=None):
+        """命中返回序列化好的响应体,未命中返回None。
+        version为请求所用的图版本,默认取当前版本;precision不为None时返回编码折线格式"""
+        entry = self._lru.get(self._key(start, end, algo, version))
+        if entry is None:
+            return None
+        body = entry['bodies'].get((start, end, precision))
+        if body is None:
+            # 反方向或另一种格式第一次被请求,由缓存的结果生成后记在同一条目里
+            payload = entry['payload']
+            if payload['start_id'] != start:
+                payload = reverse_payload(payload)
+                with self._lock:
+                    self.symmetric_hits += 1
+            body = self._body(payload, precision)
+            entry['bodies'][(start, end, precision)] = body
+        return body
+
+    def put(self, start, end, algo, payload, version=None, precision=None):
+        """缓存一次计算结果,返回序列化好的响应体"""
+        body = self._body(payload, precision)
+        self._lru.put(self._key(start, end, algo, version),
+                      {'payload': payload, 'bodies': {(start, end, precision): body}})
+        return body
+
+    def invalidate_routes(self, affected, version=None):
+        """图增量修改后只作废受影响的条目。affected接收[(键, 起点, 终点, 路径, 距离)]
+        并返回要作废的键,其余条目换到新版本号下继续使用。返回作废的条目数"""
+        entries = self._lru.items()
+        routes = [(key, e['payload']['start_id'], e['payload']['end_id'],
+                   e['payload'].get('path'), e['payload']['dist']) for key, e in entries]
+        drop = affected(routes)
+        with self._lock:
+            self.version = self.version + 1 if version is None else version
+        # 按从旧到新的顺序放回,保持LRU次序
+        for key, entry in entries:
+            self._lru.pop(key)
+            if key not in drop:
+                self._lru.put((self.version,) + key[1:], entry)
+        return len(drop)
+
+    def invalidate(self, version=None):
+        """图重新加载后调用,切换版本号并清空旧条目"""
+        with self._lock:
+            self.version = self.version + 1 if version is None else version
+            self.symmetric_hits = 0
+        self._lru.clear()
+
+    def stats(self):
+        stats = self._lru.stats()
+        stats['version'] = self.version
+        stats['symmetric_hits'] = self.symmetric_hits
+        return stats
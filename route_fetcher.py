@@ -0,0 +1,135 @@
+"""
+    代码主要功能:
+    并发获取步行路径。多个工作线程共用一个令牌桶限速,
+    遇到限流、网络异常或服务端错误时按指数退避(加随机抖动)重试。
+    api对象只需提供 fetch(lon1, lat1, lon2, lat2):
+    返回折点列表,没有路线时返回None,可以重试的失败抛出TransientError。
+    api还可以提供 lookup(lon1, lat1, lon2, lat2) 查本地缓存,返回(是否命中, 折点),
+    命中的点对不占用限速令牌,也不计入请求数。
+
+    用本地模拟服务测试: python route_fetcher.py [并发数] [每秒请求数]
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# 默认并发数、每秒请求数、重试次数与首次重试等待(秒),按API Key的配额调整
+FETCH_WORKERS = 8
+FETCH_RATE = 20
+FETCH_RETRIES = 4
+FETCH_BACKOFF = 0.5
+
+
+class TransientError(Exception):
+    """可以重试的失败(网络异常、限流、服务端错误)"""
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)                           # 每秒补充的令牌数
+        self.capacity = float(capacity or max(1.0, rate))  # 最多积攒的令牌数(允许的突发)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """取一个令牌,没有时阻塞等待"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class RouteFetcher:
+    def __init__(self, api, workers=FETCH_WORKERS, rate=FETCH_RATE,
+                 retries=FETCH_RETRIES, backoff=FETCH_BACKOFF):
+        self.api = api
+        self.workers = workers
+        self.bucket = TokenBucket(rate)
+        self.retries = retries
+        self.backoff = backoff
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'cache_hits': 0, 'retries': 0, 'failures': 0}
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def fetch_one(self, lon1, lat1, lon2, lat2):
+        """获取一对点的步行路径,重试用尽或出现其他异常时返回None"""
+        lookup = getattr(self.api, 'lookup', None)
+        if lookup is not None:
+            found, coords = lookup(lon1, lat1, lon2, lat2)
+            if found:
+                self._count('cache_hits')
+                return coords
+        for attempt in range(self.retries + 1):
+            self.bucket.acquire()
+            self._count('requests')
+            try:
+                return self.api.fetch(lon1, lat1, lon2, lat2)
+            except TransientError:
+                if attempt == self.retries:
+                    break
+                self._count('retries')
+                delay = self.backoff * (2 ** attempt)
+                time.sleep(delay + random.uniform(0, delay))
+            except Exception:
+                break
+        self._count('failures')
+        return None
+
+    def fetch_all(self, coord_pairs, progress=None):
+        """coord_pairs为[(lon1, lat1, lon2, lat2), ...],按相同顺序返回结果列表。
+        progress(完成数, 总数)每完成一个请求调用一次"""
+        total = len(coord_pairs)
+        results = [None] * total
+        done = [0]
+
+        def work(k):
+            results[k] = self.fetch_one(*coord_pairs[k])
+            if progress is not None:
+                with self._lock:
+                    done[0] += 1
+                    progress(done[0], total)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            # list()让工作线程中的异常在这里抛出
+            list(pool.map(work, range(total)))
+        return results
+
+
+if __name__ == '__main__':
+    import sys
+    import pandas as pd
+    from amap_stub import start_stub
+    from map_dis import GDDT
+    # 直接运行时本文件是__main__,要和map_dis使用同一个模块里的TransientError
+    from route_fetcher import RouteFetcher
+
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else FETCH_WORKERS
+    rate = float(sys.argv[2]) if len(sys.argv) > 2 else FETCH_RATE
+
+    # 模拟服务: 每次响应延迟50毫秒,超过每秒rate个请求时返回限流错误,另有5%的请求随机失败
+    server = start_stub(qps=rate, fail_rate=0.05, latency=0.05)
+    nodes = pd.read_csv('map_nodes.csv', encoding='utf-8-sig')
+    lons = nodes['longitude'].tolist()
+    lats = nodes['latitude'].tolist()
+    pairs = [(lons[i], lats[i], lons[j], lats[j])
+             for i in range(len(nodes)) for j in range(i + 1, len(nodes))]
+
+    fetcher = RouteFetcher(GDDT('stub', api_url=server.url), workers=workers, rate=rate)
+    t0 = time.time()
+    routes = fetcher.fetch_all(pairs)
+    elapsed = time.time() - t0
+    server.shutdown()
+    ok = sum(r is not None for r in routes)
+    print(f"{len(pairs)}个点对, 成功{ok}个, 耗时{elapsed:.1f}秒, 统计: {fetcher.stats}, "
+          f"模拟服务: {server.stats}")
@@ -0,0 +1,67 @@
+"""
+    代码主要功能:
+    搜索用的可复用工作区。按图的节点数预先分配好距离、前驱、
+    代次标记等数组,每次查询只把代次加1,不再为全图重新初始化字典。
+    数组元素只有在 stamp[v] == 当前代次 时才有效,因此一次查询的开销
+    只和它实际访问到的节点数有关。
+    工作区放在加锁的空闲列表里按节点数复用:Werkzeug每个请求开一个新线程,
+    按线程保存的工作区在请求之间无法复用。查询出错没有归还的工作区直接丢弃,下次重新分配。
+"""
+import threading
+
+# 每种节点数最多保留的空闲工作区数,以及同时保留的节点数种类(重新加载期间新旧图并存)
+WORKSPACE_POOL_SIZE = 8
+WORKSPACE_MAX_SIZES = 2
+
+_free = {}
+_free_lock = threading.Lock()
+
+
+class SearchWorkspace:
+    def __init__(self, n):
+        self.n = n
+        self.dist = [0.0] * n     # 距离(A*中为g值)
+        self.prev = [-1] * n      # 前驱下标
+        self.stamp = [0] * n      # dist/prev 有效的代次
+        self.closed = [0] * n     # 已结算的代次
+        self.generation = 0
+
+    def begin(self):
+        """开始一次新查询,返回本次查询的代次"""
+        self.generation += 1
+        return self.generation
+
+    def distance(self, v):
+        return self.dist[v] if self.stamp[v] == self.generation else float('inf')
+
+    def path_to(self, t):
+        """沿前驱回溯出到t的下标路径"""
+        path = []
+        v = t
+        while v != -1:
+            path.append(v)
+            v = self.prev[v]
+        path.reverse()
+        return path
+
+
+def acquire_workspace(n):
+    """取一个节点数为n的空闲工作区,没有时新分配;用完后调用release_workspace归还"""
+    with _free_lock:
+        spaces = _free.get(n)
+        if spaces:
+            return spaces.pop()
+    return SearchWorkspace(n)
+
+
+def release_workspace(ws):
+    """用完的工作区放回空闲列表;节点数种类过多时丢掉最早的(旧图的)"""
+    with _free_lock:
+        spaces = _free.get(ws.n)
+        if spaces is None:
+            while len(_free) >= WORKSPACE_MAX_SIZES:
+                del _free[next(iter(_free))]
+            spaces = _free[ws.n] = []
+        if len(spaces) < WORKSPACE_POOL_SIZE:
+            spaces.append(ws)
+
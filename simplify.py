@@ -0,0 +1,245 @@
+"""
+    代码主要功能:
+    折点的离线简化,为每条边预先算好多个细节层级。
+    - 先去掉连续重复的点(distance_final.csv中约四分之一的折点与前一个点相同)
+    - 再按各层级的容差(米)做Douglas–Peucker简化,层级0只去重不简化
+    - 各层级的点以float64数组 + 偏移数组保存,可以和图快照放在同一目录mmap读取;
+      层级0与图里的原始折点只差去重,不单独保存,用到时由原始折点现场去重
+    /calc 按请求的detail(层级)或zoom(地图缩放级别)选择层级拼接路径。
+
+    查看各层级的点数: python simplify.py [map_nodes.csv distance_final.csv]
+"""
+import json
+import math
+import os
+
+import numpy as np
+
+from graph_snapshot import read_meta, save_array, save_json
+
+# 各层级的简化容差(米)
+SIMPLIFY_LEVELS = (0.0, 1.0, 3.0, 8.0, 20.0)
+LEVELS_META = 'waypoint_levels.json'
+# 按缩放级别选层级时,允许的误差(屏幕像素)
+ZOOM_TOLERANCE_PX = 1.0
+# Web墨卡托在赤道处缩放级别0的每像素米数
+_METERS_PER_PIXEL_Z0 = 156543.03392
+_METERS_PER_DEGREE = 6371008.8 * math.pi / 180
+
+
+def dedupe(points):
+    """去掉连续重复的点"""
+    out = []
+    for p in points:
+        if not out or p[0] != out[-1][0] or p[1] != out[-1][1]:
+            out.append(p)
+    return out
+
+
+def dp_importance(points):
+    """Douglas–Peucker的重要度:容差小于该值时这个点会被保留(首尾点为inf)。
+    算一次就能得到所有容差下的简化结果"""
+    n = len(points)
+    imp = np.zeros(n)
+    if n == 0:
+        return imp
+    imp[0] = imp[-1] = np.inf
+    if n <= 2:
+        return imp
+    pts = np.asarray(points, dtype=np.float64)
+    # 小范围内按等距矩形投影换算成米
+    xy = np.empty_like(pts)
+    xy[:, 0] = (pts[:, 0] - pts[0, 0]) * math.cos(math.radians(pts[0, 1])) * _METERS_PER_DEGREE
+    xy[:, 1] = (pts[:, 1] - pts[0, 1]) * _METERS_PER_DEGREE
+    stack = [(0, n - 1, np.inf)]
+    while stack:
+        a, b, limit = stack.pop()
+        if b - a < 2:
+            continue
+        seg = xy[b] - xy[a]
+        rel = xy[a + 1:b] - xy[a]
+        length2 = float(seg @ seg)
+        if length2 == 0:
+            dist = np.hypot(rel[:, 0], rel[:, 1])
+        else:
+            # 到线段(而不是直线)的距离
+            t = np.clip(rel @ seg / length2, 0.0, 1.0)
+            dist = np.hypot(rel[:, 0] - t * seg[0], rel[:, 1] - t * seg[1])
+        k = int(np.argmax(dist))
+        if dist[k] <= 0:
+            continue
+        # 只有上层的分割点被保留,这个点才会被考虑
+        value = min(float(dist[k]), limit)
+        k += a + 1
+        imp[k] = value
+        stack.append((a, k, value))
+        stack.append((k, b, value))
+    return imp
+
+
+def douglas_peucker(points, tolerance):
+    """points为[[lon, lat], ...],保留首尾点,返回与原折线偏差不超过tolerance(米)的子序列"""
+    if len(points) <= 2 or tolerance <= 0:
+        return list(points)
+    return [points[i] for i in np.flatnonzero(dp_importance(points) > tolerance).tolist()]
+
+
+def level_for_zoom(zoom, lat, tolerances=SIMPLIFY_LEVELS, pixels=ZOOM_TOLERANCE_PX):
+    """该缩放级别下误差不超过pixels个像素的最粗层级"""
+    meters = _METERS_PER_PIXEL_Z0 * math.cos(math.radians(lat)) / (2 ** float(zoom)) * pixels
+    level = 0
+    for k, tol in enumerate(tolerances):
+        if tol <= meters:
+            level = k
+    return level
+
+
+def _edge_raw_points(core, e):
+    """第e条边(存储方向)的原始折点,没有折点时为两端点的直线"""
+    points = core.edge_waypoints(e)
+    if not points:
+        u, v = int(core.edge_u[e]), int(core.edge_v[e])
+        points = [core.coords[u].tolist(), core.coords[v].tolist()]
+    return points
+
+
+class WaypointLevels:
+    def __init__(self, tolerances, points, offsets):
+        self.tolerances = list(tolerances)
+        self.points = points      # 每层一个(K, 2)数组,[lon, lat];只去重的层级为None
+        self.offsets = offsets    # 每层一个(m + 1,)数组,第e条边的点为points[offsets[e]:offsets[e+1]]
+
+    @property
+    def count(self):
+        return len(self.tolerances)
+
+    @classmethod
+    def build(cls, core, tolerances=SIMPLIFY_LEVELS):
+        """对每条无向边(存储方向)去重并逐层简化;容差为0的层级不保存"""
+        chunks = [None if tol <= 0 else [] for tol in tolerances]
+        for e in range(core.m):
+            points = dedupe(_edge_raw_points(core, e))
+            imp = dp_importance(points)
+            for k, tol in enumerate(tolerances):
+                if tol > 0:
+                    chunks[k].append([points[i] for i in np.flatnonzero(imp > tol).tolist()])
+        all_points, all_offsets = [], []
+        for level in chunks:
+            if level is None:
+                all_points.append(None)
+                all_offsets.append(None)
+                continue
+            offsets = np.zeros(core.m + 1, dtype=np.int64)
+            np.cumsum([len(p) for p in level], out=offsets[1:])
+            flat = [p for edge in level for p in edge]
+            all_points.append(np.asarray(flat, dtype=np.float64).reshape(-1, 2))
+            all_offsets.append(offsets)
+        return cls(tolerances, all_points, all_offsets)
+
+    def edge_points(self, core, level, e):
+        if self.points[level] is None:
+            return np.asarray(dedupe(_edge_raw_points(core, e)), dtype=np.float64).reshape(-1, 2)
+        a, b = self.offsets[level][e], self.offsets[level][e + 1]
+        return self.points[level][a:b]
+
+    def build_path(self, core, idx_path, level):
+        """由下标路径拼接出该层级的路径[[lon, lat], ...];相邻边首尾相同的点只保留一个"""
+        parts = []
+        for i, j in zip(idx_path, idx_path[1:]):
+            k = core.edge_slot(i, j)
+            if k < 0:
+                continue
+            e = int(core.slot_edge[k])
+            pts = self.edge_points(core, level, e)
+            if core.edge_u[e] != i:
+                pts = pts[::-1]
+            if parts and len(pts) and len(parts[-1]) and (pts[0] == parts[-1][-1]).all():
+                pts = pts[1:]
+            parts.append(pts)
+        if not parts:
+            return []
+        return np.concatenate(parts).tolist()
+
+    def stats(self):
+        """各层级保存的点数,不保存的层级为None"""
+        return [{'level': k, 'tolerance': tol,
+                 'points': None if self.points[k] is None else int(len(self.points[k]))}
+                for k, tol in enumerate(self.tolerances)]
+
+    def save(self, snapshot_dir):
+        """保存到图快照目录,记录对应快照的生成时间用于校验"""
+        m = None
+        for k in range(self.count):
+            if self.points[k] is None:
+                continue
+            save_array(os.path.join(snapshot_dir, f'wp{k}_points.npy'), self.points[k])
+            save_array(os.path.join(snapshot_dir, f'wp{k}_offsets.npy'), self.offsets[k])
+            m = int(len(self.offsets[k]) - 1)
+        meta = read_meta(snapshot_dir) or {}
+        save_json(os.path.join(snapshot_dir, LEVELS_META),
+                  {'tolerances': self.tolerances, 'm': meta.get('m') if m is None else m,
+                   'snapshot_created': meta.get('created')})
+
+    @classmethod
+    def load(cls, snapshot_dir, mmap=True):
+        """从快照目录读取,不存在或与快照不匹配时返回None"""
+        path = os.path.join(snapshot_dir, LEVELS_META)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            levels_meta = json.load(f)
+        meta = read_meta(snapshot_dir) or {}
+        if levels_meta.get('snapshot_created') != meta.get('created') \
+                or levels_meta.get('m') != meta.get('m'):
+            return None
+        mode = 'r' if mmap else None
+        tolerances = levels_meta['tolerances']
+        points = [None if tol <= 0 else
+                  np.load(os.path.join(snapshot_dir, f'wp{k}_points.npy'), mmap_mode=mode)
+                  for k, tol in enumerate(tolerances)]
+        offsets = [None if tol <= 0 else
+                   np.load(os.path.join(snapshot_dir, f'wp{k}_offsets.npy'), mmap_mode=mode)
+                   for k, tol in enumerate(tolerances)]
+        return cls(tolerances, points, offsets)
+
+
+def load_or_build_levels(core, snapshot_dir=None, tolerances=SIMPLIFY_LEVELS):
+    """优先读快照里的简化结果,没有或容差不同时现算(并写回快照)"""
+    if core is None:
+        return None
+    if snapshot_dir and os.path.isdir(snapshot_dir):
+        levels = WaypointLevels.load(snapshot_dir)
+        if levels is not None and levels.tolerances == list(tolerances):
+            return levels
+    levels = WaypointLevels.build(core, tolerances)
+    if snapshot_dir and os.path.isdir(snapshot_dir):
+        try:
+            levels.save(snapshot_dir)
+        except OSError:
+            pass
+    return levels
+
+
+if __name__ == '__main__':
+    import sys
+    import time
+    from graph_loader import load_graph
+
+    if len(sys.argv) < 3:
+        nodes_file = 'map_nodes.csv'
+        edges_file = 'distance_final.csv'
+    else:
+        nodes_file = sys.argv[1]
+        edges_file = sys.argv[2]
+
+    core = load_graph(nodes_file, edges_file)
+    raw = sum(len(core.edge_waypoints(e) or []) for e in range(core.m))
+    t0 = time.time()
+    levels = WaypointLevels.build(core)
+    print(f"{core.m}条边, 原始折点{raw}个, 折点字符串{core.wp_buffer.nbytes}字节, "
+          f"简化耗时{(time.time() - t0) * 1000:.0f}毫秒")
+    for row in levels.stats():
+        if row['points'] is None:
+            print(f"  层级{row['level']} 容差{row['tolerance']}米: 不保存,由原始折点去重得到")
+        else:
+            print(f"  层级{row['level']} 容差{row['tolerance']}米: {row['points']}个点")
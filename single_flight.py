@@ -0,0 +1,56 @@
+"""
+    代码主要功能:
+    合并同时到达的相同请求(single-flight):同一个键第一个到达的请求负责计算,
+    计算期间到达的相同请求等待它的结果,所有请求拿到同一份结果;计算出错时一起收到该异常。
+    计算结束后键即被移除,之后的请求由缓存负责。
+"""
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.leaders = 0      # 实际执行计算的次数
+        self.coalesced = 0    # 被合并、直接复用结果的请求数
+
+    def do(self, key, fn):
+        """返回(fn()的结果, 是否复用了其他请求的结果)"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def stats(self):
+        with self._lock:
+            inflight = len(self._calls)
+        return {'leaders': self.leaders, 'coalesced': self.coalesced, 'inflight': inflight}
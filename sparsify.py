@@ -0,0 +1,190 @@
+"""
+    代码主要功能:
+    对map_dis生成的完全图做稀疏化,减少边数,同时保持(或有界地放宽)最短路距离。
+    - greedy_spanner: 先删掉能由经过中间点的更短路径代替的边,所有点对的最短距离不变;
+      stretch>1时再按边权从小到大检查剩下的边,只有已保留的边无法以不超过
+      stretch*w 的距离连通两端时才保留,边数大幅减少,距离最多伸长到stretch倍
+    - knn_mst_pairs: 由直线距离矩阵选出每个节点最近的k个邻居,再加上最小生成树保证连通,
+      map_dis可以只对这些点对请求步行路径
+    - sparsify_edges: 对边表DataFrame做稀疏化,保留下来的边原样保留折点
+    - distance_stretch: 比较稀疏化前后各点对最短距离的最大伸长比例
+
+    用法: python sparsify.py [distance_final.csv 输出文件 stretch]
+"""
+import heapq
+import sys
+
+import numpy as np
+import pandas as pd
+
+from apsp import APSP_MAX_NODES
+from graph_loader import resolve_edge_columns
+
+# 判断"不更长"时允许的浮点误差(米)
+DIST_EPS = 1e-6
+
+
+def _bounded_search(adj, u, v, limit):
+    """在当前保留的边上从u出发搜索,只扩展距离不超过limit的节点。
+    找到一条到v且不超过limit的路径就提前结束。返回搜索中得到的距离字典,
+    其中每个值都对应一条真实存在的路径,是最短距离的上界"""
+    dist = {u: 0.0}
+    pq = [(0.0, u)]
+    while pq:
+        d, x = heapq.heappop(pq)
+        if d > dist[x]:
+            continue
+        for y, w in adj[x]:
+            nd = d + w
+            if nd <= limit and nd < dist.get(y, float('inf')):
+                dist[y] = nd
+                if y == v:
+                    return dist
+                heapq.heappush(pq, (nd, y))
+    return dist
+
+
+def _redundant_by_two_hop(n, us, vs, weights):
+    """边(u,v)存在中间点k使 d(u,k) + d(k,v) <= w 时可以删掉,d为全源最短距离。
+    边权为正时d(u,k)、d(k,v)都严格小于w,按边权归纳可知同时删掉所有这样的边
+    也不会改变任何最短距离"""
+    dist = np.full((n, n), np.inf)
+    np.minimum.at(dist, (us, vs), weights)
+    np.minimum.at(dist, (vs, us), weights)
+    np.fill_diagonal(dist, 0.0)
+    # 向量化的Floyd-Warshall,只需要距离
+    for k in range(n):
+        np.minimum(dist, dist[:, k, None] + dist[None, k, :], out=dist)
+
+    redundant = np.zeros(len(weights), dtype=bool)
+    order = np.argsort(us, kind='stable')
+    bounds = np.searchsorted(us[order], np.arange(n + 1))
+    for u in range(n):
+        edges = order[bounds[u]:bounds[u + 1]]
+        if len(edges) == 0:
+            continue
+        v = vs[edges]
+        # via[i, k] = d(u,k) + d(k,v_i),中间点不能是两个端点本身
+        via = dist[u][None, :] + dist[v, :]
+        via[:, u] = np.inf
+        via[np.arange(len(edges)), v] = np.inf
+        redundant[edges] = via.min(axis=1) <= weights[edges] + DIST_EPS
+    return redundant
+
+
+def greedy_spanner(src, dst, weights, stretch=1.0):
+    """返回边的保留掩码;src/dst为节点编号,不要求连续。
+    节点数不超过APSP_MAX_NODES时先用全源最短距离删去不影响距离的边,
+    stretch=1时这就是最终结果,否则再对剩下的边做贪心"""
+    src = np.asarray(src)
+    dst = np.asarray(dst)
+    weights = np.asarray(weights, dtype=np.float64)
+    ids, inv = np.unique(np.concatenate([src, dst]), return_inverse=True)
+    n, m = len(ids), len(weights)
+    us, vs = inv[:m], inv[m:]
+    keep = us != vs
+    if n <= APSP_MAX_NODES:
+        keep &= ~_redundant_by_two_hop(n, us, vs, weights)
+        if stretch <= 1.0:
+            return keep
+
+    candidates = np.nonzero(keep)[0]
+    keep = np.zeros(m, dtype=bool)
+    adj = [[] for _ in range(n)]
+    # 以前搜索得到的距离上界:保留的边只增不减,上界一直有效,
+    # 上界已不超过stretch*w的边不用再搜索
+    known = [dict() for _ in range(n)]
+    us, vs = us.tolist(), vs.tolist()
+    for e in candidates[np.argsort(weights[candidates], kind='stable')].tolist():
+        u, v, w = us[e], vs[e], float(weights[e])
+        limit = stretch * w + DIST_EPS
+        if known[u].get(v, float('inf')) <= limit:
+            continue
+        dist = _bounded_search(adj, u, v, limit)
+        for x, d in dist.items():
+            if d < known[u].get(x, float('inf')):
+                known[u][x] = d
+                known[x][u] = d
+        if v in dist:
+            continue
+        keep[e] = True
+        adj[u].append((v, w))
+        adj[v].append((u, w))
+    return keep
+
+
+def knn_mst_pairs(dist_matrix, k):
+    """每个节点最近的k个邻居加上最小生成树的边,返回i < j的点对列表"""
+    dist_matrix = np.asarray(dist_matrix, dtype=np.float64)
+    n = len(dist_matrix)
+    pairs = set()
+    if n < 2:
+        return []
+    k = min(k, n - 1)
+    d = dist_matrix.copy()
+    np.fill_diagonal(d, np.inf)
+    if k > 0:
+        nearest = np.argpartition(d, k - 1, axis=1)[:, :k]
+        for i in range(n):
+            for j in nearest[i].tolist():
+                pairs.add((min(i, j), max(i, j)))
+
+    # Prim算法求完全图的最小生成树,保证任意两点连通
+    in_tree = np.zeros(n, dtype=bool)
+    best = d[0].copy()
+    parent = np.zeros(n, dtype=np.int64)
+    in_tree[0] = True
+    best[0] = np.inf
+    for _ in range(n - 1):
+        j = int(np.argmin(np.where(in_tree, np.inf, best)))
+        i = int(parent[j])
+        pairs.add((min(i, j), max(i, j)))
+        in_tree[j] = True
+        closer = d[j] < best
+        best[closer] = d[j][closer]
+        parent[closer] = j
+    return sorted(pairs)
+
+
+def sparsify_edges(edges_df, stretch=1.0):
+    """对边表做贪心稀疏化,返回保留下来的行(列与折点不变)"""
+    from_col, to_col, dist_col, _ = resolve_edge_columns(edges_df.columns)
+    keep = greedy_spanner(edges_df[from_col].to_numpy(),
+                          edges_df[to_col].to_numpy(),
+                          edges_df[dist_col].to_numpy(dtype=np.float64),
+                          stretch)
+    return edges_df[keep].reset_index(drop=True)
+
+
+def distance_stretch(full, sparse):
+    """两张图(GraphCore,节点相同)所有点对最短距离之比的最大值,不连通为inf"""
+    from dijkstra import shortest_distances
+
+    # full的下标i对应sparse中的下标order[i]
+    order = [sparse.index_of(full.node_id(i)) for i in range(full.n)]
+    worst = 1.0
+    for s in range(full.n):
+        a = shortest_distances(full, s)
+        b = shortest_distances(sparse, order[s])[order]
+        ok = np.isfinite(a) & (a > 0)
+        if not np.all(np.isfinite(b[ok])):
+            return float('inf')
+        if ok.any():
+            worst = max(worst, float(np.max(b[ok] / a[ok])))
+    return worst
+
+
+if __name__ == '__main__':
+    from graph_loader import load_graph
+
+    in_file = sys.argv[1] if len(sys.argv) > 1 else 'distance_final.csv'
+    out_file = sys.argv[2] if len(sys.argv) > 2 else 'distance_sparse.csv'
+    stretch = float(sys.argv[3]) if len(sys.argv) > 3 else 1.0
+
+    edges = pd.read_csv(in_file, encoding='utf-8-sig')
+    sparse = sparsify_edges(edges, stretch)
+    sparse.to_csv(out_file, index=False, encoding='utf-8-sig')
+    worst = distance_stretch(load_graph('map_nodes.csv', in_file),
+                             load_graph('map_nodes.csv', out_file))
+    print(f"稀疏化完成: {len(edges)} -> {len(sparse)}条边, "
+          f"最短距离最大伸长 {(worst - 1) * 100:.2f}%")
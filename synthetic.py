@@ -0,0 +1,73 @@
+"""
+    代码主要功能:
+    生成用于基准测试的合成路网(坐标在校园附近),边权为两端点的球面距离
+    乘以一个随机的绕行系数,模拟沿步行路线的实际距离。
+    - grid_graph: side x side 的网格路网,坐标带少量抖动
+    - geometric_graph: 随机撒点,每个点连向最近的k个点
+    - complete_graph: 完全图,与distance_final.csv的结构相同
+"""
+import numpy as np
+
+from geodesic import haversine
+from graph_core import GraphCore
+
+# 合成路网的中心坐标(经度, 纬度)与单个网格的大小(度)
+CENTER = (102.85, 24.85)
+CELL = 0.001
+
+
+def _make_core(coords, src, dst, detour, rng):
+    """按球面距离乘绕行系数生成边权,组装成GraphCore"""
+    n = len(coords)
+    ids = np.arange(n)
+    straight = haversine(coords[src, 0], coords[src, 1], coords[dst, 0], coords[dst, 1])
+    weights = straight * (1.0 + detour * rng.random(len(src)))
+    names = [f'合成节点{i}' for i in range(n)]
+    return GraphCore.from_arrays(ids, names, coords, src, dst, weights)
+
+
+def grid_graph(side, detour=1.0, seed=0):
+    """side x side 的网格,每个点连右边和上边的点"""
+    rng = np.random.default_rng(seed)
+    n = side * side
+    ids = np.arange(n)
+    coords = np.empty((n, 2))
+    coords[:, 0] = CENTER[0] + (ids % side + rng.random(n) * 0.3) * CELL
+    coords[:, 1] = CENTER[1] + (ids // side + rng.random(n) * 0.3) * CELL
+    right = ids[ids % side < side - 1]
+    up = ids[ids // side < side - 1]
+    src = np.concatenate([right, up])
+    dst = np.concatenate([right + 1, up + side])
+    return _make_core(coords, src, dst, detour, rng)
+
+
+def geometric_graph(n, k=6, detour=0.5, seed=0):
+    """在正方形区域随机撒n个点,每个点连向最近的k个点"""
+    rng = np.random.default_rng(seed)
+    side = np.sqrt(n) * CELL
+    coords = np.empty((n, 2))
+    coords[:, 0] = CENTER[0] + rng.random(n) * side
+    coords[:, 1] = CENTER[1] + rng.random(n) * side
+    k = min(k, n - 1)
+    src, dst = [], []
+    # 分块计算平面近似距离找最近邻,避免一次分配n*n的矩阵
+    block = max(1, 4000000 // max(n, 1))
+    for a in range(0, n, block):
+        part = coords[a:a + block]
+        d2 = ((part[:, None, :] - coords[None, :, :]) ** 2).sum(axis=2)
+        d2[np.arange(len(part)), np.arange(a, a + len(part))] = np.inf
+        nearest = np.argpartition(d2, k - 1, axis=1)[:, :k]
+        src.append(np.repeat(np.arange(a, a + len(part)), k))
+        dst.append(nearest.ravel())
+    return _make_core(coords, np.concatenate(src), np.concatenate(dst), detour, rng)
+
+
+def complete_graph(n, detour=0.5, seed=0):
+    """n个随机点两两相连的完全图"""
+    rng = np.random.default_rng(seed)
+    side = np.sqrt(n) * CELL * 4
+    coords = np.empty((n, 2))
+    coords[:, 0] = CENTER[0] + rng.random(n) * side
+    coords[:, 1] = CENTER[1] + rng.random(n) * side
+    src, dst = np.triu_indices(n, 1)
+    return _make_core(coords, src, dst, detour, rng)
@@ -0,0 +1,120 @@
+"""
+    代码主要功能:
+    步行路径API响应的本地持久化缓存(SQLite)。
+    以四舍五入后的起终点坐标作为键,缓存GDDT返回的折点(没有路线也缓存,值为空),
+    重新运行map_dis时坐标没变的点对直接读缓存,新增一个POI只需请求新的n个点对。
+    - 查不到正向时查反向,找到就把折点倒过来用
+    - 条目超过有效期(TTL)视为未命中;条目数超过上限时按最近使用时间淘汰
+
+    查看/清理缓存: python walk_cache.py [缓存文件]
+"""
+import os
+import sqlite3
+import threading
+import time
+
+WALK_CACHE_FILE = 'walk_cache.sqlite'
+# 坐标保留的小数位数(1e-6度约0.1米),有效期(秒)与最多保存的条目数
+KEY_PRECISION = 6
+WALK_CACHE_TTL = 90 * 24 * 3600
+WALK_CACHE_MAX_ENTRIES = 200000
+# 每写入这么多条检查一次是否需要淘汰
+_PRUNE_EVERY = 1000
+
+
+def _encode(coords):
+    return ';'.join(f"{lon},{lat}" for lon, lat in coords)
+
+
+def _decode(text):
+    return [[float(v) for v in p.split(',')] for p in text.split(';')] if text else []
+
+
+class WalkRouteCache:
+    def __init__(self, path=WALK_CACHE_FILE, ttl=WALK_CACHE_TTL,
+                 max_entries=WALK_CACHE_MAX_ENTRIES, precision=KEY_PRECISION):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.precision = precision
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        # 多个获取线程共用一个连接,由锁保证串行访问
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS routes ('
+                         'key TEXT PRIMARY KEY, coords TEXT, created REAL, accessed REAL)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS routes_accessed ON routes(accessed)')
+        self._db.commit()
+        self.prune()
+
+    def _key(self, lon1, lat1, lon2, lat2):
+        p = self.precision
+        return f"{lon1:.{p}f},{lat1:.{p}f};{lon2:.{p}f},{lat2:.{p}f}"
+
+    def lookup(self, lon1, lat1, lon2, lat2):
+        """返回(是否命中, 折点列表或None)"""
+        now = time.time()
+        forward = self._key(lon1, lat1, lon2, lat2)
+        backward = self._key(lon2, lat2, lon1, lat1)
+        with self._lock:
+            for key, reverse in ((forward, False), (backward, True)):
+                row = self._db.execute('SELECT coords, created FROM routes WHERE key = ?',
+                                       (key,)).fetchone()
+                if row is None or now - row[1] > self.ttl:
+                    continue
+                self._db.execute('UPDATE routes SET accessed = ? WHERE key = ?', (now, key))
+                self._db.commit()
+                self.hits += 1
+                if row[0] is None:
+                    return True, None
+                coords = _decode(row[0])
+                return True, coords[::-1] if reverse else coords
+            self.misses += 1
+            return False, None
+
+    def store(self, lon1, lat1, lon2, lat2, coords):
+        """保存一次请求结果,coords为None表示两点间没有步行路线"""
+        now = time.time()
+        text = None if coords is None else _encode(coords)
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO routes VALUES (?, ?, ?, ?)',
+                             (self._key(lon1, lat1, lon2, lat2), text, now, now))
+            self._db.commit()
+            self._writes += 1
+            if self._writes % _PRUNE_EVERY == 0:
+                self._prune_locked()
+
+    def _prune_locked(self):
+        self._db.execute('DELETE FROM routes WHERE created < ?', (time.time() - self.ttl,))
+        extra = self._db.execute('SELECT COUNT(*) FROM routes').fetchone()[0] - self.max_entries
+        if extra > 0:
+            self._db.execute('DELETE FROM routes WHERE key IN '
+                             '(SELECT key FROM routes ORDER BY accessed LIMIT ?)', (extra,))
+        self._db.commit()
+
+    def prune(self):
+        """删除过期条目,超过条目上限时淘汰最久未使用的"""
+        with self._lock:
+            self._prune_locked()
+
+    def stats(self):
+        with self._lock:
+            count = self._db.execute('SELECT COUNT(*) FROM routes').fetchone()[0]
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        return {'entries': count, 'hits': self.hits, 'misses': self.misses, 'bytes': size}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+if __name__ == '__main__':
+    import sys
+
+    cache = WalkRouteCache(sys.argv[1] if len(sys.argv) > 1 else WALK_CACHE_FILE)
+    stats = cache.stats()
+    print(f"缓存条目: {stats['entries']}, 文件大小: {stats['bytes']}字节")
+    cache.close()